@@ -0,0 +1,63 @@
+class AutoSyncScheduler:
+    """定时自动同步
+
+    每interval_minutes分钟检查一次数据版本号，自上次同步以来有修改时才上传，
+    期间的多次修改合并为一次同步（上传由保存调度器在后台线程完成）。
+    有模态对话框或其他同步正在进行时推迟检查；上传失败（如断网）时等待时间逐次加倍。
+    """
+
+    BUSY_RETRY_MS = 10000  # 忙碌时推迟的时间
+    MAX_INTERVAL_MINUTES = 60  # 连续失败后的最长等待时间
+
+    def __init__(self, root, order_store, sync, is_enabled, is_busy, interval_minutes=5):
+        self.root = root
+        self.order_store = order_store
+        self.sync = sync  # 发起一次后台上传的函数
+        self.is_enabled = is_enabled  # 返回是否开启了自动同步
+        self.is_busy = is_busy  # 返回当前是否需要推迟同步
+        self.interval_minutes = interval_minutes
+
+        self.after_id = None
+        self.failures = 0
+        self.pending_generation = None  # 上一次自动同步提交时的数据版本
+
+    def start(self):
+        if self.after_id is None:
+            self._schedule(self._interval_ms())
+
+    def stop(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def _schedule(self, delay_ms):
+        self.after_id = self.root.after(delay_ms, self._tick)
+
+    def _interval_ms(self):
+        """同步间隔，连续失败时按2的幂次延长"""
+        minutes = min(self.MAX_INTERVAL_MINUTES, self.interval_minutes * (2 ** self.failures))
+        return int(minutes * 60 * 1000)
+
+    def _tick(self):
+        self.after_id = None
+        if not self.is_enabled():
+            self._schedule(self._interval_ms())
+            return
+        if self.is_busy():
+            self._schedule(self.BUSY_RETRY_MS)
+            return
+
+        if self.pending_generation is not None:
+            # 检查上一次自动同步是否成功，失败时延长下次的等待时间
+            if self.order_store.synced_generation >= self.pending_generation:
+                self.failures = 0
+            else:
+                self.failures += 1
+                print(f"⚠️ 自动同步未成功，{self._interval_ms() // 60000} 分钟后重试")
+            self.pending_generation = None
+
+        if self.order_store.has_unsynced_changes():
+            self.pending_generation = self.order_store.generation
+            print("🔄 自动同步: 数据有修改，开始上传")
+            self.sync()
+        self._schedule(self._interval_ms())
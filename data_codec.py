@@ -0,0 +1,191 @@
+import json
+import hashlib
+
+# 可选的高速JSON库，按优先级尝试：orjson > ujson > 标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# 数据文件格式版本
+# 1.0: 订单完整展开（内存中和云端使用的格式）
+# 2.0: 紧凑格式，订单名不重复保存，房间和柜体保存为数组
+# 3.0: 数据文件只保存订单概要，房间和柜体（订单明细）单独保存，按需读取
+EXPANDED_VERSION = "1.0"
+SCHEMA_VERSION = "3.0"
+
+CABINET_KEYS = ("width", "height", "area")
+
+
+if orjson is not None:
+    CODEC_NAME = "orjson"
+
+    def dumps(obj):
+        """序列化为紧凑的UTF-8字节串"""
+        return orjson.dumps(obj)
+
+    def loads(raw):
+        return orjson.loads(raw)
+
+elif ujson is not None:
+    CODEC_NAME = "ujson"
+
+    def dumps(obj):
+        """序列化为紧凑的UTF-8字节串"""
+        return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def loads(raw):
+        return ujson.loads(raw)
+
+else:
+    CODEC_NAME = "json"
+
+    def dumps(obj):
+        """序列化为紧凑的UTF-8字节串"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(raw):
+        return json.loads(raw)
+
+
+def pack_rooms(rooms):
+    """订单明细转为紧凑格式：房间为[名称, 柜体列表]，柜体为[名称, 宽, 高, 面积]"""
+    packed = []
+    for room_name, room in rooms.items():
+        cabinets = []
+        for cabinet_name, cabinet in room.get("cabinets", {}).items():
+            item = [cabinet_name] + [cabinet.get(key, 0) for key in CABINET_KEYS]
+            extra = {key: value for key, value in cabinet.items() if key not in CABINET_KEYS and key != "name"}
+            if extra:
+                item.append(extra)
+            cabinets.append(item)
+        item = [room_name, cabinets]
+        extra = {key: value for key, value in room.items() if key not in ("name", "cabinets")}
+        if extra:
+            item.append(extra)
+        packed.append(item)
+    return packed
+
+
+def unpack_rooms(packed):
+    """紧凑格式的订单明细还原为 {房间名: {name, cabinets}}"""
+    rooms = {}
+    for room_item in packed:
+        room_name, cabinets = room_item[0], room_item[1]
+        room = dict(room_item[2]) if len(room_item) > 2 else {}
+        room["name"] = room_name
+        room["cabinets"] = {}
+        room_cabinets = room["cabinets"]
+        for cabinet_item in cabinets:
+            cabinet = {"name": cabinet_item[0], "width": cabinet_item[1],
+                       "height": cabinet_item[2], "area": cabinet_item[3]}
+            if len(cabinet_item) > 4:
+                cabinet.update(cabinet_item[4])
+            room_cabinets[cabinet_item[0]] = cabinet
+        rooms[room_name] = room
+    return rooms
+
+
+def order_header(order):
+    """订单概要：除房间和柜体以外的字段"""
+    return {key: value for key, value in order.items() if key != "rooms"}
+
+
+def pack_order(order):
+    """订单转为紧凑格式，未加载明细的订单只保存概要"""
+    packed = {key: value for key, value in order.items() if key not in ("name", "rooms")}
+    if "rooms" in order:
+        packed["rooms"] = pack_rooms(order["rooms"])
+    return packed
+
+
+def unpack_order(order_name, order):
+    """紧凑格式的订单还原为完整格式，已是完整格式时原样返回；没有明细时只还原概要"""
+    if isinstance(order.get("rooms"), dict):
+        return order
+
+    unpacked = {"name": order_name}
+    unpacked.update((key, value) for key, value in order.items() if key != "rooms")
+    if "rooms" in order:
+        unpacked["rooms"] = unpack_rooms(order["rooms"])
+    return unpacked
+
+
+def _migrate_1_0(data):
+    """1.0 -> 2.0：订单转为紧凑格式"""
+    migrated = dict(data)
+    migrated["orders"] = {name: pack_order(order) for name, order in data.get("orders", {}).items()}
+    migrated["version"] = "2.0"
+    return migrated
+
+
+def _migrate_2_0(data):
+    """2.0 -> 3.0：明细仍内嵌在订单中，下次写快照时拆分到明细文件"""
+    migrated = dict(data)
+    migrated["version"] = "3.0"
+    return migrated
+
+
+# 按版本号依次升级，新增格式时在这里登记
+MIGRATIONS = {
+    "1.0": _migrate_1_0,
+    "2.0": _migrate_2_0,
+}
+
+
+def migrate_data(data):
+    """把任意旧版本的数据升级到SCHEMA_VERSION，返回(数据, 是否发生了升级)"""
+    version = str(data.get("version") or EXPANDED_VERSION)
+    migrated = False
+    while version != SCHEMA_VERSION:
+        if version not in MIGRATIONS:
+            raise ValueError(f"数据文件版本 {version} 不受支持，请升级程序后再打开")
+        data = MIGRATIONS[version](data)
+        version = data["version"]
+        migrated = True
+    return data, migrated
+
+
+def pack_data(data):
+    """完整数据转为当前版本的紧凑格式"""
+    packed = dict(data)
+    packed["orders"] = {name: pack_order(order) for name, order in data.get("orders", {}).items()}
+    packed["version"] = SCHEMA_VERSION
+    return packed
+
+
+def unpack_data(data):
+    """读取任意受支持版本的数据，返回完整格式和是否需要重写为新格式"""
+    data, migrated = migrate_data(data)
+    unpacked = dict(data)
+    unpacked["orders"] = {name: unpack_order(name, order) for name, order in data.get("orders", {}).items()}
+    unpacked["version"] = EXPANDED_VERSION
+    return unpacked, migrated
+
+
+CHECKSUM_PREFIX = b'{"checksum":"sha256:'
+
+
+def seal(payload):
+    """在序列化结果开头加入内容校验和，结果仍是合法的JSON对象（空对象后面不加逗号）"""
+    digest = hashlib.sha256(payload).hexdigest().encode("ascii")
+    separator = b'"' if payload[1:] == b"}" else b'",'
+    return CHECKSUM_PREFIX + digest + separator + payload[1:]
+
+
+def unseal(raw):
+    """校验并去掉校验和，返回原始序列化内容；没有校验和的旧文件原样返回"""
+    if not raw.startswith(CHECKSUM_PREFIX):
+        return raw
+    digest_end = len(CHECKSUM_PREFIX) + 64
+    rest = raw[digest_end + 1:]
+    payload = b"{" + (rest[1:] if rest.startswith(b",") else rest)
+    if hashlib.sha256(payload).hexdigest().encode("ascii") != raw[len(CHECKSUM_PREFIX):digest_end]:
+        raise ValueError("文件校验和不匹配，内容已损坏")
+    return payload
@@ -0,0 +1,86 @@
+import os
+import json
+
+
+# 引导文件：缓存上次选定的数据文件路径，避免每次启动都做写入探测
+BOOTSTRAP_FILE = os.path.join(os.path.expanduser("~"), "面积计算工具", "bootstrap.json")
+
+
+def resolve_data_file(candidate_paths):
+    """确定数据文件路径：优先使用引导文件中缓存的路径，目录不可写时重新探测"""
+    cached = load_cached_data_file(candidate_paths)
+    if cached and is_writable_dir(os.path.dirname(cached)):
+        print(f"路径检测 - 使用缓存路径: {cached}")
+        return cached
+
+    data_file = probe_data_file(candidate_paths)
+    save_cached_data_file(candidate_paths, data_file)
+    return data_file
+
+
+def is_writable_dir(dir_path):
+    """只检查目录权限，不创建测试文件"""
+    return os.path.isdir(dir_path) and os.access(dir_path, os.W_OK)
+
+
+def load_cached_data_file(candidate_paths):
+    """读取引导文件，候选路径发生变化（如程序被移动）时缓存失效"""
+    try:
+        if not os.path.exists(BOOTSTRAP_FILE):
+            return None
+        with open(BOOTSTRAP_FILE, "r", encoding="utf-8") as f:
+            bootstrap = json.load(f)
+        if bootstrap.get("candidate_paths") != list(candidate_paths):
+            return None
+        return bootstrap.get("data_file")
+    except Exception as e:
+        print(f"读取引导文件失败: {e}")
+        return None
+
+
+def save_cached_data_file(candidate_paths, data_file):
+    try:
+        os.makedirs(os.path.dirname(BOOTSTRAP_FILE), exist_ok=True)
+        with open(BOOTSTRAP_FILE, "w", encoding="utf-8") as f:
+            json.dump({"candidate_paths": list(candidate_paths), "data_file": data_file}, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"保存引导文件失败: {e}")
+
+
+def probe_data_file(candidate_paths):
+    """按优先级测试每个候选路径的可写性，返回第一个可写的路径"""
+    for path in candidate_paths:
+        dir_path = os.path.dirname(path)
+
+        # 确保目录存在
+        try:
+            os.makedirs(dir_path, exist_ok=True)
+        except:
+            continue
+
+        # 测试写入权限
+        try:
+            test_file = os.path.join(dir_path, "test_write.tmp")
+            with open(test_file, 'w') as f:
+                f.write("test")
+            os.remove(test_file)
+
+            # 检查是否已存在数据文件
+            if os.path.exists(path):
+                print(f"路径检测 - 发现现有数据文件: {path}")
+
+            print(f"路径检测 - 选择路径: {path}")
+            return path
+
+        except (OSError, PermissionError):
+            continue
+
+    # 如果所有路径都失败，使用最后的选择
+    data_file = candidate_paths[-1]
+    print(f"路径检测 - 使用最后选择: {data_file}")
+    # 确保目录存在
+    try:
+        os.makedirs(os.path.dirname(data_file), exist_ok=True)
+    except:
+        pass
+    return data_file
@@ -0,0 +1,742 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from order_store import atomic_write
+from sync_backends import NOT_MODIFIED, StaleRemoteError, GitHubBackend, git_blob_sha
+
+
+# 云端目录结构（相对于仓库根目录）：
+#   sync/manifest.json        清单：各分片的内容哈希、压缩方式、时间戳和数据版本
+#   sync/shards/meta.json     厂家列表和绑定目录
+#   sync/shards/<厂家分区>/<YYYY-MM>.json  按厂家分区、再按订单月份划分的订单分片（开启压缩时为压缩后的内容）
+MANIFEST_FORMAT = "delta-1"
+META_SHARD = "meta"
+UNDATED_SHARD = "undated"
+UNASSIGNED_PARTITION = "unassigned"
+
+# 按厂家分区的目录结构：清单格式为delta-3，旧版本程序不会按月份的旧结构改写云端，
+# 也不会把压缩后的分片（清单的encoding字段记录压缩方式）当作JSON解析。
+# 旧格式的分片（名称中没有分区）在管理员同步时迁移到各厂家的分区
+PARTITIONED_FORMAT = "delta-3"
+SUPPORTED_FORMATS = (MANIFEST_FORMAT, PARTITIONED_FORMAT)
+
+# 旧版本程序整体读写的云端数据文件（云同步配置中的默认路径）。分片同步后不再更新该文件，
+# 写入清单时把它替换为下面的说明文字：不是JSON，旧版本程序下载时解析失败并继续使用本地数据，
+# 不会把早已过时的整体数据当作云端最新数据合并或覆盖本地
+LEGACY_DATA_PATH = "data.json"
+LEGACY_MARKER = ("此云端数据已改为按分片同步（sync/manifest.json），"
+                 "请升级订单管理程序后再同步。\n").encode("utf-8")
+ENCODING_NONE = "none"
+ENCODING_GZIP = "gzip"
+ENCODING_ZSTD = "zstd"
+SUPPORTED_ENCODINGS = (ENCODING_NONE, ENCODING_GZIP, ENCODING_ZSTD)
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# download_data()返回NOT_MODIFIED时：云端清单自上次同步以来没有变化，继续使用本地数据
+
+# 提交时发现云端已被其他设备更新，重新合并后再提交的次数
+SYNC_ATTEMPTS = 3
+
+
+def partition_name(manufacturer):
+    """厂家的分区名：厂家名称的哈希，避免文件路径中出现中文和特殊字符"""
+    if not manufacturer:
+        return UNASSIGNED_PARTITION
+    return "m-" + hashlib.sha1(str(manufacturer).encode("utf-8")).hexdigest()[:16]
+
+
+def month_name(order):
+    """订单日期的年月，没有日期的订单放在同一个分片（也是旧格式的分片名）"""
+    date = order.get("date", "")
+    if isinstance(date, str) and len(date) >= 7 and date[:4].isdigit() and date[5:7].isdigit():
+        return date[:7]
+    return UNDATED_SHARD
+
+
+def shard_name(order):
+    """订单所属分片：先按厂家分区，再按订单日期的年月划分"""
+    return f"{partition_name(order.get('manufacturer'))}/{month_name(order)}"
+
+
+def is_legacy_shard(name):
+    """按月份划分、没有厂家分区的旧格式分片"""
+    return name != META_SHARD and "/" not in name
+
+
+def in_scope(name, manufacturer):
+    """分片是否属于厂家客户端的同步范围：本厂家的分区和厂家列表；manufacturer为None时包含全部分片"""
+    if manufacturer is None or name == META_SHARD:
+        return True
+    return name.startswith(partition_name(manufacturer) + "/")
+
+
+def encode_shard(content):
+    """分片序列化：键排序，保证相同内容得到相同的字节和哈希"""
+    return json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def compress_shard(raw, encoding):
+    """按压缩方式编码分片；没有安装zstandard时改用gzip"""
+    if encoding == ENCODING_ZSTD:
+        try:
+            import zstandard
+            return zstandard.ZstdCompressor(level=10).compress(raw)
+        except ImportError:
+            encoding = ENCODING_GZIP
+    if encoding == ENCODING_GZIP:
+        return gzip.compress(raw, compresslevel=9, mtime=0)
+    return raw
+
+
+def decompress_shard(stored):
+    """按文件头识别压缩方式并解码分片，未压缩的分片原样返回"""
+    if stored.startswith(GZIP_MAGIC):
+        return gzip.decompress(stored)
+    if stored.startswith(ZSTD_MAGIC):
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("云端数据使用zstd压缩，请安装zstandard库: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(stored)
+    return stored
+
+
+def content_hash(raw):
+    return "sha256:" + hashlib.sha256(raw).hexdigest()
+
+
+def split_data(data):
+    """把完整数据拆成分片，返回 {分片名: 分片内容}"""
+    shards = {}
+    for order_name, order in data.get("orders", {}).items():
+        shards.setdefault(shard_name(order), {"orders": {}})["orders"][order_name] = order
+    shards[META_SHARD] = {
+        "manufacturers": data.get("manufacturers", {}),
+        "bound_order_dir": data.get("bound_order_dir", "")
+    }
+    return shards
+
+
+def build_shards(data):
+    """把完整数据拆成分片，返回 {分片名: 序列化后的字节}"""
+    return {name: encode_shard(content) for name, content in split_data(data).items()}
+
+
+# 比较订单内容时忽略的记录字段：修订号，以及由明细推导出的房间名称
+BOOKKEEPING_KEYS = ("rev", "room_names")
+
+
+def without_revision(value):
+    """比较内容时忽略订单的修订号等记录字段，两台设备做了相同的修改也视为相同"""
+    if isinstance(value, dict) and any(key in value for key in BOOKKEEPING_KEYS):
+        return {key: item for key, item in value.items() if key not in BOOKKEEPING_KEYS}
+    return value
+
+
+def merge_value(base, local, remote):
+    """三方合并一个值（None表示不存在），返回(合并结果, 是否冲突)
+
+    只有一方相对共同基准有修改时采用修改的一方；双方改成了不同内容时为冲突，保留本地版本
+    """
+    base, local_key, remote_key = without_revision(base), without_revision(local), without_revision(remote)
+    if local_key == remote_key or remote_key == base:
+        return local, False
+    if local_key == base:
+        return remote, False
+    return local, True
+
+
+def merge_dict(base, local, remote):
+    """按键三方合并字典（订单、厂家），返回(合并结果, 冲突的键)"""
+    merged = {}
+    conflicts = []
+    for key in dict.fromkeys([*local, *remote, *base]):
+        value, conflict = merge_value(base.get(key), local.get(key), remote.get(key))
+        if value is not None:
+            merged[key] = value
+        if conflict:
+            conflicts.append(key)
+    return merged, conflicts
+
+
+def merge_shard(name, base, local, remote):
+    """三方合并一个分片的内容，返回(合并后的内容, 冲突列表)
+
+    冲突列表中每项为 {"kind": 订单/厂家/绑定目录, "name", "local", "remote"}
+    """
+    if name != META_SHARD:
+        orders, clashes = merge_dict(base.get("orders", {}), local.get("orders", {}), remote.get("orders", {}))
+        conflicts = [{"kind": "order", "name": order_name,
+                      "local": local.get("orders", {}).get(order_name),
+                      "remote": remote.get("orders", {}).get(order_name)} for order_name in clashes]
+        return {"orders": orders}, conflicts
+
+    manufacturers, clashes = merge_dict(base.get("manufacturers", {}), local.get("manufacturers", {}),
+                                        remote.get("manufacturers", {}))
+    conflicts = [{"kind": "manufacturer", "name": manufacturer,
+                  "local": local.get("manufacturers", {}).get(manufacturer),
+                  "remote": remote.get("manufacturers", {}).get(manufacturer)} for manufacturer in clashes]
+    bound_order_dir, conflict = merge_value(base.get("bound_order_dir", ""), local.get("bound_order_dir", ""),
+                                            remote.get("bound_order_dir", ""))
+    if conflict:
+        conflicts.append({"kind": "bound_order_dir", "name": "",
+                          "local": local.get("bound_order_dir", ""), "remote": remote.get("bound_order_dir", "")})
+    return {"manufacturers": manufacturers, "bound_order_dir": bound_order_dir or ""}, conflicts
+
+
+def is_empty_shard(name, content):
+    """没有订单的订单分片不再保存到云端"""
+    return not content or (name != META_SHARD and not content.get("orders"))
+
+
+class DeltaCloudSync:
+    """按分片增量同步到GitHub仓库
+
+    订单按月份拆成分片文件，清单记录每个分片的内容哈希。上传时只提交哈希变化的分片
+    和清单，下载时只拉取哈希与本地记录不同的分片，未变化的分片从本地缓存读取。
+    本地的 sync_state.json 记录上次同步时各分片的哈希和blob sha，sync_cache/ 保存分片内容，
+    也是双向同步时三方合并的共同基准。无法自动合并的修改记录在 sync_conflicts.json 中。
+
+    云端文件的读写由存储后端完成（sync_backends），默认使用cloud_sync中配置的GitHub仓库。
+    设置manufacturer后只同步该厂家的分区和厂家列表（厂家客户端），其他厂家的分片
+    不下载也不修改；为None时同步全部分片（管理员）。
+    """
+
+    def __init__(self, cloud_sync, data_file, remote_dir="sync", encoding=ENCODING_NONE, backend=None,
+                 legacy_path=LEGACY_DATA_PATH):
+        self.cloud_sync = cloud_sync  # SimpleCloudSync，使用其中的GitHub仓库和认证信息
+        self.backend = backend  # 指定时使用该存储后端（本地目录、模拟服务），不再读取cloud_sync
+        self.remote_dir = remote_dir
+        self.legacy_path = legacy_path  # 旧版本程序的整体数据文件，None表示不处理
+        self.encoding = encoding  # 上传分片的压缩方式，哈希始终按未压缩的内容计算
+        self.manufacturer = None  # 厂家客户端的同步范围，None表示全部分片
+        data_dir = os.path.dirname(data_file)
+        self.state_file = os.path.join(data_dir, "sync_state.json")
+        self.cache_dir = os.path.join(data_dir, "sync_cache")
+        self.conflicts_file = os.path.join(data_dir, "sync_conflicts.json")
+        self.lock = threading.Lock()  # 后台保存线程和主线程都可能同步
+        self.state_lock = threading.Lock()  # 主线程提交同步结果时与后台同步互斥读写状态文件
+
+    @property
+    def github_sync(self):
+        return self.cloud_sync.github_sync if self.cloud_sync else None
+
+    def get_backend(self):
+        """本次同步使用的存储后端，未配置云同步时返回None"""
+        if self.backend is not None:
+            return self.backend
+        github_sync = self.github_sync
+        return GitHubBackend(github_sync) if github_sync else None
+
+    def sync(self, data, create=True, touched=None, load_orders=None):
+        """与云端双向同步：取回其他设备的修改，与本地逐个订单三方合并后上传合并结果
+
+        共同基准是上次同步时的分片内容。只有一方修改过的订单和厂家自动合并；双方都修改且
+        内容不同时保留本地版本，云端版本记入冲突列表。提交时发现云端又被其他设备更新，
+        会重新取回并合并，不会覆盖对方的修改。
+
+        touched为(自上次同步以来修改过的订单名, 厂家数据是否修改)时只重新生成这些订单所在的分片，
+        其余分片视为与上次同步时相同，沿用同步状态中记录的哈希；为None时比较全部分片。
+        load_orders(订单名集合)返回这些订单的完整内容，参数为None时返回全部订单，
+        没有提供时使用data中的orders。
+
+        返回同步结果（见_sync_once），界面应用其中的云端修改后需调用commit()记录新的共同基准。
+        未配置云同步，或create为False且云端还没有分片数据时返回None
+        """
+        backend = self.get_backend()
+        if not backend:
+            return None
+
+        with self.lock:
+            for attempt in range(SYNC_ATTEMPTS):
+                try:
+                    return self._sync_once(backend, data, create, touched, load_orders)
+                except StaleRemoteError:
+                    print("☁️ 同步清单已被其他设备更新，重新合并")
+            raise StaleRemoteError("云端数据在同步过程中不断变化，请稍后重试")
+
+    def _sync_once(self, backend, data, create, touched=None, load_orders=None):
+        """一次完整的同步：读清单、合并云端变化的分片、上传与云端不同的分片、更新清单
+
+        返回 {"orders": {订单名: (合并后的订单或None, 同步前本地的修订号或None)},
+              "meta": (合并后的厂家分片内容, 同步前本地的内容)，与本地相同时为None,
+              "conflicts": 冲突列表, "state": 新的同步状态, "cache": {分片名: 内容或None}}
+        orders中只包含合并后与本地不同、需要在界面上更新的订单
+        """
+        manufacturer = self.manufacturer
+        state = self._load_state(backend.location)
+        raw_manifest, etag = backend.get_file(self._manifest_path(), state.get("manifest_etag"))
+        if raw_manifest is None and not create:
+            return None
+
+        manifest_sha = state.get("manifest_sha")
+        if raw_manifest is None:
+            # 云端没有分片数据（首次同步或云端目录被清空），以本地数据为准重新创建
+            state["shards"] = {}
+            all_hashes, manifest_sha = {}, None
+        elif raw_manifest is NOT_MODIFIED or git_blob_sha(raw_manifest) == manifest_sha:
+            all_hashes = state.get("manifest_shards")
+            if all_hashes is None:
+                all_hashes = {name: entry["hash"] for name, entry in state["shards"].items()}
+            if raw_manifest is not NOT_MODIFIED:
+                state["manifest_etag"] = etag
+        else:
+            all_hashes = self._parse_manifest(raw_manifest).get("shards", {})
+            manifest_sha = git_blob_sha(raw_manifest)
+            state["manifest_etag"] = etag
+
+        # 只处理同步范围内的分片，其他厂家的分区原样保留在清单中
+        known = {name: entry for name, entry in state["shards"].items() if in_scope(name, manufacturer)}
+        remote_hashes = {name: digest for name, digest in all_hashes.items() if in_scope(name, manufacturer)}
+        local = None
+        if (touched is not None and raw_manifest is not None and "shard_orders" in state
+                and not any(is_legacy_shard(name) for name in [*remote_hashes, *known])):
+            local = self._touched_shards(data, state, known, touched, load_orders)
+        incremental = local is not None
+        if not incremental:
+            local = split_data(data if load_orders is None else dict(data, orders=load_orders(None)))
+        # 厂家客户端改到其他厂家名下（或导入的其他厂家）的订单，先写入对方的分区，
+        # 之后才从本厂家的分区中删除，订单不会在同步中丢失
+        handed_off = self._hand_off_orders(
+            backend, {name: content for name, content in local.items() if not in_scope(name, manufacturer)})
+        local = {name: content for name, content in local.items() if in_scope(name, manufacturer)}
+        if manufacturer is None and not incremental:
+            # 云端还有旧格式的分片时，本地订单按月份重新分组与之合并，合并结果再迁移到各厂家的分区
+            legacy = {name for name in [*remote_hashes, *known] if is_legacy_shard(name)}
+            for order_name, order in data.get("orders", {}).items():
+                if month_name(order) in legacy:
+                    local.setdefault(month_name(order), {"orders": {}})["orders"][order_name] = order
+        shards = dict(local)  # 合并后的分片内容
+        remote = {name: dict(entry) for name, entry in known.items()}  # 云端各分片当前的哈希和sha
+        bases = {}
+        conflicts = []
+
+        # 云端在上次同步后有变化的分片：取回并与本地三方合并
+        for name in sorted(set(remote_hashes) | set(known)):
+            if remote_hashes.get(name) != known.get(name, {}).get("hash"):
+                bases[name] = self._base_content(name, known)
+                if name not in local:
+                    # 本地没有修改过的分片，本地内容就是上次同步时的内容
+                    local[name] = shards[name] = bases[name]
+                shards[name], bases[name] = self._merge_remote(backend, name, bases[name], shards.get(name),
+                                                               remote, conflicts)
+
+        migrated = self._migrate_legacy_shards(local, shards)
+
+        # 上传与云端不同的分片，先分片后清单，其他设备不会读到引用了未上传分片的清单。
+        # 只比较本地修改过的分片时，其余分片与云端相同，不需要检查
+        uploaded = []
+        sent = 0
+        for name in sorted(set(shards) | (set() if incremental else set(remote))):
+            for attempt in range(SYNC_ATTEMPTS):
+                raw = None if is_empty_shard(name, shards.get(name)) else encode_shard(shards[name])
+                current = remote.get(name)
+                if raw is None and current is None:
+                    break
+                if raw is not None and current is not None and current["hash"] == content_hash(raw):
+                    break
+                try:
+                    if raw is None:
+                        backend.delete_file(self._shard_path(name), current["sha"], f"删除分片 {name}")
+                        del remote[name]
+                    else:
+                        stored = compress_shard(raw, self.encoding)
+                        sha = backend.put_file(self._shard_path(name), stored,
+                                               current["sha"] if current else None, f"更新分片 {name}")
+                        remote[name] = {"hash": content_hash(raw), "sha": sha}
+                        sent += len(stored)
+                    uploaded.append(name)
+                    break
+                except StaleRemoteError:
+                    # 读取之后分片又被其他设备更新，以刚才读到的云端内容为基准重新合并
+                    if name not in bases:
+                        bases[name] = self._base_content(name, known)
+                    shards[name], bases[name] = self._merge_remote(backend, name, bases[name], shards.get(name),
+                                                                   remote, conflicts)
+            else:
+                raise StaleRemoteError(f"云端分片 {name} 在同步过程中不断变化")
+
+        hashes = {name: digest for name, digest in all_hashes.items() if not in_scope(name, manufacturer)}
+        hashes.update(handed_off)
+        hashes.update((name, entry["hash"]) for name, entry in remote.items())
+        if hashes != all_hashes or raw_manifest is None:
+            manifest = encode_shard({
+                "format": PARTITIONED_FORMAT,
+                "encoding": self.encoding,
+                "timestamp": data.get("timestamp", ""),
+                "version": data.get("version", ""),
+                "shards": hashes
+            })
+            manifest_sha = backend.put_file(self._manifest_path(), manifest, manifest_sha, "更新同步清单")
+            # 清单已更新，旧的ETag失效，下次下载时重新获取
+            state["manifest_etag"] = None
+            sent += len(manifest)
+            sent += self._mark_legacy_data(backend, state)
+
+        cache = {}
+        for name in set(bases) | set(uploaded):
+            cache[name] = None if name not in remote else encode_shard(shards[name])
+        # 范围外的分片不再作为合并基准，以后改为同步全部分片时重新从云端取回
+        for name in state["shards"]:
+            if name not in known:
+                cache[name] = None
+        # 各分片中的订单名，下次只比较修改过的订单时据此找到订单原来所在的分片
+        shard_orders = dict(state.get("shard_orders", {})) if incremental else {}
+        for name, content in shards.items():
+            if name != META_SHARD and content:
+                shard_orders[name] = sorted(content.get("orders", {}))
+        state["shard_orders"] = {name: names for name, names in shard_orders.items() if name in remote}
+        state["shards"] = remote
+        state["manifest_shards"] = hashes
+        state["manifest_sha"] = manifest_sha
+
+        # 合并后与本地不同的订单（订单可能因日期变化换了分片，按所有合并过的分片一起比较）
+        local_orders, merged_orders = {}, {}
+        for name in set(bases) | migrated:
+            if name != META_SHARD:
+                local_orders.update(local.get(name, {}).get("orders", {}))
+                merged_orders.update((shards.get(name) or {}).get("orders", {}))
+        changed = {}
+        for order_name in dict.fromkeys([*local_orders, *merged_orders]):
+            old, new = local_orders.get(order_name), merged_orders.get(order_name)
+            if without_revision(old) != without_revision(new):
+                changed[order_name] = (new, old.get("rev", 0) if old is not None else None)
+        meta = None
+        if META_SHARD in bases and shards[META_SHARD] != local[META_SHARD]:
+            meta = (shards[META_SHARD], local[META_SHARD])
+
+        conflicts = list({(conflict["kind"], conflict["name"]): conflict for conflict in conflicts}.values())
+        print(f"☁️ 同步完成: 合并了 {len(bases)} 个云端分片，上传了 {len(uploaded)} 个分片，共 {sent} 字节，"
+              f"{len(changed)} 个订单来自其他设备，{len(conflicts)} 个冲突")
+        return {"orders": changed, "meta": meta, "conflicts": conflicts, "state": state, "cache": cache}
+
+    def commit(self, result):
+        """界面应用同步结果后调用：把这次合并后的分片记为下次同步的共同基准
+
+        在应用之前再次同步时仍以旧的基准合并，云端已有的修改不会被本地的旧数据覆盖
+        """
+        with self.state_lock:
+            for name, raw in result["cache"].items():
+                if raw is None:
+                    self._remove_cache(name)
+                else:
+                    self._write_cache(name, raw)
+            self._save_state(result["state"])
+
+    def load_conflicts(self):
+        """读取冲突列表"""
+        try:
+            if os.path.exists(self.conflicts_file):
+                with open(self.conflicts_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"读取同步冲突列表失败: {e}")
+        return []
+
+    def add_conflicts(self, conflicts):
+        """记录冲突，同一订单（或厂家）只保留最新的一条"""
+        if not conflicts:
+            return
+        with self.state_lock:
+            detected = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            entries = {(entry["kind"], entry["name"]): entry for entry in self.load_conflicts()}
+            for conflict in conflicts:
+                entries[(conflict["kind"], conflict["name"])] = dict(conflict, detected=detected)
+            self._save_conflicts(list(entries.values()))
+
+    def remove_conflict(self, kind, name):
+        """冲突处理完后从列表中移除"""
+        with self.state_lock:
+            conflicts = self.load_conflicts()
+            self._save_conflicts([entry for entry in conflicts if (entry["kind"], entry["name"]) != (kind, name)])
+
+    def download_data(self):
+        """按清单下载云端数据，只拉取变化的分片
+
+        云端还没有分片数据时返回None；清单的ETag与上次相同时返回NOT_MODIFIED，
+        此时只发起一次条件请求，不下载也不解析任何内容。
+        厂家客户端只下载本厂家的分区；云端还是旧格式时从按月份的分片中取出本厂家的订单
+        """
+        backend = self.get_backend()
+        if not backend:
+            return None
+
+        with self.lock:
+            manufacturer = self.manufacturer
+            state = self._load_state(backend.location)
+            raw_manifest, etag = backend.get_file(self._manifest_path(), state.get("manifest_etag"))
+            if raw_manifest is NOT_MODIFIED:
+                print("☁️ 云端数据自上次同步以来没有变化")
+                return NOT_MODIFIED
+            if raw_manifest is None:
+                return None
+            if git_blob_sha(raw_manifest) == state.get("manifest_sha"):
+                # 清单就是本机上次上传或下载的版本，记下ETag，下次可以直接用条件请求
+                state["manifest_etag"] = etag
+                with self.state_lock:
+                    self._save_state(state)
+                print("☁️ 云端数据自上次同步以来没有变化")
+                return NOT_MODIFIED
+            manifest = self._parse_manifest(raw_manifest)
+
+            known = state["shards"]
+            shard_orders = {}
+            fetched = 0
+            data = {"orders": {}, "manufacturers": {}, "bound_order_dir": ""}
+            # 迁移过程中同一订单可能同时在旧格式分片和分区中，先读旧格式分片，以分区中的为准
+            wanted = {name: digest for name, digest in sorted(manifest.get("shards", {}).items(),
+                                                               key=lambda item: not is_legacy_shard(item[0]))
+                      if in_scope(name, manufacturer) or is_legacy_shard(name)}
+            for name, digest in wanted.items():
+                raw = None
+                if known.get(name, {}).get("hash") == digest:
+                    raw = self._read_cache(name)
+                    if raw is not None and content_hash(raw) != digest:
+                        raw = None
+                if raw is None:
+                    raw, sha = self._get_shard(backend, name)
+                    if raw is None:
+                        raise ValueError(f"云端分片 {name} 缺失")
+                    # 其他设备上传分片后未能更新清单时，分片内容比清单新，以分片为准
+                    self._write_cache(name, raw)
+                    known[name] = {"hash": content_hash(raw), "sha": sha}
+                    fetched += 1
+
+                content = json.loads(raw)
+                if name == META_SHARD:
+                    data["manufacturers"] = content.get("manufacturers", {})
+                    data["bound_order_dir"] = content.get("bound_order_dir", "")
+                elif in_scope(name, manufacturer):
+                    data["orders"].update(content.get("orders", {}))
+                    shard_orders[name] = sorted(content.get("orders", {}))
+                else:
+                    data["orders"].update((order_name, order) for order_name, order in content.get("orders", {}).items()
+                                          if order.get("manufacturer") == manufacturer)
+
+            for name in [name for name in known if name not in wanted]:
+                del known[name]
+                self._remove_cache(name)
+
+            state["manifest_shards"] = manifest.get("shards", {})
+            state["manifest_sha"] = git_blob_sha(raw_manifest)
+            state["manifest_etag"] = etag
+            state["shard_orders"] = shard_orders
+            with self.state_lock:
+                self._save_state(state)
+            data["timestamp"] = manifest.get("timestamp", "")
+            data["version"] = manifest.get("version", "")
+            print(f"☁️ 增量下载完成: 共 {len(wanted)} 个分片，下载了 {fetched} 个")
+            return data
+
+    def _merge_remote(self, backend, name, base, content, remote, conflicts):
+        """取回云端分片的当前内容并与本地内容三方合并，返回(合并后的内容, 云端内容)
+
+        云端内容会作为同一次同步中再次合并时的基准
+        """
+        raw, sha = self._get_shard(backend, name)
+        if raw is None:
+            remote.pop(name, None)
+            remote_content = {}
+        else:
+            remote[name] = {"hash": content_hash(raw), "sha": sha}
+            remote_content = json.loads(raw)
+        merged, clashes = merge_shard(name, base, content or {}, remote_content)
+        conflicts.extend(clashes)
+        return merged, remote_content
+
+    def _touched_shards(self, data, state, known, touched, load_orders):
+        """只生成本地修改过的订单所在的分片（修改前和修改后所在的分片），返回 {分片名: 内容}
+
+        这些分片以上次同步时的内容为基础，替换其中修改过的订单。分片的同步缓存缺失或损坏时
+        无法得到本地的完整内容，返回None，改为比较全部分片
+        """
+        order_names, meta_changed = touched
+        order_names = set(order_names)
+        placed = {order_name: name for name, names in state["shard_orders"].items()
+                  for order_name in names if order_name in order_names}
+        if load_orders is not None:
+            orders = load_orders(order_names)
+        else:
+            orders = {order_name: order for order_name, order in data.get("orders", {}).items()
+                      if order_name in order_names}
+
+        local = {}
+        for name in set(placed.values()) | {shard_name(order) for order in orders.values()}:
+            if not in_scope(name, self.manufacturer):
+                local[name] = {"orders": {}}
+                continue
+            content = self._cached_content(name, known)
+            if content is None:
+                print(f"⚠️ 分片 {name} 的同步缓存缺失，比较全部分片")
+                return None
+            local[name] = {"orders": {order_name: order for order_name, order in content.get("orders", {}).items()
+                                      if order_name not in order_names}}
+        for order_name, order in orders.items():
+            local[shard_name(order)]["orders"][order_name] = order
+        if meta_changed:
+            local[META_SHARD] = split_data(dict(data, orders={}))[META_SHARD]
+        print(f"☁️ 只比较本地修改过的 {len(order_names)} 个订单所在的 {len(local)} 个分片")
+        return local
+
+    def _hand_off_orders(self, backend, foreign):
+        """把同步范围外的本地订单写入所属厂家的分区，返回 {分片名: 新的内容哈希}
+
+        这些分区不在本机的同步状态中，直接读取云端当前内容后加入订单：云端没有该订单，
+        或本地的修订号更大时写入，云端较新的版本保留不动
+        """
+        hashes = {}
+        for name, content in sorted(foreign.items()):
+            if name == META_SHARD:
+                continue
+            for attempt in range(SYNC_ATTEMPTS):
+                raw, sha = self._get_shard(backend, name)
+                remote_orders = json.loads(raw).get("orders", {}) if raw is not None else {}
+                orders = dict(remote_orders)
+                written = 0
+                for order_name, order in content.get("orders", {}).items():
+                    existing = orders.get(order_name)
+                    if existing is None or order.get("rev", 0) > existing.get("rev", 0):
+                        orders[order_name] = order
+                        written += 1
+                if not written:
+                    break
+                raw = encode_shard({"orders": orders})
+                try:
+                    backend.put_file(self._shard_path(name), compress_shard(raw, self.encoding), sha,
+                                     f"转入订单到分片 {name}")
+                except StaleRemoteError:
+                    continue
+                hashes[name] = content_hash(raw)
+                print(f"☁️ {written} 个订单转入其他厂家的分区 {name}")
+                break
+            else:
+                raise StaleRemoteError(f"云端分片 {name} 在同步过程中不断变化")
+        return hashes
+
+    def _migrate_legacy_shards(self, local, shards):
+        """把合并后的旧格式分片中的订单移到各厂家的分区，旧分片清空后在上传时删除
+
+        合并时云端删除的订单同时从分区中移除。返回内容有变化的分区分片名
+        """
+        migrated = set()
+
+        def partition_orders(name):
+            if name not in migrated:
+                shards[name] = {"orders": dict((shards.get(name) or {}).get("orders", {}))}
+                migrated.add(name)
+            return shards[name]["orders"]
+
+        for name in [name for name in shards if is_legacy_shard(name)]:
+            merged = (shards.pop(name) or {}).get("orders", {})
+            for order_name, order in local.get(name, {}).get("orders", {}).items():
+                if order_name not in merged:
+                    partition_orders(shard_name(order)).pop(order_name, None)
+            for order_name, order in merged.items():
+                partition_orders(shard_name(order))[order_name] = order
+        return migrated
+
+    def _base_content(self, name, known):
+        """上次同步时的分片内容（合并的共同基准），没有同步过或缓存损坏时为空"""
+        content = self._cached_content(name, known)
+        if content is None:
+            print(f"⚠️ 分片 {name} 的同步缓存缺失，双方都有的不同修改将作为冲突处理")
+            return {}
+        return content
+
+    def _cached_content(self, name, known):
+        """上次同步时的分片内容，没有同步过时为空，缓存缺失或损坏时返回None"""
+        entry = known.get(name)
+        if entry is None:
+            return {}
+        raw = self._read_cache(name)
+        if raw is None or content_hash(raw) != entry.get("hash"):
+            return None
+        return json.loads(raw)
+
+    def _mark_legacy_data(self, backend, state):
+        """把旧版本程序的整体数据文件替换为升级说明，返回上传的字节数
+
+        带上次的ETag条件读取，说明已写入且没有被旧版本程序改写时不下载内容。
+        替换失败不影响分片同步，下次写入清单时重试
+        """
+        if not self.legacy_path:
+            return 0
+        try:
+            raw, etag = backend.get_file(self.legacy_path, state.get("legacy_etag"))
+            if raw is NOT_MODIFIED or raw == LEGACY_MARKER:
+                state["legacy_etag"] = etag
+                return 0
+            backend.put_file(self.legacy_path, LEGACY_MARKER, git_blob_sha(raw) if raw is not None else None,
+                             "数据已改为按分片同步，旧版本程序请升级")
+            state["legacy_etag"] = None
+            print(f"☁️ 已将旧格式的云端数据文件 {self.legacy_path} 替换为升级说明")
+            return len(LEGACY_MARKER)
+        except Exception as e:
+            print(f"替换旧格式的云端数据文件失败: {e}")
+            return 0
+
+    def _parse_manifest(self, raw_manifest):
+        manifest = json.loads(raw_manifest)
+        if manifest.get("format") not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的同步清单格式: {manifest.get('format')}，请升级程序")
+        if manifest.get("encoding", ENCODING_NONE) not in SUPPORTED_ENCODINGS:
+            raise ValueError(f"不支持的分片压缩方式: {manifest.get('encoding')}，请升级程序")
+        return manifest
+
+    def _get_shard(self, backend, name):
+        """读取云端分片，返回(解压后的内容, 云端文件的blob sha)，分片不存在时返回(None, None)"""
+        stored, _ = backend.get_file(self._shard_path(name))
+        if stored is None:
+            return None, None
+        return decompress_shard(stored), git_blob_sha(stored)
+
+    def _manifest_path(self):
+        return f"{self.remote_dir}/manifest.json"
+
+    def _shard_path(self, name):
+        return f"{self.remote_dir}/shards/{name}.json"
+
+    def _load_state(self, repo):
+        """读取本地同步状态，仓库变化或文件损坏时从空状态开始"""
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                if state.get("repo") == repo and state.get("remote_dir") == self.remote_dir:
+                    state.setdefault("shards", {})
+                    return state
+        except Exception as e:
+            print(f"读取同步状态失败，将重新比较全部分片: {e}")
+        return {"repo": repo, "remote_dir": self.remote_dir, "manifest_sha": None, "manifest_etag": None, "shards": {}}
+
+    def _save_state(self, state):
+        atomic_write(self.state_file, json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    def _save_conflicts(self, conflicts):
+        atomic_write(self.conflicts_file, json.dumps(conflicts, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    def _cache_file(self, name):
+        return os.path.join(self.cache_dir, *f"{name}.json".split("/"))
+
+    def _read_cache(self, name):
+        try:
+            with open(self._cache_file(name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_cache(self, name, raw):
+        path = self._cache_file(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, raw)
+
+    def _remove_cache(self, name):
+        try:
+            os.remove(self._cache_file(name))
+        except OSError:
+            pass
@@ -0,0 +1,100 @@
+import time
+import queue
+import threading
+
+
+class LiveSearch:
+    """输入时的实时搜索：合并连续输入，在后台线程查询，只显示最后一次的结果
+
+    每次输入调用request()，delay_ms内没有新的输入才开始查询。开始查询时先在主线程
+    调用prepare(params)取出查询用的数据快照，再交给后台线程执行，后台线程只读取快照。
+    新的输入（或cancel()）会取消尚未完成的查询：还没开始的直接跳过，已经开始的由
+    查询函数通过is_cancelled()检查后提前结束，结果不再显示。结果在Tk主线程显示。
+    """
+
+    POLL_MS = 20
+
+    def __init__(self, root, query, show, on_error=None, prepare=None, delay_ms=250):
+        self.root = root
+        self.prepare = prepare  # 主线程执行：prepare(params)返回交给后台线程的参数（含数据快照）
+        self.query = query  # 后台线程执行：query(params, is_cancelled)，已取消时返回None
+        self.show = show  # 主线程显示结果：show(result, params, query_ms)
+        self.on_error = on_error  # 查询出错时在主线程回调，参数为params和错误
+        self.delay_ms = delay_ms
+
+        self.after_id = None
+        self.generation = 0  # 每次输入或取消时加1，只显示与当前序号相同的结果
+        self.pending_tasks = 0
+        self.polling = False
+
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def request(self, params):
+        """输入变化后请求查询，取消之前尚未显示的查询"""
+        self.cancel()
+        self.after_id = self.root.after(self.delay_ms, lambda: self._dispatch(params))
+
+    def cancel(self):
+        """取消等待中和进行中的查询（如直接刷新了列表）"""
+        self.generation += 1
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def is_busy(self):
+        """是否有等待中或进行中的查询"""
+        return self.after_id is not None or self.pending_tasks > 0
+
+    def _dispatch(self, params):
+        """在主线程把查询交给后台线程"""
+        self.after_id = None
+        if self.prepare:
+            try:
+                params = self.prepare(params)
+            except Exception as e:
+                print(f"❌ 搜索失败: {e}")
+                if self.on_error:
+                    self.on_error(params, e)
+                return
+        self.pending_tasks += 1
+        self.tasks.put((self.generation, params))
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _run(self):
+        """后台线程：依次执行查询，跳过已被取消的"""
+        while True:
+            generation, params = self.tasks.get()
+            result = error = None
+            started = time.perf_counter()
+            if generation == self.generation:
+                try:
+                    result = self.query(params, lambda: generation != self.generation)
+                except Exception as e:
+                    error = e
+            query_ms = (time.perf_counter() - started) * 1000
+            self.results.put((generation, params, result, error, query_ms))
+
+    def _poll(self):
+        while True:
+            try:
+                generation, params, result, error, query_ms = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending_tasks -= 1
+            if generation != self.generation:
+                continue
+            if error is not None:
+                print(f"❌ 搜索失败: {error}")
+                if self.on_error:
+                    self.on_error(params, error)
+            elif result is not None:
+                self.show(result, params, query_ms)
+        if self.pending_tasks > 0:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self.polling = False
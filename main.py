@@ -1,12 +1,28 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
+import copy
 import json
-from datetime import datetime
+import time
+import queue
+import threading
+from datetime import datetime, timedelta
 
 
 from collections import defaultdict
 from cloud_sync import SimpleCloudSync
+from delta_sync import DeltaCloudSync, NOT_MODIFIED, ENCODING_NONE, ENCODING_GZIP, ENCODING_ZSTD
+from order_store import create_order_store
+from save_scheduler import SaveScheduler
+from auto_sync import AutoSyncScheduler
+from sync_queue import SyncQueue
+from order_archive import OrderArchive
+from live_search import LiveSearch
+from virtual_tree import VirtualTreeview
+import data_codec
+import data_location
+import sync_http
+from order_index import OrderKeys, SEARCH_SCOPES, TextIndex, to_cents, cents_to_yuan, format_month
 
 class CustomOrderManagementApp:
     def __init__(self, root):
@@ -17,6 +33,7 @@ class CustomOrderManagementApp:
         # 数据存储
         self.orders = {}  # 订单数据
         self.manufacturers = {}  # 厂家数据
+        self.order_keys = OrderKeys()  # 订单日期的整数排序键（按日期字符串缓存）
         try:
             import sys as _sys
         except Exception:
@@ -52,56 +69,39 @@ class CustomOrderManagementApp:
         user_data_file = os.path.join(user_data_dir, "data.json")
         candidate_paths.append(user_data_file)
         
-        # 测试每个候选路径的可写性
+        # 数据路径解析（读取引导文件，必要时探测可写目录）放到后台线程，窗口先显示
+        self.candidate_paths = candidate_paths
         self.data_file = None
-        for path in candidate_paths:
-            dir_path = os.path.dirname(path)
-            
-            # 确保目录存在
-            try:
-                os.makedirs(dir_path, exist_ok=True)
-            except:
-                continue
-            
-            # 测试写入权限
-            try:
-                test_file = os.path.join(dir_path, "test_write.tmp")
-                with open(test_file, 'w') as f:
-                    f.write("test")
-                os.remove(test_file)
-                
-                # 检查是否已存在数据文件
-                if os.path.exists(path):
-                    print(f"路径检测 - 发现现有数据文件: {path}")
-                
-                self.data_file = path
-                print(f"路径检测 - 选择路径: {self.data_file}")
-                break
-                
-            except (OSError, PermissionError):
-                continue
-        
-        # 如果所有路径都失败，使用最后的选择
-        if not self.data_file:
-            self.data_file = candidate_paths[-1]
-            print(f"路径检测 - 使用最后选择: {self.data_file}")
-            # 确保目录存在
-            try:
-                os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-            except:
-                pass
+        self.data_file_resolver = threading.Thread(target=self.resolve_data_file, daemon=True)
+        self.data_file_resolver.start()
         
         self.data_loaded = False  # 数据加载状态标志
         self.bound_order_dir = ""
         
         # 厂家配置相关
-        self.app_config_file = os.path.join(os.path.dirname(self.data_file), "app_config.json")
         self.current_manufacturer = None  # 当前登录的厂家
         self.is_admin = False  # 是否为管理员
         self.admin_password = "627813"  # 管理员密码
         
-        # 云同步管理器
-        self.cloud_sync = SimpleCloudSync(self.data_file)
+        # 依赖数据路径的对象在路径确定后由init_storage()创建
+        self.app_config_file = None
+        self.order_store = None
+        self.order_archive = None
+        self.save_scheduler = None
+        self.cloud_sync = None
+        self.delta_sync = None
+        self.sync_queue = None
+        self.auto_sync_scheduler = None
+        self.archive_after_id = None  # 等待执行的旧订单存档（首屏显示之后分批进行）
+        
+        # 后台从云端下载期间用户修改过的订单（下载结果合并时保留本地版本）
+        self.sync_down_touched = None
+        self.sync_down_meta_touched = False
+        
+        # 实时搜索：合并连续输入，在后台线程查询，只显示最后一次输入的结果
+        self.live_search = LiveSearch(self.root, self.collect_orders_list, self.show_orders_list,
+                                      on_error=lambda params, error: self.update_orders_list(),
+                                      prepare=self.prepare_list_query)
         
         # 程序关闭处理
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -113,12 +113,66 @@ class CustomOrderManagementApp:
         # 延迟加载数据和刷新界面（尽快在空闲时执行）
         self.root.after_idle(self.delayed_initialization)
         
+    def resolve_data_file(self):
+        """后台线程：确定数据文件路径"""
+        self.data_file = data_location.resolve_data_file(self.candidate_paths)
+    
+    def init_storage(self):
+        """数据路径确定后创建本地存储、保存调度器和云同步管理器"""
+        self.app_config_file = os.path.join(os.path.dirname(self.data_file), "app_config.json")
+        
+        # 本地存储（默认为快照 + 追加式变更日志，可在应用配置中切换为SQLite）
+        self.storage_engine = self.get_storage_engine()
+        self.order_store = create_order_store(self.data_file, self.storage_engine)
+        
+        # 已结账旧订单的冷存档（按年份压缩保存，按需读取）
+        self.archive_after_days = self.get_archive_after_days()
+        self.order_archive = OrderArchive(self.data_file)
+        
+        # 云同步管理器
+        self.cloud_sync = SimpleCloudSync(self.data_file)
+        
+        # 增量同步：云端按月份分片保存，只上传/下载内容变化的分片
+        self.sync_compression = self.get_sync_compression()
+        self.delta_sync = DeltaCloudSync(self.cloud_sync, self.data_file, encoding=self.sync_compression)
+        
+        # 待同步队列：记录尚未上传的修改，断网时保留到联网后再上传
+        self.sync_queue = SyncQueue(self.data_file, self.cloud_sync)
+        
+        # 保存调度器：合并短时间内的多次保存，在后台线程写盘和上传
+        self.save_scheduler = SaveScheduler(self.root, self.order_store, self.build_save_data,
+                                            upload=self.upload_data_to_cloud,
+                                            on_error=self.show_save_error,
+                                            on_uploaded=self.apply_sync_result,
+                                            sync_queue=self.sync_queue,
+                                            build_upload_data=self.build_upload_data)
+        
+        # 定时自动同步：开启后修改只写本地，每5分钟把期间的修改合并上传一次
+        self.auto_sync_scheduler = AutoSyncScheduler(
+            self.root, self.order_store,
+            sync=lambda: self.save_scheduler.request_save(upload=True),
+            is_enabled=self.is_auto_sync_enabled,
+            is_busy=self.is_sync_busy)
+        self.auto_sync_scheduler.start()
+        
+        # 存储已就绪，启用订单管理选项卡和同步按钮
+        self.notebook.tab(self.order_frame, state="normal")
+        for button in self.storage_controls:
+            button.config(state="normal")
+    
     def delayed_initialization(self):
         """延迟初始化：加载数据并刷新界面"""
+        # 数据路径还在后台解析时稍后再试，不阻塞界面
+        if self.data_file_resolver.is_alive():
+            self.root.after(50, self.delayed_initialization)
+            return
+        self.init_storage()
+        
         print("开始加载数据...")
         
         # 更新云同步状态显示
         self.update_sync_status_display()
+        self.update_conflict_display()
         
         # 首先检查云同步配置
         if not self.cloud_sync or not self.cloud_sync.github_sync:
@@ -127,43 +181,336 @@ class CustomOrderManagementApp:
             self.root.after(1000, self.show_cloud_sync_config_optional)
             return
         
-        # 已配置云同步，尝试从云端下载数据
-        print("🔄 检测到云同步配置，正在尝试从云端下载最新数据...")
-        try:
-            # 尝试从云端下载数据
-            cloud_data = self.cloud_sync.sync_down()
-            if cloud_data:
-                # 成功下载云端数据，使用云端数据
-                self.orders = cloud_data.get("orders", {})
-                self.manufacturers = cloud_data.get("manufacturers", {})
-                self.bound_order_dir = cloud_data.get("bound_order_dir", "")
-                # 保存到本地（不进行云同步）
-                self.save_data_local_only()
-                print("✅ 已从云端成功下载并加载最新数据")
-                print(f"📊 下载数据包含: {len(self.orders)} 个订单, {len(self.manufacturers)} 个厂家")
-            else:
-                # 云端没有数据，使用本地数据
-                print("☁️ 云端没有数据，使用本地数据")
-                self.load_data_local_only()
-                
-        except Exception as e:
-            print(f"❌ 从云端下载数据失败: {e}，使用本地数据")
-            self.load_data_local_only()
+        # 已配置云同步：先加载本地数据并显示界面，再在后台从云端下载最新数据合并进来
+        self.load_data_local_only()
         
         # 现在检查厂家配置（从已加载的数据中获取厂家信息）
         if not self.load_app_config():
-            # 首次运行，需要配置厂家（此时已有厂家数据）
-            self.root.after(1000, self.show_manufacturer_config_after_sync)
+            # 首次运行，需要配置厂家：等云端数据（含厂家列表）下载完成后再显示配置窗口
+            self.start_background_sync_down(
+                on_done=lambda: self.root.after(1000, self.show_manufacturer_config_after_sync))
             return
         
         # 已有厂家配置，继续正常流程
         self.continue_normal_startup()
+        self.start_background_sync_down()
+    
+    def start_background_sync_down(self, on_done=None):
+        """在后台线程与云端同步，结果通过队列交回主线程，网络慢时界面不会卡住
+
+        云端已有分片数据时双向合并；云端只有整体保存的旧数据时下载后替换本地
+        """
+        self.sync_down_touched = set()
+        self.sync_down_meta_touched = False
+        results = queue.Queue()
+        # 只复制尚未同步的订单，其余订单由后台线程从本地存储读取，启动时不深拷贝全部数据
+        data = self.build_upload_data()
+        queue_mark = self.sync_queue.mark()
+        self.show_sync_progress("正在从云端同步...")
+        print("🔄 检测到云同步配置，正在后台与云端同步最新数据...")
+        
+        def download():
+            try:
+                # 已交给后台保存线程的变更不在快照中，等它们写入本地存储后再读取
+                self.save_scheduler.join_writes()
+                sync_result = self.sync_with_cloud(data, create=False)
+                if sync_result is not None:
+                    results.put((sync_result, None))
+                else:
+                    print("☁️ 云端没有分片数据，使用整体下载")
+                    results.put((self.cloud_sync.sync_down(), None))
+            except Exception as e:
+                results.put((None, e))
+        
+        threading.Thread(target=download, daemon=True).start()
+        self.root.after(100, lambda: self.poll_sync_down(results, on_done, queue_mark))
+    
+    def poll_sync_down(self, results, on_done, queue_mark=0):
+        """主线程轮询后台下载结果"""
+        try:
+            cloud_data, error = results.get_nowait()
+        except queue.Empty:
+            self.root.after(100, lambda: self.poll_sync_down(results, on_done, queue_mark))
+            return
+        
+        touched, meta_touched = self.sync_down_touched, self.sync_down_meta_touched
+        self.sync_down_touched = None
+        self.sync_down_meta_touched = False
+        self.hide_sync_progress()
+        
+        if error is not None:
+            print(f"❌ 从云端下载数据失败: {error}，使用本地数据")
+            self.sync_status_label.config(text="云端同步失败，使用本地数据", foreground="red")
+            # 上次未上传的修改仍在队列中，联网后重试
+            self.save_scheduler.schedule_upload_retry()
+        elif cloud_data is NOT_MODIFIED:
+            print("☁️ 云端没有新数据，使用本地数据")
+        elif self.is_sync_result(cloud_data):
+            # 启动同步已上传本地全部数据，队列中此前的修改都已同步
+            pending = self.sync_queue.pending_orders()
+            self.sync_queue.clear(queue_mark)
+            self.apply_sync_result(cloud_data)
+            self.drop_foreign_orders(keep=pending | (touched or set()))
+            if touched or meta_touched:
+                # 同步期间本地有修改，再上传一次
+                self.save_data()
+        elif cloud_data:
+            self.apply_cloud_data(cloud_data, touched, meta_touched)
+        else:
+            print("☁️ 云端没有数据，使用本地数据")
+        
+        if on_done:
+            on_done()
+    
+    def apply_cloud_data(self, cloud_data, touched=None, meta_touched=False):
+        """用云端数据替换本地数据，下载期间用户修改过的订单和厂家保留本地版本"""
+        orders = cloud_data.get("orders", {})
+        for order_name in touched or ():
+            if order_name in self.orders:
+                orders[order_name] = self.orders[order_name]
+            else:
+                orders.pop(order_name, None)
+        self.orders = orders
+        self.order_store.index.rebuild(self.orders)
+        if not meta_touched:
+            self.manufacturers = cloud_data.get("manufacturers", {})
+            self.bound_order_dir = cloud_data.get("bound_order_dir", "")
+        
+        # 保存到本地，云端数据整体替换本地，写入完整快照
+        self.save_data_local_only(full=True)
+        if touched or meta_touched:
+            # 本地在下载期间有修改，合并后重新上传
+            self.save_data()
+        else:
+            self.order_store.mark_synced()
+        print("✅ 已从云端成功下载并加载最新数据")
+        print(f"📊 下载数据包含: {len(self.orders)} 个订单, {len(self.manufacturers)} 个厂家")
+        self.refresh_after_sync()
+    
+    def is_sync_result(self, result):
+        """是否为双向同步（DeltaCloudSync.sync）的结果"""
+        return isinstance(result, dict) and "state" in result
+    
+    def apply_sync_result(self, result):
+        """在主线程应用双向同步的结果：其他设备的修改写入本地，无法自动合并的修改加入冲突列表
+        
+        同步在后台进行，期间本地又修改过的订单（修订号已变化）保留本地版本，云端版本作为冲突
+        """
+        if not self.is_sync_result(result):
+            return
+        was_synced = not self.order_store.has_unsynced_changes()
+        conflicts = list(result["conflicts"])
+        applied = 0
+        
+        for order_name, (order, seen_rev) in result["orders"].items():
+            current = self.orders.get(order_name)
+            archived = False
+            if current is None and self.order_archive:
+                current = self.order_archive.find_order(order_name)[1]
+                archived = current is not None
+            current_rev = current.get("rev", 0) if current is not None else None
+            if current_rev != seen_rev:
+                conflicts.append({"kind": "order", "name": order_name, "local": current, "remote": order})
+                continue
+            if archived:
+                self.order_archive.remove_orders([order_name])
+            if order is None:
+                if order_name in self.orders:
+                    del self.orders[order_name]
+                    self.order_store.mark_order_deleted(order_name)
+            else:
+                self.orders[order_name] = order
+                self.order_store.mark_order_changed(order_name, order)
+            applied += 1
+        
+        if result["meta"] is not None:
+            merged, seen = result["meta"]
+            meta_changed = False
+            for name in dict.fromkeys([*merged["manufacturers"], *seen["manufacturers"]]):
+                new, old = merged["manufacturers"].get(name), seen["manufacturers"].get(name)
+                if new == old:
+                    continue
+                if self.manufacturers.get(name) != old:
+                    conflicts.append({"kind": "manufacturer", "name": name,
+                                      "local": self.manufacturers.get(name), "remote": new})
+                elif new is None:
+                    del self.manufacturers[name]
+                    meta_changed = True
+                else:
+                    self.manufacturers[name] = new
+                    meta_changed = True
+            if merged["bound_order_dir"] != seen["bound_order_dir"]:
+                if self.bound_order_dir != seen["bound_order_dir"]:
+                    conflicts.append({"kind": "bound_order_dir", "name": "",
+                                      "local": self.bound_order_dir, "remote": merged["bound_order_dir"]})
+                else:
+                    self.bound_order_dir = merged["bound_order_dir"]
+                    meta_changed = True
+            if meta_changed:
+                self.order_store.mark_meta_changed()
+                applied += 1
+        
+        # 合并后的分片成为下次同步的共同基准
+        self.delta_sync.commit(result)
+        self.delta_sync.add_conflicts(conflicts)
+        if applied:
+            # 这些修改已在云端，只需写入本地
+            self.save_data_local_only()
+            if was_synced:
+                self.order_store.mark_synced()
+            print(f"✅ 已合并其他设备的修改: {applied} 项")
+            self.refresh_after_sync()
+        if conflicts:
+            print(f"⚠️ 有 {len(conflicts)} 个修改与其他设备冲突，已保留本地版本")
+        self.update_conflict_display()
+    
+    def drop_foreign_orders(self, keep=()):
+        """厂家客户端只同步本厂家的分区，其他厂家的订单不再保留在本机
+        
+        这些订单在云端各自的分区中，不受本机同步影响；keep中的订单有未上传的修改，暂时保留
+        """
+        manufacturer = self.delta_sync.manufacturer
+        if manufacturer is None:
+            return
+        foreign = [order_name for order_name, order in self.orders.items()
+                   if order.get("manufacturer") != manufacturer and order_name not in keep]
+        if not foreign:
+            return
+        was_synced = not self.order_store.has_unsynced_changes()
+        for order_name in foreign:
+            del self.orders[order_name]
+            self.order_store.mark_order_deleted(order_name)
+        self.save_data_local_only()
+        if was_synced:
+            self.order_store.mark_synced()
+        print(f"🗂️ 已从本机移除 {len(foreign)} 个其他厂家的订单（云端数据不受影响）")
+    
+    def refresh_after_sync(self):
+        """云端数据写入本地后刷新界面"""
+        if not self.data_loaded:
+            return
+        self.schedule_archive_old_orders()
+        self.order_keys.load(self.orders)
+        self.update_dashboard()
+        # 仪表板正在显示时重新绘制汇总和日历
+        calendar_buttons = getattr(self, 'calendar_buttons', {})
+        if calendar_buttons and next(iter(calendar_buttons.values())).winfo_exists():
+            self.show_dashboard_summary()
+    
+    def update_conflict_display(self):
+        """在云同步区域显示待处理的冲突数量"""
+        count = len(self.delta_sync.load_conflicts()) if self.delta_sync else 0
+        self.conflict_button.config(text=f"同步冲突 ({count})" if count else "同步冲突")
+    
+    def describe_conflict_value(self, kind, value):
+        """冲突一方的简要说明"""
+        if kind == "bound_order_dir":
+            return value or "(未绑定)"
+        if value is None:
+            return "已删除"
+        if kind == "manufacturer":
+            return f"单价 {value.get('unit_price', '')} / {value.get('permission', '读写')}"
+        paid = "已结账" if value.get("paid") else "未结账"
+        return f"¥{float(value.get('total_price', 0) or 0):.2f} {paid} {value.get('date', '')[:10]}"
+    
+    def show_sync_conflicts(self):
+        """列出与其他设备冲突的修改，逐条选择保留本地版本或使用云端版本"""
+        conflict_window = tk.Toplevel(self.root)
+        conflict_window.title("同步冲突")
+        conflict_window.geometry("760x400")
+        conflict_window.transient(self.root)
+        conflict_window.grab_set()
+        
+        ttk.Label(conflict_window, text="两台设备修改了同一项且内容不同，当前使用的是本地版本",
+                  font=('Arial', 10)).pack(pady=8)
+        
+        columns = ("类型", "名称", "本地版本", "云端版本", "发现时间")
+        tree = ttk.Treeview(conflict_window, columns=columns, show="headings", height=12)
+        for column, width in zip(columns, (70, 160, 190, 190, 130)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        kind_names = {"order": "订单", "manufacturer": "厂家", "bound_order_dir": "绑定目录"}
+        conflicts = {}
+        
+        def refresh():
+            tree.delete(*tree.get_children())
+            conflicts.clear()
+            for conflict in self.delta_sync.load_conflicts():
+                kind = conflict["kind"]
+                item = tree.insert("", tk.END, values=(
+                    kind_names.get(kind, kind), conflict["name"],
+                    self.describe_conflict_value(kind, conflict["local"]),
+                    self.describe_conflict_value(kind, conflict["remote"]),
+                    conflict.get("detected", "")))
+                conflicts[item] = conflict
+            self.update_conflict_display()
+        
+        def resolve(use_remote):
+            selected = tree.selection()
+            if not selected:
+                messagebox.showwarning("警告", "请先选择冲突项", parent=conflict_window)
+                return
+            for item in selected:
+                self.resolve_sync_conflict(conflicts[item], use_remote)
+            if use_remote:
+                self.save_data()
+                self.refresh_after_sync()
+            refresh()
+        
+        button_frame = ttk.Frame(conflict_window)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="保留本地版本", command=lambda: resolve(False)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="使用云端版本", command=lambda: resolve(True)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="关闭", command=conflict_window.destroy).pack(side=tk.LEFT, padx=5)
+        refresh()
+    
+    def resolve_sync_conflict(self, conflict, use_remote):
+        """处理一条冲突：使用云端版本时写回本地（随后上传），保留本地版本时只从列表中移除"""
+        kind, name, remote = conflict["kind"], conflict["name"], conflict["remote"]
+        if use_remote:
+            if kind == "order":
+                self.restore_archived_order(name)
+                if remote is not None:
+                    self.orders[name] = remote
+                    self.mark_order_changed(name)
+                elif name in self.orders:
+                    del self.orders[name]
+                    self.mark_order_deleted(name)
+            elif kind == "manufacturer":
+                if remote is not None:
+                    self.manufacturers[name] = remote
+                else:
+                    self.manufacturers.pop(name, None)
+                self.mark_meta_changed()
+            else:
+                self.bound_order_dir = remote or ""
+                self.mark_meta_changed()
+        self.delta_sync.remove_conflict(kind, name)
+    
+    def show_sync_progress(self, message):
+        """在云同步区域显示进度条"""
+        self.sync_status_label.config(text=message, foreground="#1976D2")
+        self.sync_progress.pack(fill=tk.X, pady=2, after=self.sync_status_label)
+        self.sync_progress.start(15)
+    
+    def hide_sync_progress(self):
+        self.sync_progress.stop()
+        self.sync_progress.pack_forget()
+        self.update_sync_status_display()
     
     def update_sync_status_display(self):
         """更新云同步状态显示"""
+        if self.cloud_sync is None:
+            return
         if self.cloud_sync.github_sync:
             repo = self.cloud_sync.github_sync.repo
-            if self.cloud_sync.auto_sync:
+            if self.sync_queue and self.sync_queue.failures() and self.sync_queue.has_pending():
+                # 上次上传失败，还有修改在待同步队列中
+                self.sync_status_label.config(
+                    text=f"已配置: {repo} ({self.sync_queue.pending_count()} 项待上传)", foreground="#E65100")
+            elif self.cloud_sync.auto_sync:
                 self.sync_status_label.config(text=f"已配置: {repo}", foreground="green")
             else:
                 self.sync_status_label.config(text=f"已配置: {repo} (手动)", foreground="blue")
@@ -186,6 +533,7 @@ class CustomOrderManagementApp:
                 elif self.is_admin:
                     self.root.title("定制拆单工作室记账工具 - 管理员")
                 
+                self.update_sync_scope()
                 return True
         except Exception as e:
             print(f"加载应用配置失败: {e}")
@@ -200,20 +548,63 @@ class CustomOrderManagementApp:
         if hasattr(self, 'manufacturers_tree') and self.manufacturers_tree.selection():
             self.manufacturers_tree.selection_remove(self.manufacturers_tree.selection())
     
+    def get_sync_compression(self):
+        """读取应用配置中云端数据的压缩方式（none / gzip / zstd），默认不压缩以兼容旧版本程序"""
+        try:
+            if os.path.exists(self.app_config_file):
+                with open(self.app_config_file, 'r', encoding='utf-8') as f:
+                    encoding = json.load(f).get("sync_compression", ENCODING_NONE)
+                if encoding in (ENCODING_NONE, ENCODING_GZIP, ENCODING_ZSTD):
+                    return encoding
+        except Exception as e:
+            print(f"读取压缩配置失败: {e}")
+        return ENCODING_NONE
+    
+    def get_storage_engine(self):
+        """读取应用配置中的本地存储引擎（json / sqlite）"""
+        try:
+            if os.path.exists(self.app_config_file):
+                with open(self.app_config_file, 'r', encoding='utf-8') as f:
+                    engine = json.load(f).get("storage_engine", "json")
+                if engine in ("json", "sqlite"):
+                    return engine
+        except Exception as e:
+            print(f"读取存储引擎配置失败: {e}")
+        return "json"
+    
+    def get_archive_after_days(self):
+        """读取应用配置中已结账订单移入存档的天数，0表示不存档"""
+        try:
+            if os.path.exists(self.app_config_file):
+                with open(self.app_config_file, 'r', encoding='utf-8') as f:
+                    return max(0, int(json.load(f).get("archive_after_days", 180)))
+        except Exception as e:
+            print(f"读取存档配置失败: {e}")
+        return 180
+    
     def save_app_config(self):
         """保存应用配置"""
         try:
             config = {
                 "current_manufacturer": self.current_manufacturer,
-                "is_admin": self.is_admin
+                "is_admin": self.is_admin,
+                "storage_engine": self.storage_engine,
+                "archive_after_days": self.archive_after_days,
+                "sync_compression": self.sync_compression
             }
             with open(self.app_config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, ensure_ascii=False, indent=2)
+            self.update_sync_scope()
             return True
         except Exception as e:
             print(f"保存应用配置失败: {e}")
             return False
     
+    def update_sync_scope(self):
+        """厂家身份只同步本厂家的订单分区和厂家列表，管理员同步全部数据"""
+        if self.delta_sync:
+            self.delta_sync.manufacturer = None if self.is_admin else self.current_manufacturer
+    
     def show_cloud_sync_config_first(self):
         """首先显示云同步配置对话框"""
         result = messagebox.askyesno(
@@ -481,22 +872,150 @@ class CustomOrderManagementApp:
         # 聚焦到密码输入框
         password_entry.focus()
     
-    def get_filtered_orders(self):
-        """获取根据权限过滤后的订单"""
+    def get_filtered_orders(self, date_from=None, date_to=None, manufacturer=None, paid=None):
+        """获取根据权限过滤后的订单，可再按厂家和结账状态筛选，指定日期区间时包含该区间内的存档订单"""
+        include_archive = date_from is not None or date_to is not None
         if self.is_admin:
             # 管理员可以看到所有订单
+            if include_archive or manufacturer is not None or paid is not None:
+                return self.find_orders(manufacturer, paid, date_from, date_to, include_archive)
             return self.orders
         elif self.current_manufacturer:
             # 厂家只能看到自己的订单
-            filtered_orders = {}
-            for order_id, order in self.orders.items():
-                if order.get('manufacturer') == self.current_manufacturer:
-                    filtered_orders[order_id] = order
-            return filtered_orders
+            if manufacturer is not None and manufacturer != self.current_manufacturer:
+                return {}
+            return self.find_orders(manufacturer=self.current_manufacturer, paid=paid, date_from=date_from,
+                                    date_to=date_to, include_archive=include_archive)
         else:
             # 未配置厂家，返回空
             return {}
     
+    def find_orders(self, manufacturer=None, paid=None, date_from=None, date_to=None, include_archive=False):
+        """按厂家、结账状态、日期区间[date_from, date_to)查找订单，按日期排序
+
+        SQLite存储且没有未保存的变更时走数据库索引查询，否则在本地存储维护的内存索引上求交集，
+        都不遍历全部订单。include_archive为True时同时读取存档中符合条件的订单（只读取涉及的年份）
+        """
+        if self.order_store is None:
+            # 本地存储尚未创建（数据路径还在解析），还没有任何订单
+            return {}
+        if include_archive and self.order_archive and self.order_archive.years():
+            archived = self.find_archived_orders(manufacturer, paid, date_from, date_to)
+            if archived:
+                found = dict(archived)
+                found.update(self.find_orders(manufacturer, paid, date_from, date_to))
+                return dict(sorted(found.items(), key=lambda item: item[1].get("date", "")))
+        
+        if hasattr(self.order_store, "query_order_names") and not self.order_store.has_pending_changes():
+            try:
+                names = self.order_store.query_order_names(manufacturer, paid, date_from, date_to)
+                return {name: self.orders[name] for name in names if name in self.orders}
+            except Exception as e:
+                print(f"索引查询失败，改用内存索引: {e}")
+        
+        names = self.order_store.index.select(manufacturer, paid, date_from, date_to)
+        return {name: self.orders[name] for name in names if name in self.orders}
+    
+    def get_period_date_range(self, date_format, period):
+        """把周期标识（如2024-03、2024-Q1、2024）转换为日期区间[开始, 结束)"""
+        if date_format == "%Y-Q":
+            year, quarter = period.split("-Q")
+            start_year, start_month = int(year), (int(quarter) - 1) * 3 + 1
+            end_year, end_month = start_year, start_month + 3
+        elif date_format == "%Y-%m":
+            year, month = period.split("-")
+            start_year, start_month = int(year), int(month)
+            end_year, end_month = start_year, start_month + 1
+        else:
+            start_year, start_month = int(period), 1
+            end_year, end_month = start_year + 1, 1
+        if end_month > 12:
+            end_year, end_month = end_year + 1, end_month - 12
+        return (f"{start_year:04d}-{start_month:02d}-01 00:00:00",
+                f"{end_year:04d}-{end_month:02d}-01 00:00:00")
+    
+    def find_archived_orders(self, manufacturer=None, paid=None, date_from=None, date_to=None):
+        """查找存档中的订单，已恢复为活跃订单的以内存中的为准"""
+        try:
+            archived = self.order_archive.find_orders(manufacturer, paid, date_from, date_to)
+        except Exception as e:
+            print(f"读取订单存档失败: {e}")
+            return {}
+        return {name: order for name, order in archived.items() if name not in self.orders}
+    
+    def schedule_archive_old_orders(self, delay_ms=3000):
+        """界面显示之后再存档旧订单，读取明细和写压缩存档不拖慢启动和同步后的刷新"""
+        if self.archive_after_id is None:
+            self.archive_after_id = self.root.after(delay_ms, self.archive_next_year)
+    
+    def archive_next_year(self):
+        """每次只存档一个年份的旧订单，年份之间让出主线程处理界面事件"""
+        self.archive_after_id = None
+        if self.root.grab_current() is not None or self.root.state() == "withdrawn":
+            # 有对话框或订单详情窗口打开时推迟，不存档正在查看或修改的订单
+            self.schedule_archive_old_orders(10000)
+            return
+        if self.archive_old_orders(one_year=True):
+            self.save_data_local_only()
+            self.update_dashboard()
+            self.schedule_archive_old_orders(50)
+    
+    def archive_old_orders(self, one_year=False):
+        """把超过存档期限的已结账订单移入按年份保存的冷存档，活跃数据只保留未结账和近期订单
+
+        :param one_year: True时只存档最早一个年份的订单
+        """
+        if not self.archive_after_days or not self.order_archive or self.order_store is None:
+            return 0
+        
+        cutoff = (datetime.now() - timedelta(days=self.archive_after_days)).strftime("%Y-%m-%d %H:%M:%S")
+        candidates = {}
+        first_year = None
+        # 索引中的已结账订单按日期排序，同一年份的订单相邻
+        for order_name in self.order_store.index.select(paid=True, date_to=cutoff):
+            order = self.orders.get(order_name)
+            if order is None or not order.get("date", "")[:4].isdigit():
+                continue
+            year = order["date"][:4]
+            if one_year and first_year is not None and year != first_year:
+                break
+            first_year = first_year or year
+            candidates[order_name] = order
+        if not candidates:
+            return 0
+        
+        try:
+            archived = self.order_archive.archive_orders(self.order_store.fill_bodies(candidates))
+        except Exception as e:
+            print(f"❌ 存档旧订单失败: {e}")
+            return 0
+        
+        # 存档只是本地的冷热分离，云端仍保存完整数据，不算作需要同步的修改
+        for order_name in archived:
+            del self.orders[order_name]
+            self.order_store.mark_order_archived(order_name)
+        print(f"📦 已将 {len(archived)} 个已结账旧订单移入存档")
+        return len(archived)
+    
+    def restore_archived_order(self, order_name):
+        """把存档中的订单恢复为活跃订单（查看、修改或删除存档订单时调用）"""
+        if order_name in self.orders or not self.order_archive:
+            return order_name in self.orders
+        try:
+            year, order = self.order_archive.find_order(order_name)
+            if order is None:
+                return False
+            self.order_archive.remove_orders([order_name])
+        except Exception as e:
+            print(f"恢复存档订单失败: {e}")
+            return False
+        self.orders[order_name] = order
+        # 只是从存档移回，内容没有变化，不增加修订号，也不算作需要同步的修改
+        self.order_store.mark_order_restored(order_name, order)
+        self.save_scheduler.request_save()
+        print(f"📦 已从 {year} 年存档恢复订单: {order_name}")
+        return True
+    
     def get_filtered_manufacturers(self):
         """获取根据权限过滤后的厂家"""
         if self.is_admin:
@@ -527,14 +1046,20 @@ class CustomOrderManagementApp:
         # 尝试从云端下载数据
         print("🔄 云同步配置完成，正在下载云端数据...")
         try:
-            cloud_data = self.cloud_sync.sync_from_cloud()
-            if cloud_data:
+            cloud_data = self.download_cloud_data(self.cloud_sync.sync_from_cloud)
+            if cloud_data is NOT_MODIFIED:
+                # 云端自上次同步以来没有变化，本地数据即为最新
+                print("☁️ 云端没有新数据，使用本地数据")
+                self.load_data_local_only()
+            elif cloud_data:
                 # 成功下载云端数据，使用云端数据
                 self.orders = cloud_data.get("orders", {})
+                self.order_store.index.rebuild(self.orders)
                 self.manufacturers = cloud_data.get("manufacturers", {})
                 self.bound_order_dir = cloud_data.get("bound_order_dir", "")
-                # 保存到本地（不进行云同步）
-                self.save_data_local_only()
+                # 保存到本地（不进行云同步），云端数据整体替换本地，写入完整快照
+                self.save_data_local_only(full=True)
+                self.order_store.mark_synced()
                 print("✅ 已从云端成功下载并加载最新数据")
                 print(f"📊 下载数据包含: {len(self.orders)} 个订单, {len(self.manufacturers)} 个厂家")
             else:
@@ -565,6 +1090,12 @@ class CustomOrderManagementApp:
         
         # 跳过重复的数据下载逻辑，直接继续后续流程
         self.data_loaded = True  # 标记数据已加载
+        
+        # 已结账的旧订单移入存档，活跃数据只保留未结账和近期订单（界面显示之后再进行）
+        self.schedule_archive_old_orders()
+        
+        # 一次性解析所有订单日期，之后排序和筛选只比较整数
+        self.order_keys.load(self.orders)
         print("数据加载完成，刷新界面...")
         self.update_dashboard()
         # 重新显示仪表板内容
@@ -659,8 +1190,15 @@ class CustomOrderManagementApp:
         self.sync_status_label = ttk.Label(sync_frame, text="未配置云同步", foreground="gray")
         self.sync_status_label.pack(fill=tk.X, pady=2)
         
-        ttk.Button(sync_frame, text="配置GitHub同步", command=self.setup_cloud_sync).pack(fill=tk.X, pady=2)
-        ttk.Button(sync_frame, text="立即同步", command=self.manual_sync).pack(fill=tk.X, pady=2)
+        # 后台同步进度条（同步时才显示）
+        self.sync_progress = ttk.Progressbar(sync_frame, mode='indeterminate')
+        
+        setup_sync_btn = ttk.Button(sync_frame, text="配置GitHub同步", command=self.setup_cloud_sync)
+        setup_sync_btn.pack(fill=tk.X, pady=2)
+        manual_sync_btn = ttk.Button(sync_frame, text="立即同步", command=self.manual_sync)
+        manual_sync_btn.pack(fill=tk.X, pady=2)
+        self.conflict_button = ttk.Button(sync_frame, text="同步冲突", command=self.show_sync_conflicts)
+        self.conflict_button.pack(fill=tk.X, pady=2)
         # 移除从云端下载按钮，统一使用智能同步逻辑
         
         # 菜单按钮
@@ -677,6 +1215,12 @@ class CustomOrderManagementApp:
         import_export_btn = ttk.Button(menu_frame, text="导入导出", command=self.show_import_export_panel)
         import_export_btn.pack(fill=tk.X, pady=5)
         
+        # 依赖本地存储和云同步的按钮在init_storage()完成前不可用
+        self.storage_controls = [setup_sync_btn, manual_sync_btn, self.conflict_button,
+                                 unpaid_btn, manufacturer_btn, import_export_btn]
+        for button in self.storage_controls:
+            button.config(state="disabled")
+        
         # 右侧内容显示区域
         self.content_frame = ttk.Frame(right_frame)
         self.content_frame.pack(fill=tk.BOTH, expand=True)
@@ -740,12 +1284,21 @@ class CustomOrderManagementApp:
             if "paid" not in order_data:
                 continue
             if not order_data["paid"]:
-                total_unpaid += order_data.get("total_price", 0)
+                total_unpaid += to_cents(order_data.get("total_price", 0))
                 unpaid_count += 1
             else:
-                total_paid += order_data.get("total_price", 0)
+                total_paid += to_cents(order_data.get("total_price", 0))
                 paid_count += 1
         
+        # 存档中的已结账订单按存档索引中的统计加入，不读取存档
+        if self.order_archive and (self.is_admin or self.current_manufacturer):
+            archived_count, archived_cents = self.order_archive.paid_totals(
+                None if self.is_admin else self.current_manufacturer)
+            paid_count += archived_count
+            total_paid += archived_cents
+        total_unpaid = cents_to_yuan(total_unpaid)
+        total_paid = cents_to_yuan(total_paid)
+        
         # 创建信息卡片
         cards_frame = ttk.Frame(summary_frame)
         cards_frame.pack(fill=tk.X)
@@ -789,14 +1342,11 @@ class CustomOrderManagementApp:
         years = set()
         from datetime import datetime
         for order in filtered_orders.values():
-            try:
-                ds = order.get('date', '')
-                if not ds:
-                    continue
-                d = datetime.strptime(ds, '%Y-%m-%d %H:%M:%S') if ' ' in ds else datetime.strptime(ds, '%Y-%m-%d')
-                years.add(d.year)
-            except Exception:
-                continue
+            year = self.order_keys.year(order)
+            if year is not None:
+                years.add(year)
+        if self.order_archive:
+            years.update(int(year) for year in self.order_archive.years())
         if not years:
             years = {datetime.now().year}
         year_list = sorted(list(years))
@@ -865,14 +1415,10 @@ class CustomOrderManagementApp:
         ttk.Label(sort_frame, text="厂家筛选:").pack(side=tk.LEFT, padx=(20, 5), pady=5)
         unpaid_manufacturer_var = tk.StringVar(value="全部厂家")
         
-        # 获取所有厂家列表
+        # 有未结账订单的厂家列表
         manufacturers = set(["全部厂家"])
-        for order_data in self.orders.values():
-            # 检查订单是否有支付状态字段
-            if "paid" not in order_data:
-                continue
-            if not order_data["paid"]:
-                manufacturers.add(order_data["manufacturer"])
+        manufacturers.update(manufacturer for manufacturer in self.order_store.index.manufacturers(paid=False)
+                             if manufacturer is not None)
         manufacturer_list = sorted(list(manufacturers))
         
         unpaid_manufacturer_combo = ttk.Combobox(sort_frame, textvariable=unpaid_manufacturer_var,
@@ -885,7 +1431,8 @@ class CustomOrderManagementApp:
         unpaid_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 创建表格
-        self.unpaid_tree = ttk.Treeview(unpaid_frame, columns=("订单号", "厂家", "面积", "总价", "日期"), show="headings")
+        # 只显示可见的行，订单很多时刷新和滚动也不卡
+        self.unpaid_tree = VirtualTreeview(unpaid_frame, columns=("订单号", "厂家", "面积", "总价", "日期"), show="headings")
         self.unpaid_tree.heading("订单号", text="订单号")
         self.unpaid_tree.heading("厂家", text="厂家")
         self.unpaid_tree.heading("面积", text="面积(㎡)")
@@ -897,52 +1444,37 @@ class CustomOrderManagementApp:
         self.unpaid_tree.column("面积", width=100)
         self.unpaid_tree.column("总价", width=100)
         self.unpaid_tree.column("日期", width=150)
-        
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(unpaid_frame, orient=tk.VERTICAL, command=self.unpaid_tree.yview)
-        self.unpaid_tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.unpaid_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         def update_unpaid_list():
             """更新未结账订单列表"""
-            # 清空现有项目
-            for item in self.unpaid_tree.get_children():
-                self.unpaid_tree.delete(item)
-            
-            # 收集未结账订单
-            unpaid_orders = []
+            # 收集未结账订单（厂家筛选）
             selected_manufacturer = unpaid_manufacturer_var.get()
+            manufacturer = None if selected_manufacturer == "全部厂家" else selected_manufacturer
+            unpaid_orders = list(self.find_orders(manufacturer=manufacturer, paid=False).values())
             
-            for order_data in self.orders.values():
-                # 检查订单是否有支付状态字段
-                if "paid" not in order_data:
-                    continue
-                if not order_data["paid"]:
-                    # 厂家筛选
-                    if selected_manufacturer == "全部厂家" or order_data.get("manufacturer") == selected_manufacturer:
-                        unpaid_orders.append(order_data)
-            
-            # 按时间排序
+            # 按时间排序（没有日期的订单按2000-01-01处理）
             sort_order = unpaid_sort_var.get()
-            try:
-                if sort_order == "最新在前":
-                    unpaid_orders.sort(key=lambda x: datetime.strptime(x.get("date", "2000-01-01 00:00:00"), "%Y-%m-%d %H:%M:%S"), reverse=True)
-                else:
-                    unpaid_orders.sort(key=lambda x: datetime.strptime(x.get("date", "2000-01-01 00:00:00"), "%Y-%m-%d %H:%M:%S"), reverse=False)
-            except (ValueError, KeyError):
+            default_key = self.order_keys.parse("2000-01-01 00:00:00")[0]
+            date_keys = [self.order_keys.timestamp(order) if "date" in order else default_key
+                         for order in unpaid_orders]
+            if None not in date_keys:
+                order_indexes = sorted(range(len(unpaid_orders)), key=date_keys.__getitem__,
+                                       reverse=(sort_order == "最新在前"))
+                unpaid_orders = [unpaid_orders[index] for index in order_indexes]
+            else:
                 # 如果日期格式有问题，按订单名排序
                 unpaid_orders.sort(key=lambda x: x.get("name", ""))
             
-            # 添加到列表
-            for order_data in unpaid_orders:
-                self.unpaid_tree.insert("", tk.END, values=(
-                    order_data.get("name", ""),
-                    order_data.get("manufacturer", ""),
-                    f"{order_data.get('total_area', 0):.2f}",
-                    f"{order_data.get('total_price', 0):.2f}",
-                    order_data.get("date", "")
-                ))
+            # 显示到列表（只生成可见行的内容）
+            self.unpaid_tree.set_rows(unpaid_orders, key=lambda order_data: order_data.get("name", ""),
+                                      values=lambda order_data: (
+                order_data.get("name", ""),
+                order_data.get("manufacturer", ""),
+                f"{order_data.get('total_area', 0):.2f}",
+                f"{order_data.get('total_price', 0):.2f}",
+                order_data.get("date", "")
+            ))
         
         # 绑定排序和筛选变化事件
         unpaid_sort_combo.bind("<<ComboboxSelected>>", lambda e: update_unpaid_list())
@@ -981,6 +1513,8 @@ class CustomOrderManagementApp:
                 
     def show_order_detail_popup(self, order):
         """显示订单详情弹窗"""
+        self.ensure_order_body(order)
+        
         # 隐藏主窗口
         self.root.withdraw()
         
@@ -1090,6 +1624,7 @@ class CustomOrderManagementApp:
         def mark_paid():
             if not order["paid"]:
                 order["paid"] = True
+                self.mark_order_changed(order["name"])
                 self.update_dashboard()
                 self.save_data()
                 messagebox.showinfo("成功", f"订单 {order['name']} 已结账")
@@ -1203,7 +1738,8 @@ class CustomOrderManagementApp:
         
     def create_order_tab(self):
         self.order_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.order_frame, text="订单管理")
+        # 订单查询依赖本地存储的索引，init_storage()完成后才能打开
+        self.notebook.add(self.order_frame, text="订单管理", state="disabled")
         
         # 筛选和排序框架
         filter_frame = ttk.LabelFrame(self.order_frame, text="筛选和排序条件")
@@ -1292,7 +1828,7 @@ class CustomOrderManagementApp:
         # 搜索范围选择
         self.search_scope_var = tk.StringVar(value="全部")
         search_scope_combo = ttk.Combobox(search_frame, textvariable=self.search_scope_var, 
-                                         values=["全部", "订单号", "客户名称", "厂家名称"], 
+                                         values=list(SEARCH_SCOPES), 
                                          state="readonly", width=12)
         search_scope_combo.pack(side=tk.LEFT, padx=5, pady=5)
         search_scope_combo.bind("<<ComboboxSelected>>", lambda e: self.on_search_change())
@@ -1339,11 +1875,16 @@ class CustomOrderManagementApp:
         self.search_result_label = ttk.Label(self.search_result_frame, text="", foreground="blue")
         self.search_result_label.pack(side=tk.LEFT, padx=5)
         
+        # 列表刷新耗时（查询 / 显示）
+        self.list_latency_label = ttk.Label(self.search_result_frame, text="", foreground="gray")
+        self.list_latency_label.pack(side=tk.RIGHT, padx=5)
+        
         # 订单列表
         orders_frame = ttk.LabelFrame(self.order_frame, text="订单列表")
         orders_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
-        self.orders_tree = ttk.Treeview(orders_frame, columns=("订单号", "厂家", "面积", "总价", "状态", "日期"), show="headings")
+        # 只显示可见的行，订单很多时刷新和滚动也不卡
+        self.orders_tree = VirtualTreeview(orders_frame, columns=("订单号", "厂家", "面积", "总价", "状态", "日期"), show="headings")
         self.orders_tree.heading("订单号", text="订单号")
         self.orders_tree.heading("厂家", text="厂家")
         self.orders_tree.heading("面积", text="面积(㎡)")
@@ -1357,11 +1898,6 @@ class CustomOrderManagementApp:
         self.orders_tree.column("总价", width=100)
         self.orders_tree.column("状态", width=100)
         self.orders_tree.column("日期", width=150)
-        
-        # 添加滚动条
-        orders_scrollbar = ttk.Scrollbar(orders_frame, orient=tk.VERTICAL, command=self.orders_tree.yview)
-        self.orders_tree.configure(yscroll=orders_scrollbar.set)
-        orders_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.orders_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # 添加管理按钮
@@ -1416,6 +1952,7 @@ class CustomOrderManagementApp:
             if parent_dir:
                 selected_parent_dir.set(parent_dir)
                 self.bound_order_dir = parent_dir
+                self.mark_meta_changed()
                 scan_subdirectories(parent_dir)
         
         def scan_subdirectories(parent_dir):
@@ -1685,6 +2222,7 @@ class CustomOrderManagementApp:
                 # 解析文件夹结构
                 self.parse_folder_structure(order_name, folder_path)
                 created_orders.append(order_name)
+                self.mark_order_changed(order_name)
                 
             except Exception as e:
                 failed_orders.append(f"{order_name}: {str(e)}")
@@ -1758,38 +2296,36 @@ class CustomOrderManagementApp:
                 self.manufacturer_filter_var.set("全部")
         
     def on_search_change(self, *args):
-        """搜索内容变化时的实时搜索"""
-        self.filter_orders()
+        """搜索内容变化时的实时搜索：停止输入片刻后在后台查询，新的输入取消之前的查询"""
+        if not hasattr(self, 'orders_tree'):
+            return
+        self.live_search.request(self.get_list_filters())
     
-    def search_orders(self, orders_data, search_text, search_scope):
-        """搜索订单数据"""
+    def search_orders(self, orders_data, search_text, search_scope, archived=None):
+        """搜索订单数据：在订单的全文索引上查找，不逐个比较订单
+
+        archived为orders_data中存档订单的订单名（不在全文索引中），为None时按self.orders判断
+        """
         if not search_text.strip():
             return orders_data
         
-        search_text = search_text.strip().lower()
-        filtered_orders = {}
-        
-        for order_id, order_data in orders_data.items():
-            match = False
-            
-            if search_scope == "全部":
-                # 搜索所有字段
-                if (search_text in order_id.lower() or 
-                    search_text in order_data.get("customer_name", "").lower() or
-                    search_text in order_data.get("manufacturer", "").lower()):
-                    match = True
-            elif search_scope == "订单号":
-                if search_text in order_id.lower():
-                    match = True
-            elif search_scope == "客户名称":
-                if search_text in order_data.get("customer_name", "").lower():
-                    match = True
-            elif search_scope == "厂家名称":
-                if search_text in order_data.get("manufacturer", "").lower():
-                    match = True
-            
-            if match:
-                filtered_orders[order_id] = order_data
+        fields = SEARCH_SCOPES.get(search_scope, SEARCH_SCOPES["全部"])
+        matched = self.order_store.index.text.search(search_text, fields)
+        if len(matched) < len(orders_data):
+            filtered_orders = {order_id: orders_data[order_id] for order_id in matched if order_id in orders_data}
+        else:
+            filtered_orders = {order_id: order_data for order_id, order_data in orders_data.items()
+                               if order_id in matched}
+        
+        if archived is None:
+            archived = set() if orders_data is self.orders else set(orders_data) - set(self.orders)
+        if archived:
+            # 存档中的订单（按月份筛选时加入）不在索引中，单独建立临时索引查找
+            archived = {order_id: orders_data[order_id] for order_id in archived}
+            archive_index = TextIndex()
+            archive_index.rebuild(archived)
+            for order_id in archive_index.search(search_text, fields):
+                filtered_orders[order_id] = archived[order_id]
         
         return filtered_orders
     
@@ -1815,19 +2351,16 @@ class CustomOrderManagementApp:
         
     def update_month_filter(self):
         """更新月度筛选器选项"""
+        if self.order_store is None:
+            return
         if hasattr(self, 'month_filter_var') and hasattr(self, 'month_filter_combo'):
-            # 收集所有订单的月份
+            # 有订单的月份从索引读取
             months = set(["全部"])
-            for order_data in self.orders.values():
-                try:
-                    # 检查订单是否有日期字段
-                    if "date" not in order_data:
-                        continue
-                    order_date = datetime.strptime(order_data["date"], "%Y-%m-%d %H:%M:%S")
-                    month_str = order_date.strftime("%Y-%m")
-                    months.add(month_str)
-                except (ValueError, KeyError):
-                    continue
+            months.update(format_month(month) for month in self.order_store.index.months())
+            
+            # 存档订单的月份从存档索引读取，不需要加载存档
+            if self.order_archive:
+                months.update(self.order_archive.months())
             
             # 按时间排序月份选项
             month_list = ["全部"] + sorted([m for m in months if m != "全部"], reverse=True)
@@ -1843,7 +2376,7 @@ class CustomOrderManagementApp:
         total_orders = len(filtered_orders)
         unpaid_orders = sum(1 for _, order_data in filtered_orders if "paid" in order_data and not order_data["paid"])
         total_area = sum(order_data.get("total_area", 0) for _, order_data in filtered_orders)
-        total_amount = sum(order_data.get("total_price", 0) for _, order_data in filtered_orders)
+        total_amount = cents_to_yuan(sum(to_cents(order_data.get("total_price", 0)) for _, order_data in filtered_orders))
         
         # 更新显示
         self.summary_labels["total_orders"].config(text=str(total_orders))
@@ -1851,86 +2384,96 @@ class CustomOrderManagementApp:
         self.summary_labels["total_area"].config(text=f"{total_area:.2f}㎡")
         self.summary_labels["total_amount"].config(text=f"¥{total_amount:.2f}")
     
+    def get_list_filters(self):
+        """在主线程读取订单列表的筛选条件、搜索内容和排序方式"""
+        return {
+            "status": self.status_filter_var.get() if hasattr(self, 'status_filter_var') else "全部",
+            "manufacturer": self.manufacturer_filter_var.get() if hasattr(self, 'manufacturer_filter_var') else "全部",
+            "month": self.month_filter_var.get() if hasattr(self, 'month_filter_var') else "全部",
+            "sort_order": self.time_sort_var.get() if hasattr(self, 'time_sort_var') else "最新在前",
+            "search_text": self.search_var.get() if hasattr(self, 'search_var') else "",
+            "search_scope": self.search_scope_var.get() if hasattr(self, 'search_scope_var') else "全部",
+        }
+    
     def update_orders_list(self):
         """Update order list (supports status, manufacturer, monthly filtering and time sorting)"""
-        # 清空现有项目
         if not hasattr(self, 'orders_tree'):
             return
-            
-        for item in self.orders_tree.get_children():
-            self.orders_tree.delete(item)
-            
-        # 获取筛选条件
-        selected_status = self.status_filter_var.get() if hasattr(self, 'status_filter_var') else "全部"
-        selected_manufacturer = self.manufacturer_filter_var.get() if hasattr(self, 'manufacturer_filter_var') else "全部"
-        selected_month = self.month_filter_var.get() if hasattr(self, 'month_filter_var') else "全部"
-        
-        # 获取排序方式
-        sort_order = self.time_sort_var.get() if hasattr(self, 'time_sort_var') else "最新在前"
         
-        # 获取权限过滤后的订单数据
-        permission_filtered_orders = self.get_filtered_orders()
+        # 直接刷新时取消还在进行的实时搜索，避免旧的搜索结果覆盖列表
+        self.live_search.cancel()
+        params = self.get_list_filters()
+        started = time.perf_counter()
+        filtered_orders = self.collect_orders_list(params)
+        self.show_orders_list(filtered_orders, params, (time.perf_counter() - started) * 1000)
+    
+    def prepare_list_query(self, params):
+        """在主线程按权限、状态、厂家和月份筛选订单，返回加入了结果快照的查询参数
+
+        筛选在订单索引上求交集（选择了月份时包含该月的存档订单），结果浅拷贝为新的字典，
+        后台线程只读取快照和全文索引，不访问主线程会修改的self.orders、订单索引和存档缓存
+        """
+        date_from = date_to = None
+        if params["month"] != "全部":
+            date_from, date_to = self.get_period_date_range("%Y-%m", params["month"])
+        manufacturer = None if params["manufacturer"] == "全部" else params["manufacturer"]
+        paid = {"未结账": False, "已结账": True}.get(params["status"])
+        orders = self.get_filtered_orders(date_from, date_to, manufacturer, paid)
+        archived = set() if orders is self.orders or date_from is None else set(orders) - set(self.orders)
+        return dict(params, orders=dict(orders), archived=archived)
+    
+    def collect_orders_list(self, params, is_cancelled=lambda: False):
+        """按筛选条件查找并排序订单，返回[(订单名, 订单)]，已取消时返回None
+
+        不访问界面控件；实时搜索时在后台线程执行，此时params中是prepare_list_query()取出的快照
+        """
+        if "orders" not in params:
+            params = self.prepare_list_query(params)
+        permission_filtered_orders = params["orders"]
+        if is_cancelled():
+            return None
         
         # 应用搜索过滤
-        search_text = self.search_var.get() if hasattr(self, 'search_var') else ""
-        search_scope = self.search_scope_var.get() if hasattr(self, 'search_scope_var') else "全部"
+        search_text = params["search_text"]
         if search_text.strip():
-            permission_filtered_orders = self.search_orders(permission_filtered_orders, search_text, search_scope)
-        
-        # 收集符合筛选条件的订单
-        filtered_orders = []
-        for order_name, order_data in permission_filtered_orders.items():
-            # 应用状态筛选
-            if "paid" not in order_data:
-                continue
-            if selected_status == "未结账" and order_data["paid"]:
-                continue
-            elif selected_status == "已结账" and not order_data["paid"]:
-                continue
-            
-            # 应用厂家筛选
-            if selected_manufacturer != "全部" and order_data.get("manufacturer") != selected_manufacturer:
-                continue
-            
-            # 应用月度筛选
-            if selected_month != "全部":
-                try:
-                    order_date = datetime.strptime(order_data["date"], "%Y-%m-%d %H:%M:%S")
-                    order_month = order_date.strftime("%Y-%m")
-                    if order_month != selected_month:
-                        continue
-                except ValueError:
-                    continue
-            
-            filtered_orders.append((order_name, order_data))
-        
-        # 按时间排序
-        try:
-            if sort_order == "最新在前":
-                # 按日期降序排序（最新的在前）
-                filtered_orders.sort(key=lambda x: datetime.strptime(x[1]["date"], "%Y-%m-%d %H:%M:%S"), reverse=True)
-            else:
-                # 按日期升序排序（最旧的在前）
-                filtered_orders.sort(key=lambda x: datetime.strptime(x[1]["date"], "%Y-%m-%d %H:%M:%S"), reverse=False)
-        except ValueError:
+            permission_filtered_orders = self.search_orders(permission_filtered_orders, search_text,
+                                                            params["search_scope"], params["archived"])
+            if is_cancelled():
+                return None
+        
+        # 没有结账状态的订单不显示
+        filtered_orders = [(order_name, order_data) for order_name, order_data in permission_filtered_orders.items()
+                           if "paid" in order_data]
+        
+        # 按时间排序（比较解析好的整数时间戳）
+        date_keys = [self.order_keys.timestamp(order_data) for _, order_data in filtered_orders]
+        if None not in date_keys:
+            # 最新在前为降序，最旧在前为升序
+            order_indexes = sorted(range(len(filtered_orders)), key=date_keys.__getitem__,
+                                   reverse=(params["sort_order"] == "最新在前"))
+            filtered_orders = [filtered_orders[index] for index in order_indexes]
+        else:
             # 如果日期格式有问题，按订单名排序
             filtered_orders.sort(key=lambda x: x[0])
-        
-        # 添加排序后的订单到列表
-        for order_name, order_data in filtered_orders:
-            status = "已结账" if order_data.get("paid", False) else "未结账"
-            self.orders_tree.insert("", tk.END, values=(
-                order_name,
-                order_data.get("manufacturer", ""),
-                f"{order_data.get('total_area', 0):.2f}",
-                f"{order_data.get('total_price', 0):.2f}",
-                status,
-                order_data.get("date", "")
-            ))
+        return filtered_orders
+    
+    def show_orders_list(self, filtered_orders, params, query_ms=0):
+        """在主线程把查找结果显示到订单列表，并显示查询和显示的耗时"""
+        started = time.perf_counter()
+        
+        # 显示排序后的订单（列表只创建可见的行，与现有的行比较后只修改变化的行，保留滚动位置和选中）
+        self.orders_tree.set_rows(filtered_orders, values=lambda row: (
+            row[0],
+            row[1].get("manufacturer", ""),
+            f"{row[1].get('total_area', 0):.2f}",
+            f"{row[1].get('total_price', 0):.2f}",
+            "已结账" if row[1].get("paid", False) else "未结账",
+            row[1].get("date", "")
+        ))
         
         # 更新搜索结果统计
         if hasattr(self, 'search_result_label'):
-            search_text = self.search_var.get() if hasattr(self, 'search_var') and self.search_var.get().strip() else ""
+            search_text = params["search_text"].strip()
             if search_text:
                 self.search_result_label.config(
                     text=f"🔍 搜索结果: {len(filtered_orders)} 个订单 (搜索: '{search_text}')"
@@ -1942,6 +2485,12 @@ class CustomOrderManagementApp:
         
         # 更新汇总数据
         self.update_summary_data(filtered_orders)
+        
+        if hasattr(self, 'list_latency_label'):
+            show_ms = (time.perf_counter() - started) * 1000
+            changed_rows = sum(self.orders_tree.changes.values())
+            self.list_latency_label.config(
+                text=f"⏱ 查询 {query_ms:.0f}ms / 显示 {show_ms:.0f}ms（更新 {changed_rows} 行）")
             
     def mark_as_paid(self):
         """标记为已结账"""
@@ -1958,6 +2507,7 @@ class CustomOrderManagementApp:
             order_name = self.unpaid_tree.item(item, "values")[0]
             if order_name in self.orders:
                 self.orders[order_name]["paid"] = True
+                self.mark_order_changed(order_name)
                 
         self.update_orders_list()
         self.update_dashboard()
@@ -1984,6 +2534,7 @@ class CustomOrderManagementApp:
             order_name = self.orders_tree.item(item, "values")[0]
             if order_name in self.orders:
                 self.orders[order_name]["paid"] = True
+                self.mark_order_changed(order_name)
                 
         self.update_orders_list()
         self.update_dashboard()
@@ -2014,8 +2565,10 @@ class CustomOrderManagementApp:
         # 删除订单
         deleted_count = 0
         for order_name in order_names:
-            if order_name in self.orders:
+            # 存档中的订单先恢复再删除
+            if self.restore_archived_order(order_name):
                 del self.orders[order_name]
+                self.mark_order_deleted(order_name)
                 deleted_count += 1
         
         # 更新界面
@@ -2032,10 +2585,11 @@ class CustomOrderManagementApp:
             
         item = selected[0]
         order_name = self.orders_tree.item(item, "values")[0]
-        if order_name not in self.orders:
+        # 存档中的订单恢复为活跃订单后再打开，修改按普通订单保存
+        if not self.restore_archived_order(order_name):
             return
             
-        order = self.orders[order_name]
+        order = self.ensure_order_body(self.orders[order_name])
         
         # 隐藏主窗口
         self.root.withdraw()
@@ -2096,6 +2650,7 @@ class CustomOrderManagementApp:
                 order["unit_price"] = unit_price
                 # 重新计算总价
                 order["total_price"] = order["total_area"] * unit_price
+                self.mark_order_changed(order_name)
                 self.update_orders_list()
                 self.update_dashboard()
                 self.save_data()
@@ -2128,6 +2683,7 @@ class CustomOrderManagementApp:
                 
             # 保存结账状态
             order["paid"] = status_var.get()
+            self.mark_order_changed(order_name)
             self.update_orders_list()
             self.update_dashboard()
             self.save_data_local_only()
@@ -2138,15 +2694,7 @@ class CustomOrderManagementApp:
         def manual_sync():
             """手动同步数据到云端"""
             try:
-                from datetime import datetime
-                data = {
-                    "orders": self.orders,
-                    "manufacturers": self.manufacturers,
-                    "bound_order_dir": self.bound_order_dir,
-                    "timestamp": datetime.now().isoformat(),
-                    "version": "1.0"
-                }
-                self.cloud_sync.save_and_sync(data, sync_to_cloud=True)
+                self.sync_data_to_cloud(self.build_save_data())
                 messagebox.showinfo("同步成功", "数据已同步到云端")
             except Exception as e:
                 messagebox.showerror("同步失败", f"数据同步失败: {str(e)}")
@@ -2217,6 +2765,7 @@ class CustomOrderManagementApp:
                 order["rooms"][room_name] = {"name": room_name, "cabinets": {}}
                 
                 # 更新界面
+                self.mark_order_changed(order_name)
                 self.save_data_local_only()
                 refresh_rooms_list()
                 add_room_window.destroy()
@@ -2268,6 +2817,7 @@ class CustomOrderManagementApp:
             order["total_price"] = total_area * order["unit_price"]
             
             # 更新界面
+            self.mark_order_changed(order_name)
             self.update_orders_list()
             self.update_dashboard()
             self.save_data_local_only()
@@ -2396,6 +2946,7 @@ class CustomOrderManagementApp:
             order["total_price"] = total_area * order["unit_price"]
             
             # 更新界面
+            self.mark_order_changed(order_name)
             self.update_orders_list()
             self.update_dashboard()
             self.save_data_local_only()
@@ -2410,6 +2961,7 @@ class CustomOrderManagementApp:
         def save_order_data():
             """保存订单数据的确定按钮功能"""
             # 保存所有数据
+            self.mark_order_changed(order_name)
             self.update_orders_list()
             self.update_dashboard()
             self.save_data_local_only()
@@ -2548,6 +3100,7 @@ class CustomOrderManagementApp:
                 order["total_price"] = total_area * order["unit_price"]
                 
                 # 更新界面
+                self.mark_order_changed(order_name)
                 self.update_orders_list()
                 self.update_dashboard()
                 self.save_data_local_only()
@@ -2577,6 +3130,7 @@ class CustomOrderManagementApp:
                     order["total_price"] = total_area * order["unit_price"]
                     
                     # 更新界面
+                    self.mark_order_changed(order_name)
                     self.update_orders_list()
                     self.update_dashboard()
                     self.save_data_local_only()
@@ -2638,6 +3192,7 @@ class CustomOrderManagementApp:
             order["total_price"] = total_area * order["unit_price"]
             
             # 更新界面
+            self.mark_order_changed(order_name)
             self.update_orders_list()
             self.update_dashboard()
             self.save_data()
@@ -2747,6 +3302,7 @@ class CustomOrderManagementApp:
             "unit_price": unit_price,
             "permission": "读写"  # 默认权限：读写
         }
+        self.mark_meta_changed()
         
         # 清空输入框
         self.clear_manufacturer_input()
@@ -2809,6 +3365,7 @@ class CustomOrderManagementApp:
             "unit_price": unit_price,
             "permission": permission
         }
+        self.mark_meta_changed()
         
         messagebox.showinfo("成功", f"厂家 '{new_name}' 更新成功")
         self.clear_manufacturer_input()
@@ -3057,11 +3614,10 @@ class CustomOrderManagementApp:
         item = selected[0]
         manufacturer_name = self.manufacturers_tree.item(item, "values")[0]
         
-        # 检查是否有使用该厂家的订单
+        # 检查是否有使用该厂家的订单（包括存档中的订单）
         related_orders = []
-        for order_id, order_data in self.orders.items():
-            if order_data.get("manufacturer") == manufacturer_name:
-                related_orders.append(f"{order_id}: {order_data.get('customer_name', '未知客户')}")
+        for order_id, order_data in self.find_orders(manufacturer=manufacturer_name, include_archive=True).items():
+            related_orders.append(f"{order_id}: {order_data.get('customer_name', '未知客户')}")
         
         if related_orders:
             # 显示相关订单信息
@@ -3078,6 +3634,7 @@ class CustomOrderManagementApp:
         if messagebox.askyesno("确认删除", f"确定要删除厂家 '{manufacturer_name}' 吗？\n\n此操作不可撤销。"):
             if manufacturer_name in self.manufacturers:
                 del self.manufacturers[manufacturer_name]
+                self.mark_meta_changed()
                 self.clear_manufacturer_input()  # 清空输入框
                 self.update_dashboard()
                 self.save_data()
@@ -3354,7 +3911,7 @@ class CustomOrderManagementApp:
         if not self.check_export_permission():
             return
             
-        if not self.orders:
+        if not self.orders and not (self.order_archive and self.order_archive.count()):
             messagebox.showwarning("警告", "没有订单数据可导出")
             return
         
@@ -3366,19 +3923,23 @@ class CustomOrderManagementApp:
         
         ttk.Label(format_window, text="请选择导出格式:", font=("Arial", 12)).pack(pady=20)
         
+        def get_all_orders():
+            # 包含存档中的订单
+            return list(self.find_orders(include_archive=True).values())
+        
         def export_excel():
-            orders_list = list(self.orders.values())
+            orders_list = get_all_orders()
             self.export_orders_to_excel(orders_list, "所有订单")
             format_window.destroy()
             messagebox.showinfo("成功", "所有订单已导出")
         
         def export_pdf():
-            orders_list = list(self.orders.values())
+            orders_list = get_all_orders()
             self.export_orders_to_pdf(orders_list, "所有订单")
             format_window.destroy()
             
         def export_json():
-            orders_list = list(self.orders.values())
+            orders_list = get_all_orders()
             self.export_orders_to_json(orders_list, "所有订单")
             format_window.destroy()
         
@@ -3392,7 +3953,7 @@ class CustomOrderManagementApp:
         
     def export_unpaid_orders(self):
         """导出未结账订单"""
-        unpaid_orders = [order for order in self.orders.values() if not order["paid"]]
+        unpaid_orders = list(self.find_orders(paid=False).values())
         
         if not unpaid_orders:
             messagebox.showinfo("信息", "没有未结账订单")
@@ -3475,8 +4036,7 @@ class CustomOrderManagementApp:
                 return
                 
             manufacturer_name = manufacturer_listbox.get(selection[0])
-            manufacturer_orders = [order for order in self.orders.values() 
-                                 if order["manufacturer"] == manufacturer_name]
+            manufacturer_orders = list(self.find_orders(manufacturer=manufacturer_name, include_archive=True).values())
             
             if not manufacturer_orders:
                 messagebox.showinfo("信息", f"厂家 {manufacturer_name} 没有订单")
@@ -3541,8 +4101,7 @@ class CustomOrderManagementApp:
                 return
                 
             manufacturer_name = manufacturer_listbox.get(selection[0])
-            manufacturer_unpaid_orders = [order for order in self.orders.values() 
-                                        if order["manufacturer"] == manufacturer_name and not order["paid"]]
+            manufacturer_unpaid_orders = list(self.find_orders(manufacturer=manufacturer_name, paid=False).values())
             
             if not manufacturer_unpaid_orders:
                 messagebox.showinfo("信息", f"厂家 {manufacturer_name} 没有未结账订单")
@@ -3672,17 +4231,21 @@ class CustomOrderManagementApp:
         
         # 统计可用数据
         available_periods = set()
-        for order in self.orders.values():
-            try:
-                order_date = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S")
+        order_months = {self.order_keys.month(order) for order in self.orders.values()}
+        order_months.discard(None)
+        for month in order_months:
+            if date_format == "%Y-Q":
+                available_periods.add(f"{month // 100}-Q{(month % 100 - 1) // 3 + 1}")
+            elif date_format == "%Y-%m":
+                available_periods.add(format_month(month))
+            else:
+                available_periods.add(str(month // 100))
+        if self.order_archive:
+            for month in self.order_archive.months():
                 if date_format == "%Y-Q":
-                    quarter = (order_date.month - 1) // 3 + 1
-                    period_key = f"{order_date.year}-Q{quarter}"
+                    available_periods.add(f"{month[:4]}-Q{(int(month[5:7]) - 1) // 3 + 1}")
                 else:
-                    period_key = order_date.strftime(date_format)
-                available_periods.add(period_key)
-            except ValueError:
-                continue
+                    available_periods.add(month if date_format == "%Y-%m" else month[:4])
         
         info_text = f"当前系统中可用的{period_name}数据：\n{', '.join(sorted(available_periods)) if available_periods else '无数据'}"
         info_label = ttk.Label(info_frame, text=info_text, font=("Arial", 9), foreground="gray")
@@ -3713,24 +4276,9 @@ class CustomOrderManagementApp:
         """导出指定周期的数据"""
         from datetime import datetime
         
-        # 筛选符合条件的订单
-        filtered_orders = []
-        for order in self.orders.values():
-            try:
-                order_date = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S")
-                
-                # 根据格式生成周期标识
-                if date_format == "%Y-Q":
-                    quarter = (order_date.month - 1) // 3 + 1
-                    period_key = f"{order_date.year}-Q{quarter}"
-                else:
-                    period_key = order_date.strftime(date_format)
-                    
-                if period_key == selected_period:
-                    filtered_orders.append(order)
-                    
-            except ValueError:
-                continue
+        # 筛选符合条件的订单（按日期区间查询）
+        date_from, date_to = self.get_period_date_range(date_format, selected_period)
+        filtered_orders = list(self.find_orders(date_from=date_from, date_to=date_to, include_archive=True).values())
         
         if not filtered_orders:
             messagebox.showinfo("提示", f"所选{period_name} {selected_period} 中没有找到订单数据")
@@ -3746,7 +4294,7 @@ class CustomOrderManagementApp:
         stats = {
             'count': len(orders),
             'total_area': sum(order['total_area'] for order in orders),
-            'total_price': sum(order['total_price'] for order in orders),
+            'total_price': cents_to_yuan(sum(to_cents(order['total_price']) for order in orders)),
             'paid_count': sum(1 for order in orders if order['paid']),
             'unpaid_count': sum(1 for order in orders if not order['paid'])
         }
@@ -4176,6 +4724,7 @@ class CustomOrderManagementApp:
             
     def export_orders_to_excel(self, orders, export_type):
         """导出订单列表到Excel"""
+        self.ensure_order_bodies(orders)
         try:
             from openpyxl import Workbook
             from openpyxl.styles import Font, PatternFill
@@ -4307,6 +4856,7 @@ class CustomOrderManagementApp:
             
     def export_order_to_excel(self, order):
         """导出订单到Excel"""
+        self.ensure_order_body(order)
         try:
             from openpyxl import Workbook
             from openpyxl.styles import Font
@@ -4415,6 +4965,7 @@ class CustomOrderManagementApp:
     
     def export_order_to_pdf(self, order):
         """导出订单到PDF"""
+        self.ensure_order_body(order)
         try:
             from reportlab.lib.pagesizes import A4
             from reportlab.lib import colors
@@ -4512,6 +5063,7 @@ class CustomOrderManagementApp:
     
     def export_orders_to_pdf(self, orders, export_type):
         """导出多个订单到PDF"""
+        self.ensure_order_bodies(orders)
         try:
             from reportlab.lib.pagesizes import A4
             from reportlab.lib import colors
@@ -4604,6 +5156,7 @@ class CustomOrderManagementApp:
             
     def export_order_to_json(self, order):
         """导出单个订单到JSON文件"""
+        self.ensure_order_body(order)
         try:
             import json
             from datetime import datetime
@@ -4635,6 +5188,7 @@ class CustomOrderManagementApp:
             
     def export_orders_to_json(self, orders, export_type):
         """导出多个订单到JSON文件"""
+        self.ensure_order_bodies(orders)
         try:
             import json
             from datetime import datetime
@@ -4696,42 +5250,190 @@ class CustomOrderManagementApp:
             
     def save_data(self):
         """Save data to file (with cloud sync)"""
-        from datetime import datetime
-        data = {
+        # 合并短时间内的多次保存，由后台线程写盘并上传到云端；
+        # 开启自动同步时只写本地，由定时同步合并上传
+        self.save_scheduler.request_save(upload=not self.is_auto_sync_enabled())
+        self.unsaved_changes = False
+    
+    def is_auto_sync_enabled(self):
+        return bool(self.cloud_sync and self.cloud_sync.github_sync and getattr(self.cloud_sync, "auto_sync", False))
+    
+    def is_sync_busy(self):
+        """自动同步是否需要推迟：有模态对话框（导出、配置等）、启动同步或后台保存尚未完成"""
+        return (not self.data_loaded
+                or self.root.grab_current() is not None
+                or self.sync_down_touched is not None
+                or self.save_scheduler.pending_tasks > 0)
+    
+    def build_save_data(self):
+        """组装需要保存的完整数据"""
+        return {
             "orders": self.orders,
             "manufacturers": self.manufacturers,
             "bound_order_dir": self.bound_order_dir,
             "timestamp": datetime.now().isoformat(),  # 添加时间戳
-            "version": "1.0"  # 数据版本
+            "version": data_codec.EXPANDED_VERSION  # 内存和云端使用完整格式，写盘时转为紧凑格式
         }
+    
+    def build_upload_data(self):
+        """后台上传用的数据快照（主线程调用）：只深拷贝待同步的订单和厂家数据
+
+        changed_orders记录快照包含的订单名（不在orders中的为已删除），
+        上传时其余订单视为与本地存储中的相同，需要时从本地存储读取
+        """
+        changed, deleted, _ = self.order_store.peek_changes()
+        pending = self.sync_queue.pending_changes() if self.sync_queue else None
+        order_names = set(changed) | set(deleted) | (pending[0] if pending else set())
+        data = self.build_save_data()
+        data["orders"] = {order_name: copy.deepcopy(self.orders[order_name])
+                          for order_name in order_names if order_name in self.orders}
+        data["manufacturers"] = copy.deepcopy(self.manufacturers)
+        data["changed_orders"] = order_names
+        return data
+    
+    def upload_data_to_cloud(self, data):
+        """与云端同步并上传，返回同步结果；未配置云同步时返回False"""
+        if not self.cloud_sync.github_sync:
+            return False
+        if self.sync_down_touched is not None:
+            # 后台下载尚未完成，合并云端数据后再上传，避免本地旧数据覆盖云端
+            return False
+        return self.sync_with_cloud(data)
+    
+    def sync_with_cloud(self, data, create=True):
+        """与云端双向同步（可在后台线程调用），返回同步结果，需在主线程用apply_sync_result应用
+        
+        create为False且云端还没有分片数据时返回None
+        """
+        snapshot = data.get("changed_orders")  # 只包含待同步订单的快照（见build_upload_data）
+        
+        def load_orders(order_names=None):
+            """云端保存完整数据：未加载的订单明细从本地读取补全，存档中的订单一并上传"""
+            if order_names is None:
+                orders = self.order_archive.read_all() if self.order_archive else {}
+                active = data["orders"]
+                if snapshot is not None:
+                    # 快照之外的订单从本地存储只读地读取（快照包含所有尚未写入的变更）
+                    active = {order_name: order for order_name, order in self.order_store.read_orders().items()
+                              if order_name not in snapshot}
+                    active.update(data["orders"])
+                orders.update(self.order_store.fill_bodies(active))
+                return orders
+            orders = self.order_store.fill_bodies(
+                {order_name: data["orders"][order_name] for order_name in order_names if order_name in data["orders"]})
+            for order_name in order_names:
+                if order_name not in orders and self.order_archive:
+                    order = self.order_archive.read_order(order_name)[1]
+                    if order is not None:
+                        orders[order_name] = order
+            return orders
+        
+        # 合并其他设备的修改；只读取待同步队列中修改过的订单，其余分片沿用上次同步的哈希
+        touched = self.sync_queue.pending_changes()
+        if touched is not None and snapshot is not None:
+            # 生成快照之后才记录的修改不在快照中，留到下次同步
+            touched = (touched[0] & snapshot, touched[1])
+        return self.delta_sync.sync(data, create=create, touched=touched, load_orders=load_orders)
+    
+    def download_cloud_data(self, full_download):
+        """从云端下载数据：优先按分片增量下载，云端还没有分片数据时使用原来的整体下载
+
+        云端自上次同步以来没有变化时返回NOT_MODIFIED
+        """
+        cloud_data = self.delta_sync.download_data()
+        if cloud_data is None:
+            print("☁️ 云端没有分片数据，使用整体下载")
+            cloud_data = full_download()
+        return cloud_data
+    
+    def ensure_order_body(self, order):
+        """按需加载订单明细（房间和柜体），返回订单本身"""
+        if "rooms" not in order:
+            order["rooms"] = self.order_store.load_body(order["name"])
+            if self.orders.get(order["name"]) is order:
+                # 明细中的房间名称加入搜索索引
+                self.order_store.index.update(order["name"], order)
+        return order
+    
+    def ensure_order_bodies(self, orders):
+        """为多个订单加载明细（导出等需要完整数据的场景）"""
+        for order in orders:
+            self.ensure_order_body(order)
+    
+    def show_save_error(self, message):
+        """后台保存失败时提示用户"""
+        messagebox.showerror("错误", f"{message}\n文件路径: {self.data_file}")
+            
+    def sync_data_to_cloud(self, data):
+        """立即保存到本地并上传到云端，未配置云同步时只保存本地"""
+        self.save_scheduler.flush()
+        generation = self.order_store.generation
+        self.sync_queue.add(*self.order_store.peek_changes())
+        queue_mark = self.sync_queue.mark()
+        self.order_store.save(data)
+        self.unsaved_changes = False
         try:
-            # 使用简化的云同步保存数据
-            self.cloud_sync.save_and_sync(data, sync_to_cloud=True)
+            success = self.upload_data_to_cloud(data)
         except Exception as e:
-            messagebox.showerror("错误", f"保存数据失败: {str(e)}")
-            
-    def save_data_local_only(self):
-        """仅保存数据到本地文件，不进行云同步"""
-        from datetime import datetime
-        data = {
-            "orders": self.orders,
-            "manufacturers": self.manufacturers,
-            "bound_order_dir": self.bound_order_dir,
-            "timestamp": datetime.now().isoformat(),  # 添加时间戳
-            "version": "1.0"  # 数据版本
-        }
+            # 修改已保存在本地并留在待同步队列中，联网后自动上传
+            self.sync_queue.record_failure(e)
+            self.save_scheduler.schedule_upload_retry()
+            self.update_sync_status_display()
+            raise
+        if success:
+            self.order_store.mark_synced(generation)
+            self.sync_queue.clear(queue_mark)
+            self.apply_sync_result(success)
+        return success
+    
+    def mark_order_changed(self, order_name):
+        """记录订单新增或修改，保存时只写入变更的订单"""
+        order = self.orders.get(order_name)
+        if order is not None:
+            # 修订号：同步时据此判断订单在上传之后是否又被修改
+            order["rev"] = order.get("rev", 0) + 1
+            if "rooms" in order:
+                # 概要中记录房间名称，明细未加载时也能按房间搜索
+                order["room_names"] = list(order["rooms"])
+        self.order_store.mark_order_changed(order_name, order)
+        self.unsaved_changes = True
+        if self.sync_down_touched is not None:
+            self.sync_down_touched.add(order_name)
+    
+    def mark_order_deleted(self, order_name):
+        """记录订单删除"""
+        self.order_store.mark_order_deleted(order_name)
+        self.unsaved_changes = True
+        if self.sync_down_touched is not None:
+            self.sync_down_touched.add(order_name)
+    
+    def mark_meta_changed(self):
+        """记录厂家列表或绑定目录变更"""
+        self.order_store.mark_meta_changed()
+        self.unsaved_changes = True
+        if self.sync_down_touched is not None:
+            self.sync_down_meta_touched = True
+            
+    def save_data_local_only(self, full=False):
+        """仅保存数据到本地文件，不进行云同步
+
+        :param full: True时写入完整快照（如云端数据整体替换本地后）
+        """
+        data = self.build_save_data()
         try:
             # 确保目录存在
             os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
             
-            # 使用简化的云同步保存（仅本地）
-            success = self.cloud_sync.save_and_sync(data, sync_to_cloud=False)
-            if success:
+            if full:
+                # 整体替换本地数据时立即写入完整快照
+                self.save_scheduler.flush()
+                self.order_store.save(data, full=True)
                 print(f"数据已保存到本地: {self.data_file}")
-                self.unsaved_changes = False
-                return True
             else:
-                return False
+                # 合并短时间内的多次保存，由后台线程追加变更日志
+                self.save_scheduler.request_save()
+            self.unsaved_changes = False
+            return True
                 
         except Exception as e:
             error_msg = f"保存数据失败: {str(e)}\n文件路径: {self.data_file}"
@@ -4752,20 +5454,13 @@ class CustomOrderManagementApp:
                 self.local_timestamp = data.get("timestamp", "")  # 保存本地时间戳
             else:
                 # 如果本地文件不存在，创建初始数据
-                from datetime import datetime
-                initial = {
-                    "orders": {}, 
-                    "manufacturers": {}, 
-                    "bound_order_dir": "",
-                    "timestamp": datetime.now().isoformat(),
-                    "version": "1.0"
-                }
-                with open(self.data_file, "w", encoding="utf-8") as f:
-                    json.dump(initial, f, ensure_ascii=False, indent=2)
                 self.orders = {}
                 self.manufacturers = {}
                 self.bound_order_dir = ""
+                initial = self.build_save_data()
+                self.order_store.save(initial, full=True)
                 self.local_timestamp = initial["timestamp"]
+            self.order_store.index.rebuild(self.orders)
         except Exception as e:
             messagebox.showerror("错误", f"加载数据失败: {str(e)}")
             self.local_timestamp = ""
@@ -4773,58 +5468,62 @@ class CustomOrderManagementApp:
     def load_data_local_only(self):
         """Load data from local file only, no cloud sync"""
         try:
-            if os.path.exists(self.data_file):
-                # 使用简化的云同步，仅本地加载
-                data = self.cloud_sync.load_and_sync(strategy="local")
-                
-                if data:
-                    self.orders = data.get("orders", {})
-                    self.manufacturers = data.get("manufacturers", {})
-                    self.bound_order_dir = data.get("bound_order_dir", "")
-                    self.local_timestamp = data.get("timestamp", "")  # 保存本地时间戳
+            # 加载快照并重放变更日志
+            data = self.order_store.load()
+            
+            if data:
+                self.orders = data.get("orders", {})
+                self.manufacturers = data.get("manufacturers", {})
+                self.bound_order_dir = data.get("bound_order_dir", "")
+                self.local_timestamp = data.get("timestamp", "")  # 保存本地时间戳
             else:
                 # 如果本地文件不存在，创建初始数据
-                from datetime import datetime
-                initial = {
-                    "orders": {}, 
-                    "manufacturers": {}, 
-                    "bound_order_dir": "",
-                    "timestamp": datetime.now().isoformat(),
-                    "version": "1.0"
-                }
-                with open(self.data_file, "w", encoding="utf-8") as f:
-                    json.dump(initial, f, ensure_ascii=False, indent=2)
                 self.orders = {}
                 self.manufacturers = {}
                 self.bound_order_dir = ""
+                initial = self.build_save_data()
+                self.order_store.save(initial, full=True)
                 self.local_timestamp = initial["timestamp"]
+            self.order_store.index.rebuild(self.orders)
         except Exception as e:
             messagebox.showerror("错误", f"加载数据失败: {str(e)}")
             self.local_timestamp = ""
     
     def on_closing(self):
         """程序关闭时的处理"""
+        if self.order_store is None:
+            # 数据路径尚未确定，还没有加载任何数据
+            self.close_window()
+            return
         try:
-            # 检查是否有未保存的更改
-            current_data = {
-                "orders": self.orders,
-                "manufacturers": self.manufacturers,
-                "bound_order_dir": self.bound_order_dir
-            }
-            
-            # 读取当前本地文件数据
-            local_data = None
-            if os.path.exists(self.data_file):
-                try:
-                    with open(self.data_file, "r", encoding="utf-8") as f:
-                        local_data = json.load(f)
-                except:
-                    pass
-            
-            # 比较数据是否有变化
-            data_changed = (local_data != current_data)
+            # 根据数据版本号判断是否有更改，无需重新读取和比较数据文件
+            if self.cloud_sync.github_sync:
+                # 已配置云同步：自上次同步以来有修改
+                data_changed = self.order_store.has_unsynced_changes()
+            else:
+                # 未配置云同步：还有尚未写入本地的修改（存档移动不算修改，退出前直接写入）
+                data_changed = self.order_store.has_pending_edits()
             
-            if data_changed:
+            if data_changed and not self.cloud_sync.github_sync:
+                # 未配置云同步，只询问是否保存到本地
+                result = messagebox.askyesnocancel(
+                    "保存更改", 
+                    "数据有尚未保存的更改，是否保存到本地？\n\n"
+                    "是：保存后退出\n"
+                    "否：不保存直接退出\n"
+                    "取消：返回程序"
+                )
+                
+                if result is True:  # 用户选择保存
+                    self.save_data_local_only()
+                    self.save_scheduler.flush()
+                    self.close_window()
+                elif result is False:  # 用户选择不保存
+                    # 放弃尚未取出的修改，只等已交给后台线程的写入完成
+                    self.save_scheduler.wait()
+                    self.close_window()
+                # else: 用户选择取消，不执行任何操作
+            elif data_changed:
                 # 有未保存的更改，询问用户
                 result = messagebox.askyesnocancel(
                     "保存更改", 
@@ -4836,9 +5535,13 @@ class CustomOrderManagementApp:
                 
                 if result is True:  # 用户选择保存
                     self.save_data_with_exit_sync()
-                    self.root.destroy()
+                    # 写入同步时合并进来的其他设备的修改
+                    self.save_scheduler.flush()
+                    self.close_window()
                 elif result is False:  # 用户选择不保存
-                    self.root.destroy()
+                    # 不同步到云端，但已在本地排队的保存仍需写完
+                    self.save_scheduler.flush()
+                    self.close_window()
                 # else: 用户选择取消，不执行任何操作
             else:
                 # 没有更改，但如果有云同步配置，询问是否强制同步
@@ -4852,31 +5555,43 @@ class CustomOrderManagementApp:
                     if result:
                         self.save_data_with_exit_sync()
                 
-                self.root.destroy()
+                self.save_scheduler.flush()
+                self.close_window()
                 
         except Exception as e:
             print(f"退出时出错: {e}")
-            self.root.destroy()
+            try:
+                self.save_scheduler.flush()
+            except Exception as flush_error:
+                print(f"退出时写入待保存数据失败: {flush_error}")
+            self.close_window()
+    
+    def close_window(self):
+        """关闭窗口并释放云同步的长连接"""
+        try:
+            sync_http.close_session()
+        except Exception as e:
+            print(f"关闭云同步连接失败: {e}")
+        self.root.destroy()
     
     def save_data_with_exit_sync(self):
         """退出时的保存和同步"""
         try:
-            from datetime import datetime
-            data = {
-                "orders": self.orders,
-                "manufacturers": self.manufacturers,
-                "bound_order_dir": self.bound_order_dir,
-                "timestamp": datetime.now().isoformat(),  # 添加时间戳
-                "version": "1.0"  # 数据版本
-            }
+            data = self.build_save_data()
             
             # 强制保存到本地和云端
-            self.cloud_sync.save_and_sync(data, sync_to_cloud=True)
+            self.sync_data_to_cloud(data)
             print("退出时数据已保存并同步")
             
         except Exception as e:
             print(f"退出保存时出错: {e}")
-            messagebox.showerror("错误", f"保存数据失败: {str(e)}")
+            if self.sync_queue and self.sync_queue.has_pending() and not self.order_store.has_pending_changes():
+                # 本地已保存，只是上传失败
+                messagebox.showwarning("同步失败", f"数据已保存到本地，但上传到云端失败: {str(e)}\n\n"
+                                                   f"未上传的 {self.sync_queue.pending_count()} 项修改已记录，"
+                                                   "下次启动联网后会自动上传")
+            else:
+                messagebox.showerror("错误", f"保存数据失败: {str(e)}")
     
     def setup_cloud_sync(self):
         """配置云同步"""
@@ -4935,6 +5650,13 @@ class CustomOrderManagementApp:
         interval_label = ttk.Label(sync_options_frame, text="注意：启用后会每5分钟自动同步一次", foreground="gray")
         interval_label.pack(anchor=tk.W, pady=2)
         
+        # 压缩选项
+        compress_var = tk.BooleanVar(value=self.sync_compression != ENCODING_NONE)
+        compress_check = ttk.Checkbutton(sync_options_frame, text="压缩上传的数据（大量订单时同步更快）", variable=compress_var)
+        compress_check.pack(anchor=tk.W, pady=2)
+        ttk.Label(sync_options_frame, text="注意：开启压缩后，其他设备需要使用新版本程序才能读取云端数据",
+                  foreground="gray").pack(anchor=tk.W, pady=2)
+        
         def test_connection():
             """测试连接"""
             token = token_entry.get().strip()
@@ -4945,25 +5667,19 @@ class CustomOrderManagementApp:
                 return
             
             try:
-                # 临时创建同步对象测试连接
-                test_sync = GitHubSync(token, repo)
-                result = test_sync.download_data()
-                
-                if result is not None:
-                    messagebox.showinfo("成功", "连接成功！可以正常同步数据。")
+                # 读取仓库信息即可验证Token和写入权限，不需要上传再删除测试文件
+                response = sync_http.get(f"{sync_http.GITHUB_API}/repos/{repo}",
+                                         headers=sync_http.github_headers(token))
+                if response.status_code == 401:
+                    messagebox.showerror("错误", "连接失败: GitHub Token无效或已过期")
+                elif response.status_code == 404:
+                    messagebox.showerror("错误", "连接失败: 找不到仓库，或Token没有访问该仓库的权限")
                 else:
-                    # 尝试上传一个测试文件
-                    test_data = {"test": "connection"}
-                    if test_sync.upload_data(test_data):
-                        messagebox.showinfo("成功", "连接成功！可以正常上传数据。")
-                        # 删除测试文件
-                        requests.delete(
-                            f"https://api.github.com/repos/{repo}/contents/data.json",
-                            headers=test_sync.headers,
-                            json={"message": "删除测试文件", "sha": "test"}
-                        )
+                    response.raise_for_status()
+                    if response.json().get("permissions", {}).get("push"):
+                        messagebox.showinfo("成功", "连接成功！可以正常同步数据。")
                     else:
-                        messagebox.showwarning("注意", "连接成功，但仓库为空。这是正常现象。")
+                        messagebox.showwarning("注意", "连接成功，但Token没有该仓库的写入权限，无法上传数据。")
                         
             except Exception as e:
                 messagebox.showerror("错误", f"连接失败: {str(e)}\n\n"
@@ -4986,6 +5702,16 @@ class CustomOrderManagementApp:
                 self.cloud_sync.setup_github(token, repo, path)
                 self.cloud_sync.auto_sync = auto_sync_var.get()
                 
+                # 压缩方式保存在应用配置中，下次上传分片时生效（配置文件中可改为zstd）
+                if not compress_var.get():
+                    self.sync_compression = ENCODING_NONE
+                elif self.sync_compression == ENCODING_NONE:
+                    self.sync_compression = ENCODING_GZIP
+                self.delta_sync.encoding = self.sync_compression
+                if os.path.exists(self.app_config_file):
+                    # 首次运行时应用配置在厂家配置完成后一并保存
+                    self.save_app_config()
+                
                 # 更新状态显示
                 if auto_sync_var.get():
                     self.sync_status_label.config(text=f"已配置: {repo}", foreground="green")
@@ -5017,7 +5743,7 @@ class CustomOrderManagementApp:
         ttk.Button(button_frame, text="取消", command=config_window.destroy).pack(side=tk.LEFT, padx=5)
     
     def manual_sync(self):
-        """Manual sync data (timestamp-based intelligent sync)"""
+        """Manual sync data (per-order three-way merge with other devices)"""
         # 检查同步权限
         if not self.check_sync_permission("手动同步"):
             return
@@ -5030,35 +5756,37 @@ class CustomOrderManagementApp:
             print("🔄 开始手动数据同步...")
             
             # 添加时间戳到当前数据
-            from datetime import datetime
-            current_time = datetime.now().isoformat()
-            data = {
-                "orders": self.orders,
-                "manufacturers": self.manufacturers,
-                "bound_order_dir": self.bound_order_dir,
-                "timestamp": current_time,
-                "version": "1.0"
-            }
+            data = self.build_save_data()
+            current_time = data["timestamp"]
             
             print(f"📊 当前数据时间戳: {current_time}")
             print(f"📈 订单数量: {len(self.orders)}, 厂家数量: {len(self.manufacturers)}")
             
-            # 使用简化的智能同步逻辑
+            # 逐个订单与云端三方合并，不再按整体时间戳取舍
             print("🔄 正在执行智能同步...")
             
-            # 先保存当前数据到云端
-            success = self.cloud_sync.save_and_sync(data, sync_to_cloud=True)
+            # 保存当前数据，合并其他设备的修改后上传到云端
+            success = self.sync_data_to_cloud(data)
             
             if success:
                 print("✅ 数据同步完成！已上传到云端")
-                messagebox.showinfo("成功", "数据同步完成！已上传到云端")
+                conflicts = len(success["conflicts"]) if self.is_sync_result(success) else 0
+                if conflicts:
+                    messagebox.showwarning("同步完成", f"数据同步完成，有 {conflicts} 个修改与其他设备冲突\n\n"
+                                                      "已保留本地版本，可在「同步冲突」中查看和处理")
+                else:
+                    messagebox.showinfo("成功", "数据同步完成！已上传到云端")
             else:
                 print("❌ 同步失败")
                 messagebox.showerror("错误", "数据同步失败")
                 
         except Exception as e:
             print(f"❌ 手动同步失败: {e}")
-            messagebox.showerror("错误", f"手动同步失败: {str(e)}")
+            if self.sync_queue.has_pending() and not self.order_store.has_pending_changes():
+                messagebox.showwarning("同步失败", f"上传到云端失败: {str(e)}\n\n"
+                                                   "修改已保存在本地并加入待同步队列，网络恢复后会自动上传")
+            else:
+                messagebox.showerror("错误", f"手动同步失败: {str(e)}")
                 
     def import_orders_from_excel(self):
         """从Excel文件导入订单"""
@@ -5162,7 +5890,7 @@ class CustomOrderManagementApp:
         
         for order in imported_orders:
             if order["name"] in self.orders:
-                existing_order = self.orders[order["name"]]
+                existing_order = self.ensure_order_body(self.orders[order["name"]])
                 # 深度对比订单数据
                 if self.compare_order_data(existing_order, order):
                     # 数据相同，跳过
@@ -5223,6 +5951,7 @@ class CustomOrderManagementApp:
                 order["date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 
             self.orders[order["name"]] = order
+            self.mark_order_changed(order["name"])
             total_imported += 1
         
         # 保存数据并更新界面
@@ -5677,24 +6406,15 @@ class CustomOrderManagementApp:
         
         # 创建表格
         columns = ("订单号", "厂家", "面积", "总价", "状态", "日期")
-        orders_tree = ttk.Treeview(list_frame, columns=columns, show="headings", selectmode="extended")
+        orders_tree = VirtualTreeview(list_frame, columns=columns, show="headings", selectmode="extended")
         
         for col in columns:
             orders_tree.heading(col, text=col)
             orders_tree.column(col, width=100)
-        
-        # 添加滚动条
-        tree_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=orders_tree.yview)
-        orders_tree.configure(yscrollcommand=tree_scrollbar.set)
-        tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         orders_tree.pack(fill=tk.BOTH, expand=True)
         
         def update_order_list():
             """Update order list based on filter criteria (supports sorting)"""
-            # 清空现有项目
-            for item in orders_tree.get_children():
-                orders_tree.delete(item)
-            
             status_filter = status_var.get()
             manufacturer_filter = manufacturer_var.get()
             sort_order = time_sort_var.get()
@@ -5724,16 +6444,15 @@ class CustomOrderManagementApp:
                 # 如果日期格式有问题，按订单名排序
                 filtered_orders.sort(key=lambda x: x["name"])
             
-            # 添加到列表
-            for order in filtered_orders:
-                orders_tree.insert("", tk.END, values=(
-                    order["name"],
-                    order["manufacturer"],
-                    f"{order['total_area']:.2f}",
-                    f"{order['total_price']:.2f}",
-                    "已结账" if order["paid"] else "未结账",
-                    order["date"][:10]
-                ))
+            # 显示到列表（只生成可见行的内容）
+            orders_tree.set_rows(filtered_orders, key=lambda order: order["name"], values=lambda order: (
+                order["name"],
+                order["manufacturer"],
+                f"{order['total_area']:.2f}",
+                f"{order['total_price']:.2f}",
+                "已结账" if order["paid"] else "未结账",
+                order["date"][:10]
+            ))
         
         # 绑定筛选条件变化事件
         status_combo.bind("<<ComboboxSelected>>", lambda e: update_order_list())
@@ -5749,11 +6468,10 @@ class CustomOrderManagementApp:
         
         # 全选/取消全选按钮
         def select_all():
-            for item in orders_tree.get_children():
-                orders_tree.selection_add(item)
+            orders_tree.select_all()
                 
         def deselect_all():
-            orders_tree.selection_remove(orders_tree.selection())
+            orders_tree.clear_selection()
         
         ttk.Button(button_frame, text="全选", command=select_all).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="取消全选", command=deselect_all).pack(side=tk.LEFT, padx=5)
@@ -5892,32 +6610,21 @@ class CustomOrderManagementApp:
             
             # 计算每日盈利数据
             daily_profits = {}
-            if hasattr(self, 'orders') and self.orders:
+            if hasattr(self, 'orders') and (self.orders or self.order_archive):
                 # 处理订单数据，支持字典和列表两种格式
                 orders_data = self.orders.values() if isinstance(self.orders, dict) else self.orders
+                # 所选月份的存档订单
+                orders_data = list(orders_data) + list(self.get_calendar_archived_orders(current_year, current_month).values())
+                selected_month = current_year * 100 + current_month
                 for order in orders_data:
-                    try:
-                        # 尝试不同的日期格式
-                        date_str = order.get('date', '')
-                        if not date_str:
-                            continue
-                        
-                        # 处理不同的日期格式
-                        if ' ' in date_str:  # 包含时间的格式
-                            order_date = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-                        else:  # 只有日期的格式
-                            order_date = datetime.strptime(date_str, '%Y-%m-%d')
-                        
-                        if (order_date.year == current_year and 
-                            order_date.month == current_month):
-                            day = order_date.day
-                            if day not in daily_profits:
-                                daily_profits[day] = 0
-                            # 尝试不同的金额字段名
-                            amount = order.get('total_price', order.get('amount', 0))
-                            daily_profits[day] += float(amount)
-                    except (ValueError, KeyError, TypeError):
+                    # 日期格式（含时间或只有日期）已在解析日期键时校验
+                    if self.order_keys.month(order) != selected_month:
                         continue
+                    day = int(order['date'][8:10])
+                    # 尝试不同的金额字段名，按分累加避免小数误差
+                    amount = order.get('total_price', order.get('amount', 0))
+                    daily_profits[day] = daily_profits.get(day, 0) + to_cents(amount)
+                daily_profits = {day: cents_to_yuan(cents) for day, cents in daily_profits.items()}
             
             # 清空所有按钮
             for (week, day), btn in self.calendar_buttons.items():
@@ -5968,6 +6675,13 @@ class CustomOrderManagementApp:
         except Exception as e:
             print(f"更新盈利日历失败: {e}")
     
+    def get_calendar_archived_orders(self, year, month):
+        """盈利日历所选月份的存档订单，只在该月有存档时读取对应年份"""
+        if not self.order_archive or f"{year:04d}-{month:02d}" not in self.order_archive.months():
+            return {}
+        date_from, date_to = self.get_period_date_range("%Y-%m", f"{year:04d}-{month:02d}")
+        return self.find_archived_orders(date_from=date_from, date_to=date_to)
+    
     def show_day_profit_detail(self, day, profit):
         """Show daily profit details"""
         try:
@@ -5980,26 +6694,16 @@ class CustomOrderManagementApp:
             
             # 获取当日订单
             day_orders = []
-            if hasattr(self, 'orders') and self.orders:
+            if hasattr(self, 'orders') and (self.orders or self.order_archive):
                 # 处理订单数据，支持字典和列表两种格式
                 orders_data = self.orders.values() if isinstance(self.orders, dict) else self.orders
+                # 所选月份的存档订单
+                orders_data = list(orders_data) + list(self.get_calendar_archived_orders(year, month).values())
+                selected_month = year * 100 + month
                 for order in orders_data:
-                    try:
-                        # 尝试不同的日期格式
-                        date_str = order.get('date', '')
-                        if not date_str:
-                            continue
-                        
-                        # 处理不同的日期格式
-                        if ' ' in date_str:  # 包含时间的格式
-                            order_date = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-                        else:  # 只有日期的格式
-                            order_date = datetime.strptime(date_str, '%Y-%m-%d')
-                        
-                        if order_date.date() == target_date.date():
-                            day_orders.append(order)
-                    except (ValueError, KeyError, TypeError):
-                        continue
+                    # 日期格式（含时间或只有日期）已在解析日期键时校验
+                    if self.order_keys.month(order) == selected_month and int(order['date'][8:10]) == day:
+                        day_orders.append(order)
             
             # 创建详情窗口
             detail_window = tk.Toplevel(self.root)
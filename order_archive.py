@@ -0,0 +1,196 @@
+import os
+import gzip
+
+import data_codec
+from order_index import to_cents
+from order_store import atomic_write
+
+
+class OrderArchive:
+    """已结账旧订单的冷存档
+
+    按订单年份保存为 archive/<年份>.json.gz（压缩、带校验和的紧凑格式），
+    archive/index.json 记录每年的订单数、月份和各厂家的结账金额，列出可选年份/月份
+    和统计已结账总额时不需要读取存档。
+    存档只在按年份或月份查询时读取，读过的年份缓存在内存中。
+    """
+
+    def __init__(self, data_file):
+        self.archive_dir = os.path.join(os.path.dirname(data_file), "archive")
+        self.index_file = os.path.join(self.archive_dir, "index.json")
+        self.index = self._load_index()
+        self.cache = {}  # 年份 -> {订单名: 订单}
+
+    def years(self):
+        return sorted(self.index)
+
+    def months(self):
+        """存档中所有订单的月份（YYYY-MM）"""
+        months = set()
+        for entry in self.index.values():
+            months.update(entry.get("months", []))
+        return months
+
+    def count(self):
+        return sum(entry.get("count", 0) for entry in self.index.values())
+
+    def paid_totals(self, manufacturer=None):
+        """存档中已结账订单的(订单数, 总金额分)，manufacturer不为None时只统计该厂家"""
+        count = cents = 0
+        for entry in self.index.values():
+            for name, (year_count, year_cents) in entry.get("paid", {}).items():
+                if manufacturer is None or name == manufacturer:
+                    count += year_count
+                    cents += year_cents
+        return count, cents
+
+    def find_orders(self, manufacturer=None, paid=None, date_from=None, date_to=None):
+        """按条件查找存档订单，只读取与日期区间[date_from, date_to)重叠的年份"""
+        if paid is False:
+            # 存档中只有已结账订单
+            return {}
+
+        found = {}
+        for year in self.years():
+            if date_from is not None and year < date_from[:4]:
+                continue
+            if date_to is not None and f"{year}-01-01 00:00:00" >= date_to:
+                continue
+            for order_name, order in self.load_year(year).items():
+                if manufacturer is not None and order.get("manufacturer") != manufacturer:
+                    continue
+                order_date = order.get("date", "")
+                if date_from is not None and order_date < date_from:
+                    continue
+                if date_to is not None and order_date >= date_to:
+                    continue
+                found[order_name] = order
+        return found
+
+    def find_order(self, order_name):
+        """按订单名查找存档订单，返回(年份, 订单)，找不到时返回(None, None)"""
+        for year in self.years():
+            order = self.load_year(year).get(order_name)
+            if order is not None:
+                return year, order
+        return None, None
+
+    def read_order(self, order_name):
+        """与find_order()相同，但不使用也不填充缓存（可在后台线程调用）"""
+        for year in self.years():
+            order = self.read_year(year).get(order_name)
+            if order is not None:
+                return year, order
+        return None, None
+
+    def load_year(self, year):
+        """读取一年的存档（带缓存）"""
+        if year not in self.cache:
+            self.cache[year] = self.read_year(year)
+        return self.cache[year]
+
+    def read_year(self, year):
+        """从磁盘读取一年的存档，不使用缓存（可在后台线程调用）"""
+        path = self._year_file(year)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "rb") as f:
+            raw = gzip.decompress(f.read())
+        packed = data_codec.loads(data_codec.unseal(raw))
+        return {name: data_codec.unpack_order(name, order) for name, order in packed.get("orders", {}).items()}
+
+    def read_all(self):
+        """读取全部存档订单，不使用缓存（上传到云端时在后台线程调用）"""
+        orders = {}
+        for year in self.years():
+            orders.update(self.read_year(year))
+        return orders
+
+    def archive_orders(self, orders):
+        """把订单（含房间和柜体）写入对应年份的存档，返回已写入存档的订单名
+
+        与存档中内容相同的订单不会重写存档文件
+        """
+        by_year = {}
+        for order_name, order in orders.items():
+            by_year.setdefault(order.get("date", "")[:4], {})[order_name] = order
+
+        archived = []
+        for year, year_orders in sorted(by_year.items()):
+            existing = self.load_year(year)
+            changed = {name: order for name, order in year_orders.items() if existing.get(name) != order}
+            if changed:
+                merged = dict(existing)
+                merged.update(changed)
+                self._write_year(year, merged)
+            archived.extend(year_orders)
+        return archived
+
+    def remove_orders(self, order_names):
+        """从存档中移除订单（恢复为活跃订单或删除时调用）"""
+        order_names = set(order_names)
+        for year in self.years():
+            orders = self.load_year(year)
+            if order_names.intersection(orders):
+                self._write_year(year, {name: order for name, order in orders.items() if name not in order_names})
+
+    def _write_year(self, year, orders):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = self._year_file(year)
+        if orders:
+            payload = data_codec.dumps({
+                "orders": {name: data_codec.pack_order(order) for name, order in orders.items()},
+                "version": data_codec.SCHEMA_VERSION
+            })
+            atomic_write(path, gzip.compress(data_codec.seal(payload)))
+            self.index[year] = self._index_entry(orders)
+        else:
+            if os.path.exists(path):
+                os.remove(path)
+            self.index.pop(year, None)
+        self.cache[year] = orders
+        self._save_index()
+
+    def _save_index(self):
+        atomic_write(self.index_file, data_codec.dumps({"years": self.index}))
+
+    @staticmethod
+    def _index_entry(orders):
+        """一年存档的索引项：订单数、月份、各厂家已结账订单的[订单数, 总金额分]"""
+        paid = {}
+        for order in orders.values():
+            if order.get("paid"):
+                totals = paid.setdefault(order.get("manufacturer") or "", [0, 0])
+                totals[0] += 1
+                totals[1] += to_cents(order.get("total_price", 0))
+        return {
+            "count": len(orders),
+            "months": sorted({order.get("date", "")[:7] for order in orders.values()}),
+            "paid": paid
+        }
+
+    def _year_file(self, year):
+        return os.path.join(self.archive_dir, f"{year}.json.gz")
+
+    def _load_index(self):
+        """读取存档索引，索引缺失或损坏时根据存档文件重建"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, "rb") as f:
+                    return data_codec.loads(f.read()).get("years", {})
+        except Exception as e:
+            print(f"读取存档索引失败，重新生成: {e}")
+
+        index = {}
+        if os.path.isdir(self.archive_dir):
+            for file_name in os.listdir(self.archive_dir):
+                if not file_name.endswith(".json.gz"):
+                    continue
+                year = file_name[:-len(".json.gz")]
+                try:
+                    orders = self.read_year(year)
+                except Exception as e:
+                    print(f"读取存档 {file_name} 失败: {e}")
+                    continue
+                index[year] = self._index_entry(orders)
+        return index
@@ -0,0 +1,398 @@
+import time
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+# "YYYY-MM-DD" -> 距1970-01-01的天数，同一天的订单共用
+_day_numbers = {}
+
+# 订单搜索范围（界面选项） -> 搜索的字段
+SEARCH_SCOPES = {
+    "全部": ("name", "customer", "manufacturer", "room"),
+    "订单号": ("name",),
+    "客户名称": ("customer",),
+    "厂家名称": ("manufacturer",),
+    "房间名称": ("room",),
+}
+
+
+def parse_date(date_str):
+    """把"YYYY-MM-DD HH:MM:SS"或"YYYY-MM-DD"解析为(时间戳秒, 年月YYYYMM)，格式不对时返回None
+
+    只做切片和整数转换，比strptime快得多；时间戳按本地时间计算，只用于排序和比较
+    """
+    if not isinstance(date_str, str) or len(date_str) not in (10, 19):
+        return None
+    if date_str[4] != "-" or date_str[7] != "-":
+        return None
+    try:
+        day_str = date_str[:10]
+        days = _day_numbers.get(day_str)
+        if days is None:
+            day = datetime(int(day_str[0:4]), int(day_str[5:7]), int(day_str[8:10]))
+            days = _day_numbers[day_str] = day.toordinal() - EPOCH_ORDINAL
+        if len(date_str) == 19:
+            if date_str[10] != " " or date_str[13] != ":" or date_str[16] != ":":
+                return None
+            hour, minute, second = int(date_str[11:13]), int(date_str[14:16]), int(date_str[17:19])
+            if hour > 23 or minute > 59 or second > 59:
+                return None
+            seconds = hour * 3600 + minute * 60 + second
+        else:
+            seconds = 0
+    except ValueError:
+        return None
+    return days * 86400 + seconds, int(date_str[0:4]) * 100 + int(date_str[5:7])
+
+
+def format_month(month):
+    """整数YYYYMM转为年月字符串（YYYY-MM）"""
+    return f"{month // 100:04d}-{month % 100:02d}"
+
+
+def to_cents(amount):
+    """金额（元，可能是有误差的小数）转为整数分"""
+    try:
+        return int(round(float(amount) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+def cents_to_yuan(cents):
+    return cents / 100
+
+
+class OrderKeys:
+    """订单日期的整数键缓存
+
+    内存中的订单仍保存原来的日期字符串（磁盘、云端和界面显示都用它），
+    排序和筛选使用这里解析出的时间戳和年月。解析结果按日期字符串缓存，
+    加载数据时一次性解析，之后每次排序只查字典，不再调用strptime。
+    """
+
+    def __init__(self):
+        self.dates = {}  # 日期字符串 -> (时间戳, 年月) 或 None
+
+    def load(self, orders):
+        """加载数据时解析所有订单的日期"""
+        for order in orders.values():
+            self.parse(order.get("date", ""))
+
+    def parse(self, date_str):
+        try:
+            return self.dates[date_str]
+        except KeyError:
+            parsed = self.dates[date_str] = parse_date(date_str)
+            return parsed
+        except TypeError:
+            return None
+
+    def timestamp(self, order, default=None):
+        """订单日期的时间戳，没有日期或格式不对时返回default"""
+        parsed = self.parse(order.get("date", ""))
+        return parsed[0] if parsed else default
+
+    def month(self, order):
+        """订单所在年月（整数YYYYMM），没有日期或格式不对时返回None"""
+        parsed = self.parse(order.get("date", ""))
+        return parsed[1] if parsed else None
+
+    def year(self, order):
+        parsed = self.parse(order.get("date", ""))
+        return parsed[1] // 100 if parsed else None
+
+
+class OrderIndex:
+    """订单的二级索引：厂家、年月、结账状态，以及按日期排序的订单序列
+
+    由本地存储持有，订单新增、修改、删除时随mark_order_changed/mark_order_deleted增量更新，
+    加载或整体替换订单后调用rebuild()。按条件组合筛选时对索引集合求交集，
+    按日期区间筛选时在有序序列上二分查找，不再遍历全部订单。
+    """
+
+    def __init__(self):
+        self.keys = OrderKeys()
+        self.entries = {}  # 订单名 -> (厂家, 年月YYYYMM或None, 是否结账, 日期字符串)
+        self.by_manufacturer = {}  # 厂家 -> 订单名集合
+        self.by_month = {}  # 年月YYYYMM -> 订单名集合
+        self.paid = set()
+        self.unpaid = set()
+        # [(日期字符串, 订单名)]，按日期字符串升序（与保存格式一致，即按时间先后）
+        self.sequence = []
+        self.text = TextIndex()  # 订单号、客户、厂家、房间名称的全文索引
+
+    def rebuild(self, orders):
+        """按全部订单重建索引"""
+        self.entries = {}
+        self.by_manufacturer = {}
+        self.by_month = {}
+        self.paid = set()
+        self.unpaid = set()
+        for order_name, order in orders.items():
+            self._add(order_name, self._entry(order))
+        self.sequence = sorted((entry[3], order_name) for order_name, entry in self.entries.items())
+        self.text.rebuild(orders)
+
+    def update(self, order_name, order):
+        """订单新增或修改后更新索引，索引键没有变化时不做任何事"""
+        self.text.update(order_name, order)
+        entry = self._entry(order)
+        old = self.entries.get(order_name)
+        if old == entry:
+            return
+        if old is not None:
+            self._remove(order_name)
+        self._add(order_name, entry)
+        insort(self.sequence, (entry[3], order_name))
+
+    def remove(self, order_name):
+        self.text.remove(order_name)
+        self._remove(order_name)
+
+    def _remove(self, order_name):
+        entry = self.entries.pop(order_name, None)
+        if entry is None:
+            return
+        manufacturer, month, paid, date_str = entry
+        self._discard(self.by_manufacturer, manufacturer, order_name)
+        self._discard(self.by_month, month, order_name)
+        (self.paid if paid else self.unpaid).discard(order_name)
+        position = bisect_left(self.sequence, (date_str, order_name))
+        if position < len(self.sequence) and self.sequence[position] == (date_str, order_name):
+            del self.sequence[position]
+
+    def months(self):
+        """有订单的年月（整数YYYYMM）"""
+        return [month for month in self.by_month if month is not None]
+
+    def manufacturers(self, paid=None):
+        """有订单的厂家，paid不为None时只统计该结账状态的订单"""
+        if paid is None:
+            return list(self.by_manufacturer)
+        names = self.paid if paid else self.unpaid
+        return [manufacturer for manufacturer, orders in self.by_manufacturer.items() if not orders.isdisjoint(names)]
+
+    def select(self, manufacturer=None, paid=None, date_from=None, date_to=None):
+        """按厂家、结账状态、日期区间[date_from, date_to)查找订单，返回按日期升序排列的订单名"""
+        sets = []
+        if manufacturer is not None:
+            sets.append(self.by_manufacturer.get(manufacturer, set()))
+        if paid is not None:
+            sets.append(self.paid if paid else self.unpaid)
+
+        start = 0 if date_from is None else bisect_left(self.sequence, (date_from,))
+        end = len(self.sequence) if date_to is None else bisect_left(self.sequence, (date_to,))
+        if start >= end:
+            return []
+        if not sets:
+            return [order_name for _, order_name in self.sequence[start:end]]
+
+        sets.sort(key=len)
+        matched = set.intersection(*sets)
+        if len(matched) * 8 < end - start:
+            # 命中的订单比日期区间内的订单少得多时，直接排序命中的订单
+            return [order_name for date_str, order_name in sorted((self.entries[order_name][3], order_name)
+                                                                   for order_name in matched)
+                    if (date_from is None or date_str >= date_from) and (date_to is None or date_str < date_to)]
+        return [order_name for _, order_name in self.sequence[start:end] if order_name in matched]
+
+    def _entry(self, order):
+        date_str = order.get("date", "")
+        if not isinstance(date_str, str):
+            date_str = ""
+        return order.get("manufacturer"), self.keys.month(order), bool(order.get("paid")), date_str
+
+    def _add(self, order_name, entry):
+        manufacturer, month, paid, _ = entry
+        self.entries[order_name] = entry
+        self.by_manufacturer.setdefault(manufacturer, set()).add(order_name)
+        self.by_month.setdefault(month, set()).add(order_name)
+        (self.paid if paid else self.unpaid).add(order_name)
+
+    @staticmethod
+    def _discard(index, key, order_name):
+        names = index.get(key)
+        if names is not None:
+            names.discard(order_name)
+            if not names:
+                del index[key]
+
+
+def ngrams(text):
+    """文本中的所有单字和相邻两字片段（一元和二元片段）"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def room_names(order):
+    """订单的房间名称：明细已加载时取自明细，否则取自概要中记录的room_names"""
+    rooms = order.get("rooms")
+    if isinstance(rooms, dict):
+        return list(rooms)
+    return order.get("room_names") or []
+
+
+class TextIndex:
+    """订单的子串搜索索引
+
+    订单号和客户名称建立单字和二元片段（bigram）的倒排索引：查询时取查询串各二元片段的
+    订单集合求交集，再对少量候选订单确认子串确实出现；单个字符直接取单字的订单集合。
+    厂家和房间名称的不同取值很少，按取值索引订单，查询时只比较这些取值。
+    中文地址没有空格分词，二元片段可以匹配任意位置的子串。
+
+    建立索引的耗时与订单数成正比（10万订单约需数秒），因此rebuild()只记录订单数据，
+    第一次搜索时才建立；此前的修改不需要逐个更新索引。
+    实时搜索在后台线程查询，修改在主线程更新索引，两者通过lock互斥。建立索引时不持有lock，
+    期间的修改记录下来，建立完成后再补上，主线程不会因等待建立索引而卡住。
+    """
+
+    def __init__(self):
+        self.grams = {}  # 单字或二元片段 -> 订单号或客户名称包含该片段的订单名集合
+        self.docs = {}  # 订单名 -> (订单号小写, 客户名称小写, 厂家小写, 房间名称小写元组)
+        self.values = {"manufacturer": {}, "room": {}}  # 字段 -> {取值小写: 订单名集合}
+        self.pending = {}  # 尚未建立索引的订单数据，为None时索引已建立
+        self.building = None  # 正在建立索引时的修改：订单名 -> 订单（删除为None）
+        self.version = 0  # 每次rebuild()加一，建立期间又rebuild()时作废建立的结果
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()  # 同一时间只有一个线程建立索引
+
+    def rebuild(self, orders):
+        with self.lock:
+            self.grams = {}
+            self.docs = {}
+            self.values = {"manufacturer": {}, "room": {}}
+            self.pending = orders
+            self.building = None
+            self.version += 1
+
+    def build(self):
+        """按rebuild()记录的订单数据建立索引（已建立时不做任何事）"""
+        with self.build_lock:
+            while True:
+                with self.lock:
+                    if self.pending is None:
+                        return
+                    orders, version = self.pending, self.version
+                    self.building = {}
+                    items = list(orders.items())
+
+                started = time.perf_counter()
+                index = TextIndex()
+                for order_name, order in items:
+                    index._add(order_name, index._doc(order_name, order))
+
+                with self.lock:
+                    if version != self.version:
+                        continue
+                    self.grams, self.docs, self.values = index.grams, index.docs, index.values
+                    self.pending = None
+                    changes, self.building = self.building, None
+                    for order_name, order in changes.items():
+                        if order is None:
+                            self._remove(order_name)
+                        else:
+                            self.update(order_name, order)
+                print(f"🔍 建立搜索索引: {len(self.docs)} 个订单，{len(self.grams)} 个片段，"
+                      f"耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
+                return
+
+    def update(self, order_name, order):
+        with self.lock:
+            if self.pending is not None:
+                if self.building is not None:
+                    self.building[order_name] = order
+                return
+            doc = self._doc(order_name, order)
+            old = self.docs.get(order_name)
+            if old == doc:
+                return
+            if old is not None:
+                self._remove(order_name)
+            self._add(order_name, doc)
+
+    def remove(self, order_name):
+        with self.lock:
+            if self.pending is None:
+                self._remove(order_name)
+            elif self.building is not None:
+                self.building[order_name] = None
+
+    def search(self, text, fields=SEARCH_SCOPES["全部"]):
+        """返回指定字段中包含text（不区分大小写）的订单名集合"""
+        self.build()
+        with self.lock:
+            return self._search(text.strip().lower(), fields)
+
+    def _remove(self, order_name):
+        doc = self.docs.pop(order_name, None)
+        if doc is None:
+            return
+        name, customer, manufacturer, rooms = doc
+        for gram in ngrams(name) | ngrams(customer):
+            names = self.grams.get(gram)
+            if names is not None:
+                names.discard(order_name)
+                if not names:
+                    del self.grams[gram]
+        self._discard_value("manufacturer", manufacturer, order_name)
+        for room in rooms:
+            self._discard_value("room", room, order_name)
+
+    def _search(self, query, fields):
+        if not query:
+            return set(self.docs)
+        found = set()
+
+        if "name" in fields or "customer" in fields:
+            grams = [query] if len(query) == 1 else [query[i:i + 2] for i in range(len(query) - 1)]
+            postings = [self.grams.get(gram) for gram in set(grams)]
+            if all(postings):
+                postings.sort(key=len)
+                candidates = set.intersection(*postings)
+                if len(query) <= 2 and "name" in fields and "customer" in fields:
+                    # 一元或二元片段本身就是完整的查询串，不需要再确认
+                    found = candidates
+                else:
+                    for order_name in candidates:
+                        name, customer, _, _ = self.docs[order_name]
+                        if ("name" in fields and query in name) or ("customer" in fields and query in customer):
+                            found.add(order_name)
+
+        for field in ("manufacturer", "room"):
+            if field in fields:
+                for value, names in self.values[field].items():
+                    if query in value:
+                        found |= names
+        return found
+
+    @staticmethod
+    def _doc(order_name, order):
+        customer = order.get("customer_name") or ""
+        manufacturer = order.get("manufacturer") or ""
+        return (str(order_name).lower(), str(customer).lower(), str(manufacturer).lower(),
+                tuple(sorted({str(room).lower() for room in room_names(order)})))
+
+    def _add(self, order_name, doc):
+        self.docs[order_name] = doc
+        name, customer, manufacturer, rooms = doc
+        grams = self.grams
+        for gram in ngrams(name) | ngrams(customer):
+            names = grams.get(gram)
+            if names is None:
+                grams[gram] = names = set()
+            names.add(order_name)
+        self.values["manufacturer"].setdefault(manufacturer, set()).add(order_name)
+        for room in rooms:
+            self.values["room"].setdefault(room, set()).add(order_name)
+
+    def _discard_value(self, field, value, order_name):
+        names = self.values[field].get(value)
+        if names is not None:
+            names.discard(order_name)
+            if not names:
+                del self.values[field][value]
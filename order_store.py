@@ -0,0 +1,501 @@
+import os
+import copy
+import hashlib
+import threading
+from datetime import datetime
+
+import data_codec
+from order_index import OrderIndex
+
+
+def atomic_write(path, content):
+    """先写临时文件并刷到磁盘，再原子替换目标文件，崩溃时不会留下写了一半的文件"""
+    temp_file = path + ".tmp"
+    with open(temp_file, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def fsync_dir(dir_path):
+    """把目录项（重命名结果）刷到磁盘，Windows不支持打开目录时跳过"""
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(dir_path or ".", os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+class BaseOrderStore:
+    """本地存储基类：记录自上次保存以来变更的订单
+
+    保存分两步：take_changes()在主线程取出变更并深拷贝成一个批次，
+    write_changes()把批次写入磁盘，可以放到后台线程执行。
+    """
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+
+        # 自上次保存以来的变更
+        self.dirty_orders = set()
+        self.deleted_orders = set()
+        self.meta_dirty = False
+
+        # 只是在活跃数据和本地存档之间移动的订单（内容未变），需要写入本地，但不算作修改
+        self.local_moves = set()
+
+        # 已取出但尚未写完的批次数量
+        self.unwritten_batches = 0
+
+        # 数据版本号：每次修改加一，已保存/已同步的版本号用于判断是否有未保存或未同步的修改
+        self.generation = 0
+        self.saved_generation = 0
+        self.synced_generation = 0
+
+        # 内存中订单的二级索引（厂家、年月、结账状态、日期顺序），随变更记录增量更新
+        self.index = OrderIndex()
+
+    def mark_order_changed(self, order_name, order=None):
+        """记录订单新增或修改，传入订单内容时同时更新索引"""
+        self.deleted_orders.discard(order_name)
+        self.dirty_orders.add(order_name)
+        self.local_moves.discard(order_name)
+        self.generation += 1
+        if order is not None:
+            self.index.update(order_name, order)
+
+    def mark_order_deleted(self, order_name):
+        """记录订单删除"""
+        self.dirty_orders.discard(order_name)
+        self.deleted_orders.add(order_name)
+        self.local_moves.discard(order_name)
+        self.generation += 1
+        self.index.remove(order_name)
+
+    def mark_order_archived(self, order_name):
+        """记录订单移入本地存档：从活跃数据中删除，但不增加版本号，也不算作待同步的修改"""
+        self.dirty_orders.discard(order_name)
+        self.deleted_orders.add(order_name)
+        self.local_moves.add(order_name)
+        self.index.remove(order_name)
+
+    def mark_order_restored(self, order_name, order):
+        """记录订单从本地存档移回活跃数据，与mark_order_archived()相同不算作修改"""
+        self.deleted_orders.discard(order_name)
+        self.dirty_orders.add(order_name)
+        self.local_moves.add(order_name)
+        self.index.update(order_name, order)
+
+    def mark_meta_changed(self):
+        """记录厂家列表或绑定目录变更"""
+        self.meta_dirty = True
+        self.generation += 1
+
+    def peek_changes(self):
+        """尚未取出保存的变更：(修改的订单名, 删除的订单名, 厂家数据是否修改)，不含存档移动"""
+        return (sorted(self.dirty_orders - self.local_moves), sorted(self.deleted_orders - self.local_moves),
+                self.meta_dirty)
+
+    def mark_synced(self, generation=None):
+        """记录已同步到云端的数据版本，默认为当前版本"""
+        if generation is None:
+            generation = self.generation
+        self.synced_generation = max(self.synced_generation, generation)
+
+    def has_unsynced_changes(self):
+        """自上次同步以来是否有修改"""
+        return self.synced_generation != self.generation
+
+    def has_pending_changes(self):
+        """是否有尚未写入磁盘的变更"""
+        return bool(self.dirty_orders or self.deleted_orders or self.meta_dirty or self.unwritten_batches)
+
+    def has_pending_edits(self):
+        """是否有尚未写入磁盘的修改，不含存档移动（退出时据此询问是否保存）"""
+        return bool(self.dirty_orders - self.local_moves or self.deleted_orders - self.local_moves
+                    or self.meta_dirty or self.unwritten_batches)
+
+    def take_changes(self, data, full=False):
+        """取出待保存的变更，返回与内存数据无共享引用的批次
+
+        :param data: 包含orders/manufacturers/bound_order_dir的完整数据
+        :param full: True时批次包含全部数据（如从云端整体下载后）
+        """
+        orders = data.get("orders", {})
+        batch = {
+            "full": full,
+            "generation": self.generation,
+            "orders": {},
+            "deleted": [],
+            "meta": None,
+            "moves": sorted(self.local_moves),
+            "timestamp": data.get("timestamp") or datetime.now().isoformat(),
+            "version": data.get("version", data_codec.EXPANDED_VERSION)
+        }
+
+        for order_name in (orders if full else sorted(self.dirty_orders)):
+            if order_name in orders:
+                batch["orders"][order_name] = copy.deepcopy(orders[order_name])
+            else:
+                batch["deleted"].append(order_name)
+        if not full:
+            batch["deleted"].extend(sorted(self.deleted_orders))
+
+        if full or self.meta_dirty:
+            batch["meta"] = {
+                "manufacturers": copy.deepcopy(data.get("manufacturers", {})),
+                "bound_order_dir": data.get("bound_order_dir", "")
+            }
+
+        self.dirty_orders.clear()
+        self.deleted_orders.clear()
+        self.meta_dirty = False
+        self.local_moves.clear()
+        if not self.is_empty_batch(batch):
+            self.unwritten_batches += 1
+        return batch
+
+    def is_empty_batch(self, batch):
+        return not (batch["full"] or batch["orders"] or batch["deleted"] or batch["meta"])
+
+    def finish_batch(self, batch, success):
+        """批次写入结束后调用，写入失败时把变更放回待保存集合"""
+        if not self.is_empty_batch(batch):
+            self.unwritten_batches = max(0, self.unwritten_batches - 1)
+        if success:
+            self.saved_generation = max(self.saved_generation, batch["generation"])
+            return
+
+        # 期间又被修改或删除的订单以最新状态为准
+        for order_name in batch.get("moves", ()):
+            if order_name not in self.dirty_orders and order_name not in self.deleted_orders:
+                self.local_moves.add(order_name)
+        for order_name in batch["orders"]:
+            if order_name not in self.deleted_orders:
+                self.dirty_orders.add(order_name)
+        for order_name in batch["deleted"]:
+            if order_name not in self.dirty_orders:
+                self.deleted_orders.add(order_name)
+        if batch["meta"] is not None:
+            self.meta_dirty = True
+
+    def save(self, data, full=False):
+        """同步保存：取出变更并立即写入"""
+        batch = self.take_changes(data, full)
+        try:
+            if not self.is_empty_batch(batch):
+                self.write_changes(batch)
+        except Exception:
+            self.finish_batch(batch, False)
+            raise
+        self.finish_batch(batch, True)
+        return True
+
+    def fill_bodies(self, orders):
+        """返回补全了明细的订单字典，不修改传入的订单（可在后台线程调用）"""
+        filled = {}
+        for order_name, order in orders.items():
+            if "rooms" not in order:
+                order = dict(order, rooms=self.load_body(order_name))
+            filled[order_name] = order
+        return filled
+
+    def load(self):
+        """加载订单概要，明细通过load_body()按需读取"""
+        raise NotImplementedError
+
+    def read_orders(self):
+        """只读取已写入磁盘的订单概要，不改变存储的任何状态（上传时在后台线程调用）"""
+        raise NotImplementedError
+
+    def load_body(self, order_name):
+        """读取订单明细（房间和柜体）"""
+        raise NotImplementedError
+
+    def write_changes(self, batch):
+        raise NotImplementedError
+
+
+class OrderStore(BaseOrderStore):
+    """订单数据的本地存储：快照文件 + 追加式变更日志 + 订单明细文件
+
+    每次修改只向日志追加几条小记录（新增/修改订单、删除订单、厂家配置变更），
+    日志累积到一定规模后再合并回快照文件，保存耗时取决于修改量而不是数据总量。
+    快照和日志只保存订单概要，房间和柜体按订单单独保存在明细目录中，
+    启动时只需读取概要。
+    """
+
+    # 日志超过以下记录数或字节数时自动合并回快照
+    COMPACT_RECORDS = 500
+    COMPACT_BYTES = 4 * 1024 * 1024
+
+    # 保留的历史快照数量（data.json.bak1 为最近的一个）
+    SNAPSHOT_BACKUPS = 5
+
+    def __init__(self, data_file):
+        super().__init__(data_file)
+        self.journal_file = os.path.splitext(data_file)[0] + ".journal"
+        self.bodies_dir = os.path.splitext(data_file)[0] + "_bodies"
+
+        # 当前日志规模，用于判断何时合并
+        self.journal_records = 0
+        self.journal_bytes = 0
+        self.compact_requested = False
+
+        # 后台写入与后台读取（上传时读取未在内存快照中的订单）互斥，不会读到合并了一半的快照和日志
+        self.write_lock = threading.RLock()
+
+    def load(self):
+        """加载快照并重放变更日志，两者都不存在时返回None
+
+        订单只包含概要，旧版本文件中内嵌的明细会一并加载。
+        快照损坏时自动改用最近的有效历史快照。
+        """
+        data, recovered, (self.journal_records, self.journal_bytes) = self._read()
+        if recovered:
+            self.compact_requested = True
+        return data
+
+    def read_orders(self):
+        with self.write_lock:
+            data = self._read(report=False)[0]
+        return data["orders"] if data else {}
+
+    def _read(self, report=True):
+        """读取快照并重放日志，返回(数据, 是否需要重写完整快照, (日志记录数, 日志字节数))"""
+        data = None
+        recovered = False
+        snapshot_files = [self.data_file] + [self._backup_file(index) for index in range(1, self.SNAPSHOT_BACKUPS + 1)]
+        existing_files = [path for path in snapshot_files if os.path.exists(path)]
+        for path in existing_files:
+            try:
+                with open(path, "rb") as f:
+                    data, migrated = data_codec.unpack_data(data_codec.loads(data_codec.unseal(f.read())))
+            except Exception as e:
+                print(f"⚠️ 快照 {path} 无法读取: {e}，尝试上一个快照")
+                continue
+
+            if path != self.data_file:
+                # 从历史快照恢复，下一次保存时写出新的完整快照
+                if report:
+                    print(f"✅ 已从历史快照恢复数据: {path}")
+                recovered = True
+            if migrated:
+                # 旧版本文件，下一次保存时重写为当前格式
+                if report:
+                    print(f"🔄 数据文件已从旧版本升级到 {data_codec.SCHEMA_VERSION}，将在下次保存时重写")
+                recovered = True
+            break
+
+        if data is None and existing_files:
+            raise ValueError(f"数据文件及所有历史快照均已损坏: {self.data_file}")
+
+        records, journal_bytes = self._read_journal()
+        if data is None and not records:
+            return None, recovered, (0, 0)
+
+        if data is None:
+            data = {"orders": {}, "manufacturers": {}, "bound_order_dir": ""}
+        data.setdefault("orders", {})
+        data.setdefault("manufacturers", {})
+        data.setdefault("bound_order_dir", "")
+
+        for record in records:
+            self._apply_record(data, record)
+
+        if records and report:
+            print(f"📒 已重放变更日志: {len(records)} 条记录")
+        return data, recovered, (len(records), journal_bytes)
+
+    def load_body(self, order_name):
+        """从明细文件读取订单的房间和柜体"""
+        body_file = self._body_file(order_name)
+        if not os.path.exists(body_file):
+            print(f"⚠️ 订单 {order_name} 没有明细文件，按空订单处理")
+            return {}
+        with open(body_file, "rb") as f:
+            body = data_codec.loads(data_codec.unseal(f.read()))
+        return data_codec.unpack_rooms(body.get("rooms", []))
+
+    def take_changes(self, data, full=False):
+        # 日志过大时，下一次保存直接写完整快照
+        full = full or self.compact_requested
+        self.compact_requested = False
+        return super().take_changes(data, full)
+
+    def write_changes(self, batch):
+        """写入一个变更批次：完整批次写快照，否则追加到日志"""
+        with self.write_lock:
+            self._write_changes(batch)
+
+    def _write_changes(self, batch):
+        if batch["full"]:
+            self._write_snapshot(batch)
+            return
+
+        # 先写明细文件，再追加引用它的日志记录
+        for order_name, order in batch["orders"].items():
+            if "rooms" in order:
+                self._write_body(order_name, order["rooms"])
+        for order_name in batch["deleted"]:
+            self._remove_body(order_name)
+
+        records = self._batch_records(batch)
+        if not records:
+            return
+
+        lines = b"".join(data_codec.dumps(record) + b"\n" for record in records)
+        with open(self.journal_file, "ab") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.journal_records += len(records)
+        self.journal_bytes += len(lines)
+        if self.journal_records >= self.COMPACT_RECORDS or self.journal_bytes >= self.COMPACT_BYTES:
+            self.compact_requested = True
+
+    def compact(self, data):
+        """把完整数据写成新快照并清空变更日志"""
+        self.save(data, full=True)
+
+    def _write_snapshot(self, batch):
+        for order_name, order in batch["orders"].items():
+            if "rooms" in order:
+                self._write_body(order_name, order["rooms"])
+
+        snapshot = {
+            "orders": {order_name: data_codec.order_header(order) for order_name, order in batch["orders"].items()},
+            "manufacturers": batch["meta"]["manufacturers"],
+            "bound_order_dir": batch["meta"]["bound_order_dir"],
+            "timestamp": batch["timestamp"],
+            "version": batch["version"]
+        }
+        content = data_codec.seal(data_codec.dumps(data_codec.pack_data(snapshot)))
+
+        # 先轮换历史快照，再原子写入新快照；两步之间中断时，加载时从最近的历史快照和日志恢复
+        for index in range(self.SNAPSHOT_BACKUPS - 1, 0, -1):
+            if os.path.exists(self._backup_file(index)):
+                os.replace(self._backup_file(index), self._backup_file(index + 1))
+        if os.path.exists(self.data_file):
+            os.replace(self.data_file, self._backup_file(1))
+        atomic_write(self.data_file, content)
+
+        # 快照已包含日志中的所有变更，日志可以清空
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self.journal_records = 0
+        self.journal_bytes = 0
+
+        # 清理已删除订单残留的明细文件
+        if os.path.isdir(self.bodies_dir):
+            referenced = {os.path.basename(self._body_file(order_name)) for order_name in batch["orders"]}
+            for file_name in os.listdir(self.bodies_dir):
+                if file_name not in referenced:
+                    os.remove(os.path.join(self.bodies_dir, file_name))
+        print(f"🗜️ 变更日志已合并到快照: {self.data_file}")
+
+    def _backup_file(self, index):
+        return f"{self.data_file}.bak{index}"
+
+    def _body_file(self, order_name):
+        # 订单名可能包含文件名中不允许的字符，使用哈希作为文件名
+        digest = hashlib.sha1(order_name.encode("utf-8")).hexdigest()
+        return os.path.join(self.bodies_dir, digest + ".json")
+
+    def _write_body(self, order_name, rooms):
+        """写入订单明细文件，内容没有变化时跳过"""
+        body_file = self._body_file(order_name)
+        content = data_codec.seal(data_codec.dumps({"name": order_name, "rooms": data_codec.pack_rooms(rooms)}))
+        if os.path.exists(body_file):
+            with open(body_file, "rb") as f:
+                if f.read() == content:
+                    return
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        atomic_write(body_file, content)
+
+    def _remove_body(self, order_name):
+        body_file = self._body_file(order_name)
+        if os.path.exists(body_file):
+            os.remove(body_file)
+
+    def _batch_records(self, batch):
+        """把变更批次整理成日志记录"""
+        timestamp = batch["timestamp"]
+        records = []
+
+        for order_name in batch["deleted"]:
+            records.append({"op": "delete", "name": order_name, "ts": timestamp})
+
+        for order_name, order in batch["orders"].items():
+            # 日志只记录概要，明细已写入明细文件
+            records.append({
+                "op": "put",
+                "name": order_name,
+                "order": data_codec.pack_order(data_codec.order_header(order)),
+                "ts": timestamp
+            })
+
+        if batch["meta"] is not None:
+            records.append({
+                "op": "meta",
+                "manufacturers": batch["meta"]["manufacturers"],
+                "bound_order_dir": batch["meta"]["bound_order_dir"],
+                "ts": timestamp
+            })
+        return records
+
+    def _read_journal(self):
+        """读取变更日志，遇到写了一半的末尾记录时停止，返回(记录, 日志字节数)"""
+        if not os.path.exists(self.journal_file):
+            return [], 0
+
+        records = []
+        with open(self.journal_file, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(data_codec.loads(line))
+                except ValueError:
+                    # 程序崩溃时可能留下不完整的最后一行
+                    print("⚠️ 变更日志末尾记录不完整，已忽略")
+                    break
+
+        return records, os.path.getsize(self.journal_file)
+
+    def _apply_record(self, data, record):
+        """把一条日志记录应用到数据上"""
+        op = record.get("op")
+        if op == "put":
+            order = data_codec.unpack_order(record["name"], record["order"])
+            existing = data["orders"].get(record["name"])
+            if "rooms" not in order and existing and "rooms" in existing:
+                # 只有概要的记录写入前已更新明细文件，快照（如回退到的历史快照）中内嵌的明细已过时；
+                # 没有明细文件时内嵌的明细仍是唯一的副本
+                if not os.path.exists(self._body_file(record["name"])):
+                    order["rooms"] = existing["rooms"]
+            data["orders"][record["name"]] = order
+        elif op == "delete":
+            data["orders"].pop(record["name"], None)
+        elif op == "meta":
+            data["manufacturers"] = record.get("manufacturers", {})
+            data["bound_order_dir"] = record.get("bound_order_dir", "")
+        if record.get("ts"):
+            data["timestamp"] = record["ts"]
+
+
+def create_order_store(data_file, engine="json"):
+    """按存储引擎创建本地存储，engine可选 json / sqlite"""
+    if engine == "sqlite":
+        from sqlite_store import SqliteOrderStore
+        return SqliteOrderStore(data_file)
+    return OrderStore(data_file)
@@ -0,0 +1,168 @@
+import copy
+import queue
+import threading
+
+
+class SaveScheduler:
+    """合并保存请求并在后台线程写盘
+
+    修改数据后调用request_save()，delay_ms内的多次请求只触发一次写入。
+    变更在Tk主线程取出（深拷贝），序列化、写盘和上传在后台线程完成，
+    结果通过队列交回主线程处理。上传用的数据由build_upload_data在主线程生成快照，
+    只复制待同步的订单，不深拷贝全部数据。上传失败（如断网）时修改留在待同步队列中，
+    稍后自动重试上传，等待时间逐次加倍。
+    """
+
+    RETRY_MIN_MS = 30 * 1000
+    RETRY_MAX_MS = 10 * 60 * 1000
+
+    def __init__(self, root, order_store, build_data, upload=None, on_error=None, on_uploaded=None,
+                 sync_queue=None, build_upload_data=None, delay_ms=500):
+        self.root = root
+        self.order_store = order_store
+        self.build_data = build_data  # 返回当前完整数据的函数
+        self.upload = upload  # 上传到云端的函数，接收build_upload_data返回的快照
+        # 返回上传用的数据快照（与内存数据无共享引用），未提供时深拷贝完整数据
+        self.build_upload_data = build_upload_data or (lambda: copy.deepcopy(self.build_data()))
+        self.on_error = on_error  # 出错时在主线程回调，参数为错误信息
+        self.on_uploaded = on_uploaded  # 上传成功后在主线程回调，参数为upload的返回值
+        self.sync_queue = sync_queue  # SyncQueue，记录尚未上传到云端的修改
+        self.delay_ms = delay_ms
+
+        self.after_id = None
+        self.upload_requested = False
+        self.pending_tasks = 0
+        self.polling = False
+        self.retry_after_id = None
+        self.retry_delay_ms = self.RETRY_MIN_MS
+
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def request_save(self, upload=False):
+        """请求保存，在短时间内的多次请求会合并为一次"""
+        if upload:
+            self.upload_requested = True
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+        self.after_id = self.root.after(self.delay_ms, self._dispatch)
+
+    def flush(self):
+        """立即写入所有待保存的变更并等待后台线程完成（退出程序前调用）
+
+        处理结果时的回调可能再次请求保存（如写入同步合并进来的修改），一并写完
+        """
+        while True:
+            if self.after_id is not None:
+                self.root.after_cancel(self.after_id)
+                self.after_id = None
+            if self.order_store.has_pending_changes() or self.upload_requested:
+                self._dispatch()
+            self.tasks.join()
+            self._process_results()
+            if self.after_id is None:
+                break
+
+    def wait(self):
+        """等待已交给后台线程的写入完成，不再取出新的变更（退出时放弃未保存的修改）"""
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.join_writes()
+
+    def join_writes(self):
+        """等待已交给后台线程的写入完成（可在其他后台线程调用）"""
+        self.tasks.join()
+
+    def _dispatch(self):
+        """在主线程取出变更，交给后台线程写入"""
+        self.after_id = None
+        # 上传快照按尚未取出的变更确定要复制的订单，需在取出变更之前生成
+        upload_data = self.build_upload_data() if self.upload_requested and self.upload else None
+        self.upload_requested = False
+        changes = self.order_store.peek_changes()
+        batch = self.order_store.take_changes(self.build_data())
+
+        if self.order_store.is_empty_batch(batch) and upload_data is None:
+            return
+
+        self.pending_tasks += 1
+        self.tasks.put((batch, changes, upload_data))
+        if not self.polling:
+            self.polling = True
+            self.root.after(100, self._poll)
+
+    def _run(self):
+        """后台线程：依次写入变更批次并上传"""
+        while True:
+            batch, changes, upload_data = self.tasks.get()
+            save_error = None
+            upload_error = None
+            uploaded = None
+            try:
+                if not self.order_store.is_empty_batch(batch):
+                    self.order_store.write_changes(batch)
+            except Exception as e:
+                save_error = e
+            if self.sync_queue is not None:
+                self.sync_queue.add(*changes)
+
+            if upload_data is not None:
+                mark = self.sync_queue.mark() if self.sync_queue is not None else None
+                try:
+                    uploaded = self.upload(upload_data)
+                except Exception as e:
+                    upload_error = e
+                if self.sync_queue is not None:
+                    if uploaded:
+                        self.sync_queue.clear(mark)
+                    elif upload_error is not None:
+                        self.sync_queue.record_failure(upload_error)
+
+            self.results.put((batch, save_error, upload_error, uploaded))
+            self.tasks.task_done()
+
+    def _poll(self):
+        self._process_results()
+        if self.pending_tasks > 0:
+            self.root.after(100, self._poll)
+        else:
+            self.polling = False
+
+    def _process_results(self):
+        """在主线程处理后台写入结果"""
+        while True:
+            try:
+                batch, save_error, upload_error, uploaded = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending_tasks = max(0, self.pending_tasks - 1)
+            self.order_store.finish_batch(batch, save_error is None)
+            if uploaded:
+                self.order_store.mark_synced(batch["generation"])
+                self.retry_delay_ms = self.RETRY_MIN_MS
+                if self.on_uploaded:
+                    self.on_uploaded(uploaded)
+            if save_error is not None:
+                print(f"❌ 后台保存失败: {save_error}")
+                if self.on_error:
+                    self.on_error(f"保存数据失败: {save_error}")
+            if upload_error is not None:
+                print(f"❌ 后台上传失败: {upload_error}")
+                self.schedule_upload_retry()
+
+    def schedule_upload_retry(self):
+        """上传失败后稍后重试，队列中还有未上传的修改时才重试"""
+        if self.retry_after_id is not None or self.sync_queue is None or not self.sync_queue.has_pending():
+            return
+        delay = self.retry_delay_ms
+        self.retry_delay_ms = min(self.RETRY_MAX_MS, delay * 2)
+        print(f"🔁 {self.sync_queue.pending_count()} 项修改待上传，{delay // 1000} 秒后重试")
+        self.retry_after_id = self.root.after(delay, self._retry_upload)
+
+    def _retry_upload(self):
+        self.retry_after_id = None
+        self.request_save(upload=True)
@@ -0,0 +1,241 @@
+import os
+import json
+import sqlite3
+from contextlib import closing
+
+from order_store import BaseOrderStore, OrderStore
+
+
+# 订单/房间/柜体的固定字段，其余字段原样存入extra列
+ORDER_FIELDS = ("name", "path", "total_area", "total_price", "manufacturer", "unit_price", "paid", "date")
+ROOM_FIELDS = ("name",)
+CABINET_FIELDS = ("name", "width", "height", "area")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    name TEXT PRIMARY KEY,
+    path TEXT,
+    total_area REAL,
+    total_price REAL,
+    manufacturer TEXT,
+    unit_price REAL,
+    paid INTEGER,
+    date TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    order_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER,
+    extra TEXT,
+    PRIMARY KEY (order_name, name)
+);
+CREATE TABLE IF NOT EXISTS cabinets (
+    order_name TEXT NOT NULL,
+    room_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    width REAL,
+    height REAL,
+    area REAL,
+    position INTEGER,
+    extra TEXT,
+    PRIMARY KEY (order_name, room_name, name)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_orders_manufacturer ON orders (manufacturer);
+CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (date);
+CREATE INDEX IF NOT EXISTS idx_orders_paid ON orders (paid, manufacturer);
+"""
+
+
+class SqliteOrderStore(BaseOrderStore):
+    """基于SQLite的订单存储
+
+    订单、房间、柜体分表保存，厂家、日期、结账状态建有索引，
+    没有未保存的变更时，筛选和按周期导出直接走索引查询。接口与OrderStore保持一致。
+    """
+
+    def __init__(self, data_file):
+        super().__init__(data_file)
+        self.db_file = os.path.splitext(data_file)[0] + ".db"
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # 每次操作使用独立连接，后台线程保存时也不会共享连接
+        return sqlite3.connect(self.db_file)
+
+    def load(self):
+        """从数据库加载订单概要，数据库为空时从data.json迁移"""
+        with closing(self._connect()) as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            if not meta:
+                return self._migrate_from_json()
+            orders = self._read_headers(conn)
+
+        return {
+            "orders": orders,
+            "manufacturers": json.loads(meta.get("manufacturers", "{}")),
+            "bound_order_dir": json.loads(meta.get("bound_order_dir", '""')),
+            "timestamp": json.loads(meta.get("timestamp", '""')),
+            "version": json.loads(meta.get("version", '"1.0"'))
+        }
+
+    def read_orders(self):
+        """读取订单概要；数据库为空时返回空字典，不从data.json迁移"""
+        with closing(self._connect()) as conn:
+            return self._read_headers(conn)
+
+    def _read_headers(self, conn):
+        orders = {}
+        for row in conn.execute(
+            "SELECT name, path, total_area, total_price, manufacturer, unit_price, paid, date, extra "
+            "FROM orders ORDER BY rowid"
+        ):
+            order = json.loads(row[8]) if row[8] else {}
+            order.update(zip(ORDER_FIELDS, row[:8]))
+            order["paid"] = bool(order["paid"])
+            orders[order["name"]] = order
+        return orders
+
+    def load_body(self, order_name):
+        """读取订单的房间和柜体"""
+        rooms = {}
+        with closing(self._connect()) as conn:
+            for name, extra in conn.execute(
+                "SELECT name, extra FROM rooms WHERE order_name = ? ORDER BY position", (order_name,)
+            ):
+                room = json.loads(extra) if extra else {}
+                room["name"] = name
+                room["cabinets"] = {}
+                rooms[name] = room
+
+            for row in conn.execute(
+                "SELECT room_name, name, width, height, area, extra "
+                "FROM cabinets WHERE order_name = ? ORDER BY room_name, position", (order_name,)
+            ):
+                if row[0] in rooms:
+                    cabinet = json.loads(row[5]) if row[5] else {}
+                    cabinet.update(zip(CABINET_FIELDS, row[1:5]))
+                    rooms[row[0]]["cabinets"][row[1]] = cabinet
+        return rooms
+
+    def write_changes(self, batch):
+        """在一个事务中写入变更批次，完整批次会重写全部订单概要"""
+        with closing(self._connect()) as conn:
+            with conn:
+                if batch["full"]:
+                    conn.execute("DELETE FROM orders")
+                for order_name in batch["deleted"]:
+                    self._delete_order(conn, order_name)
+                for order_name, order in batch["orders"].items():
+                    self._write_order(conn, order_name, order)
+                if batch["full"]:
+                    # 清理已不存在的订单的明细
+                    conn.execute("DELETE FROM rooms WHERE order_name NOT IN (SELECT name FROM orders)")
+                    conn.execute("DELETE FROM cabinets WHERE order_name NOT IN (SELECT name FROM orders)")
+
+                meta = {"timestamp": batch["timestamp"], "version": batch["version"]}
+                if batch["meta"] is not None:
+                    meta.update(batch["meta"])
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [(key, json.dumps(value, ensure_ascii=False)) for key, value in meta.items()]
+                )
+
+    def compact(self, data):
+        """重写全部数据并整理数据库文件"""
+        self.save(data, full=True)
+        with closing(self._connect()) as conn:
+            conn.execute("VACUUM")
+
+    def query_order_names(self, manufacturer=None, paid=None, date_from=None, date_to=None):
+        """按厂家、结账状态、日期区间[date_from, date_to)查询订单名，按日期排序（与OrderIndex.select()一致）"""
+        conditions = []
+        params = []
+        if manufacturer is not None:
+            conditions.append("manufacturer = ?")
+            params.append(manufacturer)
+        if paid is not None:
+            conditions.append("paid = ?")
+            params.append(1 if paid else 0)
+        if date_from is not None:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("date < ?")
+            params.append(date_to)
+
+        sql = "SELECT name FROM orders"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY date, name"
+
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute(sql, params)]
+
+    def _write_order(self, conn, order_name, order):
+        """写入订单概要，订单已加载明细时一并重写房间和柜体"""
+        conn.execute(
+            "INSERT OR REPLACE INTO orders (name, path, total_area, total_price, manufacturer, unit_price, paid, date, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                order_name,
+                order.get("path", ""),
+                order.get("total_area", 0),
+                order.get("total_price", 0),
+                order.get("manufacturer", ""),
+                order.get("unit_price", 0),
+                1 if order.get("paid") else 0,
+                order.get("date", ""),
+                self._dump_extra(order, ORDER_FIELDS + ("rooms",))
+            )
+        )
+        if "rooms" not in order:
+            return
+
+        conn.execute("DELETE FROM rooms WHERE order_name = ?", (order_name,))
+        conn.execute("DELETE FROM cabinets WHERE order_name = ?", (order_name,))
+        for room_position, (room_name, room) in enumerate(order["rooms"].items()):
+            conn.execute(
+                "INSERT INTO rooms (order_name, name, position, extra) VALUES (?, ?, ?, ?)",
+                (order_name, room_name, room_position, self._dump_extra(room, ROOM_FIELDS + ("cabinets",)))
+            )
+            conn.executemany(
+                "INSERT INTO cabinets (order_name, room_name, name, width, height, area, position, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        order_name, room_name, cabinet_name,
+                        cabinet.get("width", 0), cabinet.get("height", 0), cabinet.get("area", 0),
+                        cabinet_position,
+                        self._dump_extra(cabinet, CABINET_FIELDS)
+                    )
+                    for cabinet_position, (cabinet_name, cabinet) in enumerate(room.get("cabinets", {}).items())
+                ]
+            )
+
+    def _delete_order(self, conn, order_name):
+        conn.execute("DELETE FROM orders WHERE name = ?", (order_name,))
+        conn.execute("DELETE FROM rooms WHERE order_name = ?", (order_name,))
+        conn.execute("DELETE FROM cabinets WHERE order_name = ?", (order_name,))
+
+    def _dump_extra(self, item, fields):
+        extra = {key: value for key, value in item.items() if key not in fields}
+        return json.dumps(extra, ensure_ascii=False) if extra else None
+
+    def _migrate_from_json(self):
+        """首次使用SQLite时导入现有的data.json（含变更日志）"""
+        json_store = OrderStore(self.data_file)
+        data = json_store.load()
+        if data is None:
+            return None
+        data["orders"] = json_store.fill_bodies(data["orders"])
+        self.save(data, full=True)
+        print(f"✅ 已将 {len(data.get('orders', {}))} 个订单迁移到SQLite: {self.db_file}")
+        return data
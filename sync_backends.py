@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import base64
+import random
+import hashlib
+import threading
+from urllib.parse import unquote
+
+import sync_http
+from order_store import atomic_write
+
+
+# get_file()的返回值：传入的ETag与当前文件相同，文件没有变化
+NOT_MODIFIED = "not_modified"
+
+
+class StaleRemoteError(Exception):
+    """云端文件在读取之后被其他设备更新，本地记录的sha已过期"""
+
+
+def git_blob_sha(raw):
+    """GitHub内容接口更新文件时需要的blob sha，可以直接由内容算出"""
+    return hashlib.sha1(b"blob %d\0" % len(raw) + raw).hexdigest()
+
+
+class SyncBackend:
+    """增量同步使用的云端存储：按路径读取、创建/更新、删除文件
+
+    更新和删除时传入本机读到的blob sha，文件已被其他设备修改时抛出StaleRemoteError。
+    stats统计请求次数和收发的字节数，供同步日志和基准测试使用。
+    """
+
+    def __init__(self, location):
+        self.location = location  # 存储位置的标识，本地同步状态按它区分
+        self.stats = {"requests": 0, "sent": 0, "received": 0}
+
+    def get_file(self, path, etag=None):
+        """读取文件，返回(内容, ETag)；文件不存在时内容为None，etag与当前文件相同时为NOT_MODIFIED"""
+        raise NotImplementedError
+
+    def put_file(self, path, raw, sha, message):
+        """创建（sha为None）或更新文件，返回新的blob sha"""
+        raise NotImplementedError
+
+    def delete_file(self, path, sha, message):
+        """删除文件，文件已不存在时不报错"""
+        raise NotImplementedError
+
+    def reset_stats(self):
+        self.stats = {"requests": 0, "sent": 0, "received": 0}
+
+    def _count(self, sent=0, received=0):
+        self.stats["requests"] += 1
+        self.stats["sent"] += sent
+        self.stats["received"] += received
+
+
+class GitHubBackend(SyncBackend):
+    """GitHub仓库的内容接口（cloud_sync中配置的仓库和认证信息）"""
+
+    def __init__(self, github_sync, api_url=None):
+        super().__init__(github_sync.repo)
+        self.github_sync = github_sync
+        self.api_url = api_url  # 为None时使用sync_http.GITHUB_API
+
+    def _contents_url(self, path):
+        return f"{self.api_url or sync_http.GITHUB_API}/repos/{self.github_sync.repo}/contents/{path}"
+
+    def get_file(self, path, etag=None):
+        headers = dict(self.github_sync.headers)
+        headers["Accept"] = "application/vnd.github.raw"
+        if etag:
+            headers["If-None-Match"] = etag
+        response = sync_http.get(self._contents_url(path), headers=headers)
+        self._count(received=len(response.content))
+        if response.status_code == 304:
+            return NOT_MODIFIED, etag
+        if response.status_code == 404:
+            return None, None
+        response.raise_for_status()
+        return response.content, response.headers.get("ETag")
+
+    def put_file(self, path, raw, sha, message):
+        """sha与云端不符（409/422）时抛出StaleRemoteError，由调用方重新读取并合并，不会直接覆盖"""
+        payload = {"message": message, "content": base64.b64encode(raw).decode("ascii")}
+        if sha:
+            payload["sha"] = sha
+        response = sync_http.put(self._contents_url(path), headers=self.github_sync.headers,
+                                 json=payload, timeout=(5, 60))
+        self._count(sent=len(payload["content"]), received=len(response.content))
+        if response.status_code in (409, 422):
+            raise StaleRemoteError(path)
+        response.raise_for_status()
+        return response.json()["content"]["sha"]
+
+    def delete_file(self, path, sha, message):
+        response = sync_http.delete(self._contents_url(path), headers=self.github_sync.headers,
+                                    json={"message": message, "sha": sha})
+        self._count(received=len(response.content))
+        if response.status_code in (409, 422):
+            raise StaleRemoteError(path)
+        if response.status_code != 404:
+            response.raise_for_status()
+
+
+class FileSystemBackend(SyncBackend):
+    """以本地目录作为云端（共享文件夹、离线测试和基准测试）
+
+    sha和ETag由文件内容算出，与GitHub的行为一致
+    """
+
+    def __init__(self, root_dir):
+        super().__init__(os.path.abspath(root_dir))
+        self.root_dir = root_dir
+        self.lock = threading.Lock()  # 检查sha和写入之间不被其他线程打断
+
+    def _file_path(self, path):
+        return os.path.join(self.root_dir, *path.split("/"))
+
+    def _read(self, path):
+        try:
+            with open(self._file_path(path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def get_file(self, path, etag=None):
+        raw = self._read(path)
+        if raw is None:
+            self._count()
+            return None, None
+        current = f'"{git_blob_sha(raw)}"'
+        if etag == current:
+            self._count()
+            return NOT_MODIFIED, etag
+        self._count(received=len(raw))
+        return raw, current
+
+    def put_file(self, path, raw, sha, message):
+        with self.lock:
+            existing = self._read(path)
+            if (existing is None and sha) or (existing is not None and git_blob_sha(existing) != sha):
+                raise StaleRemoteError(path)
+            file_path = self._file_path(path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            atomic_write(file_path, raw)
+            self._count(sent=len(raw))
+            return git_blob_sha(raw)
+
+    def delete_file(self, path, sha, message):
+        with self.lock:
+            existing = self._read(path)
+            self._count()
+            if existing is None:
+                return
+            if git_blob_sha(existing) != sha:
+                raise StaleRemoteError(path)
+            os.remove(self._file_path(path))
+
+
+class MockGitHubServer:
+    """在本进程内模拟GitHub内容接口的HTTP服务，用于测试和基准测试
+
+    支持读取（原始内容、ETag和304）、创建/更新（sha检查，不符时返回409）、删除，
+    以及测试连接用的仓库信息接口。latency为每个请求的延迟（秒），failure_rate为
+    随机返回failure_status的比例；fail_next(n)让接下来的n个请求失败。
+    使用时把GitHubBackend的api_url（或sync_http.GITHUB_API）指向url。
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, failure_status=503, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.random = random.Random(seed)
+        self.files = {}  # 路径 -> 内容
+        self.requests = []  # (方法, 路径, 状态码)
+        self.lock = threading.Lock()
+        self.forced_failures = 0
+        self.server = None
+        self.url = None
+
+    def start(self):
+        from http.server import ThreadingHTTPServer
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        return self.url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def fail_next(self, count=1):
+        with self.lock:
+            self.forced_failures += count
+
+    def _should_fail(self):
+        with self.lock:
+            if self.forced_failures:
+                self.forced_failures -= 1
+                return True
+            return self.failure_rate > 0 and self.random.random() < self.failure_rate
+
+    def handle(self, method, url_path, headers, body):
+        """处理一个请求，返回(状态码, 响应头, 响应内容)"""
+        if self.latency:
+            time.sleep(self.latency)
+        if self._should_fail():
+            return self.failure_status, {}, b'{"message": "injected failure"}'
+
+        parts = url_path.split("/contents/", 1)
+        if len(parts) == 1:
+            # GET /repos/<owner>/<repo>：测试连接
+            return 200, {}, json.dumps({"full_name": url_path.split("/repos/", 1)[-1],
+                                        "permissions": {"push": True}}).encode("utf-8")
+        path = unquote(parts[1])
+
+        with self.lock:
+            current = self.files.get(path)
+            if method == "GET":
+                if current is None:
+                    return 404, {}, b'{"message": "Not Found"}'
+                etag = f'"{git_blob_sha(current)}"'
+                if headers.get("If-None-Match") == etag:
+                    return 304, {"ETag": etag}, b""
+                if "raw" in headers.get("Accept", ""):
+                    return 200, {"ETag": etag}, current
+                return 200, {"ETag": etag}, json.dumps({
+                    "path": path, "sha": git_blob_sha(current),
+                    "content": base64.b64encode(current).decode("ascii"), "encoding": "base64"}).encode("utf-8")
+
+            payload = json.loads(body or b"{}")
+            sha = payload.get("sha")
+            if method == "PUT":
+                if (current is None and sha) or (current is not None and git_blob_sha(current) != sha):
+                    return 409, {}, b'{"message": "sha does not match"}'
+                self.files[path] = base64.b64decode(payload["content"])
+                return 200, {}, json.dumps({"content": {"path": path,
+                                                        "sha": git_blob_sha(self.files[path])}}).encode("utf-8")
+            if method == "DELETE":
+                if current is None:
+                    return 404, {}, b'{"message": "Not Found"}'
+                if git_blob_sha(current) != sha:
+                    return 409, {}, b'{"message": "sha does not match"}'
+                del self.files[path]
+                return 200, {}, b'{"commit": {}}'
+        return 405, {}, b'{"message": "Method Not Allowed"}'
+
+    def _make_handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持长连接，与GitHub一致
+            wbufsize = -1  # 响应头和内容一起发送，避免长连接上的延迟确认拖慢每个请求
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, content = mock.handle(self.command, self.path, self.headers, body)
+                with mock.lock:
+                    mock.requests.append((self.command, self.path, status))
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_PUT = do_DELETE = _serve
+
+        return Handler
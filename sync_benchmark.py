@@ -0,0 +1,237 @@
+"""云同步吞吐量基准测试
+
+在本地目录或进程内模拟的GitHub接口上测量增量同步的上传、下载耗时和传输字节数，
+不需要网络和GitHub账号。例如：
+
+    python sync_benchmark.py --sizes 100,1000,5000 --backend http --latency 0.02
+    python sync_benchmark.py --backend fs --encoding gzip
+
+每个数据规模依次测量：首次上传、各种修改方式后的增量上传、新设备的完整下载，
+以及另一台设备在修改后的增量下载。
+"""
+import io
+import os
+import sys
+import copy
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+from delta_sync import DeltaCloudSync, ENCODING_NONE, ENCODING_GZIP, ENCODING_ZSTD
+from sync_backends import FileSystemBackend, GitHubBackend, MockGitHubServer
+
+
+# 修改方式：名称 -> 说明
+EDIT_PATTERNS = {
+    "single": "修改1个订单",
+    "scattered": "随机修改1%的订单（分散在各月份）",
+    "month": "修改一个月的全部订单",
+    "new": "新增20个本月订单",
+    "delete": "删除10个订单",
+}
+
+
+def generate_data(size, manufacturers=5, months=24, seed=0):
+    """生成size个订单的测试数据，订单平均分布在最近months个月和manufacturers个厂家中"""
+    rng = random.Random(seed)
+    names = [f"厂家{i + 1}" for i in range(manufacturers)]
+    start = datetime(2024, 1, 1)
+    orders = {}
+    for i in range(size):
+        date = start + timedelta(days=rng.randrange(months * 30), seconds=rng.randrange(86400))
+        manufacturer = names[i % manufacturers]
+        area = round(rng.uniform(2, 40), 6)
+        unit_price = 8.0
+        orders[f"测试小区{i // 100 + 1}号楼{i % 100 + 1}室"] = {
+            "path": f"D:/YunxiData/云熙拆单/柜体数据\\测试小区{i // 100 + 1}号楼{i % 100 + 1}室",
+            "total_area": area,
+            "total_price": round(area * unit_price, 6),
+            "manufacturer": manufacturer,
+            "unit_price": unit_price,
+            "paid": rng.random() < 0.5,
+            "date": date.strftime("%Y-%m-%d %H:%M:%S"),
+            "rev": 1,
+        }
+    return {
+        "orders": orders,
+        "manufacturers": {name: {"name": name, "unit_price": 8.0, "permission": "读写"} for name in names},
+        "bound_order_dir": "",
+        "timestamp": datetime.now().isoformat(),
+        "version": "1.0",
+    }
+
+
+def apply_edit(data, pattern, rng):
+    """按修改方式修改数据（原地），返回修改的订单数"""
+    orders = data["orders"]
+    names = sorted(orders)
+
+    def touch(order_name):
+        order = orders[order_name]
+        order["paid"] = not order.get("paid", False)
+        order["rev"] = order.get("rev", 0) + 1
+
+    if pattern == "single":
+        touch(rng.choice(names))
+        return 1
+    if pattern == "scattered":
+        chosen = rng.sample(names, max(1, len(names) // 100))
+        for order_name in chosen:
+            touch(order_name)
+        return len(chosen)
+    if pattern == "month":
+        month = orders[rng.choice(names)]["date"][:7]
+        chosen = [order_name for order_name in names if orders[order_name]["date"].startswith(month)]
+        for order_name in chosen:
+            touch(order_name)
+        return len(chosen)
+    if pattern == "new":
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        manufacturers = sorted(data["manufacturers"])
+        for i in range(20):
+            orders[f"新增订单{len(orders)}-{i}"] = {
+                "path": "", "total_area": 10.0, "total_price": 80.0, "manufacturer": manufacturers[i % len(manufacturers)],
+                "unit_price": 8.0, "paid": False, "date": now, "rev": 1,
+            }
+        return 20
+    if pattern == "delete":
+        chosen = rng.sample(names, min(10, len(names)))
+        for order_name in chosen:
+            del orders[order_name]
+        return len(chosen)
+    raise ValueError(f"未知的修改方式: {pattern}")
+
+
+class BenchmarkRemote:
+    """一次测试使用的云端：本地目录或模拟的GitHub接口"""
+
+    def __init__(self, kind, latency=0.0, failure_rate=0.0):
+        self.kind = kind
+        self.root = tempfile.mkdtemp(prefix="sync_bench_")
+        self.server = None
+        if kind == "http":
+            self.server = MockGitHubServer(latency=latency, failure_rate=failure_rate, seed=0)
+            self.server.start()
+
+    def new_backend(self):
+        """每台模拟设备各用一个后端实例，分别统计流量"""
+        if self.server is not None:
+            github_sync = SimpleNamespace(repo="bench/orders", headers={})
+            return GitHubBackend(github_sync, api_url=self.server.url)
+        return FileSystemBackend(f"{self.root}/remote")
+
+    def new_client(self, name, encoding):
+        backend = self.new_backend()
+        client_dir = f"{self.root}/{name}"
+        return DeltaCloudSync(None, f"{client_dir}/data.json", encoding=encoding, backend=backend), backend
+
+    def close(self):
+        if self.server is not None:
+            self.server.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def measure(backend, action, verbose=False):
+    """执行一次同步，返回(结果, 耗时秒, 发送字节, 接收字节, 请求数)"""
+    backend.reset_stats()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with output:
+        result = action()
+    elapsed = time.perf_counter() - started
+    return result, elapsed, backend.stats["sent"], backend.stats["received"], backend.stats["requests"]
+
+
+def run_size(kind, size, args):
+    """测量一个数据规模，返回结果行列表"""
+    rows = []
+    remote = BenchmarkRemote(kind, args.latency, args.failure_rate)
+    try:
+        for name in ("writer", "reader"):
+            os.makedirs(f"{remote.root}/{name}", exist_ok=True)
+        writer, writer_backend = remote.new_client("writer", args.encoding)
+        reader, reader_backend = remote.new_client("reader", args.encoding)
+        data = generate_data(size, args.manufacturers, seed=args.seed)
+        rng = random.Random(args.seed)
+
+        def sync_writer():
+            result = writer.sync(copy.deepcopy(data))
+            writer.commit(result)
+            return result
+
+        _, *stats = measure(writer_backend, sync_writer, args.verbose)
+        rows.append((kind, size, "首次上传", len(data["orders"]), *stats))
+
+        _, *stats = measure(reader_backend, reader.download_data, args.verbose)
+        rows.append((kind, size, "完整下载", len(data["orders"]), *stats))
+
+        for pattern in args.patterns:
+            changed = apply_edit(data, pattern, rng)
+            _, *stats = measure(writer_backend, sync_writer, args.verbose)
+            rows.append((kind, size, f"上传: {EDIT_PATTERNS[pattern]}", changed, *stats))
+            _, *stats = measure(reader_backend, reader.download_data, args.verbose)
+            rows.append((kind, size, f"下载: {EDIT_PATTERNS[pattern]}", changed, *stats))
+
+        _, *stats = measure(reader_backend, reader.download_data, args.verbose)
+        rows.append((kind, size, "下载: 没有变化", 0, *stats))
+    finally:
+        remote.close()
+    return rows
+
+
+def format_bytes(count):
+    if count >= 1024 * 1024:
+        return f"{count / 1024 / 1024:.1f} MB"
+    if count >= 1024:
+        return f"{count / 1024:.1f} KB"
+    return f"{count} B"
+
+
+def print_rows(rows):
+    print(f"{'后端':<6}{'订单数':>8}  {'操作':<28}{'订单':>6}{'耗时':>10}{'发送':>12}{'接收':>12}{'请求':>6}")
+    for kind, size, action, changed, elapsed, sent, received, requests in rows:
+        print(f"{kind:<6}{size:>8}  {action:<28}{changed:>6}{elapsed * 1000:>8.0f}ms"
+              f"{format_bytes(sent):>12}{format_bytes(received):>12}{requests:>6}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="云同步吞吐量基准测试（本地目录或模拟的GitHub接口）")
+    parser.add_argument("--sizes", default="100,1000,5000", help="订单数量，逗号分隔")
+    parser.add_argument("--backend", choices=("fs", "http", "both"), default="both",
+                        help="fs: 本地目录; http: 进程内模拟的GitHub接口")
+    parser.add_argument("--patterns", default=",".join(EDIT_PATTERNS),
+                        help=f"修改方式，逗号分隔: {', '.join(EDIT_PATTERNS)}")
+    parser.add_argument("--encoding", choices=(ENCODING_NONE, ENCODING_GZIP, ENCODING_ZSTD), default=ENCODING_NONE,
+                        help="分片压缩方式")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟接口每个请求的延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="模拟接口随机返回503的比例")
+    parser.add_argument("--manufacturers", type=int, default=5, help="厂家数量")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--verbose", action="store_true", help="显示同步过程的日志")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    args.patterns = [pattern.strip() for pattern in args.patterns.split(",") if pattern.strip()]
+    for pattern in args.patterns:
+        if pattern not in EDIT_PATTERNS:
+            parser.error(f"未知的修改方式: {pattern}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    kinds = ("fs", "http") if args.backend == "both" else (args.backend,)
+    rows = []
+    for kind in kinds:
+        for size in args.sizes:
+            rows.extend(run_size(kind, size, args))
+    print_rows(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
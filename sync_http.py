@@ -0,0 +1,127 @@
+import time
+import random
+import threading
+
+
+# GitHub接口地址（测试时可指向本地的替身服务器）
+GITHUB_API = "https://api.github.com"
+
+# 每次请求的超时：(建立连接, 读取响应) 秒
+DEFAULT_TIMEOUT = (5, 30)
+
+# 服务器错误（5xx）和限流时的重试：第n次重试前等待 BACKOFF_BASE * 2^n 秒（带随机抖动），最多 BACKOFF_MAX 秒
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUS = (500, 502, 503, 504)
+
+# 连接池大小：同时只有保存线程、启动同步线程和主线程可能发请求
+POOL_SIZE = 4
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """所有云同步请求共用的会话，保持长连接，重复同步时复用TCP/TLS连接"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def close_session():
+    """关闭共用会话（程序退出时调用）"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def github_headers(token):
+    return {
+        "Authorization": f"token {token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+
+def request(method, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """发送请求，服务器错误、限流和网络中断时按指数退避重试，返回最后一次的响应
+
+    重试用完后网络错误原样抛出；4xx等不可重试的响应直接返回，由调用方判断状态码
+    """
+    import requests
+
+    session = get_session()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"⚠️ 网络请求失败，{delay:.1f} 秒后重试: {e}")
+            time.sleep(delay)
+            continue
+
+        delay = retry_delay(response, attempt)
+        if delay is None or attempt == MAX_RETRIES:
+            return response
+        print(f"⚠️ 服务器返回 {response.status_code}，{delay:.1f} 秒后重试")
+        response.close()
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
+
+
+def backoff_delay(attempt):
+    """第attempt次重试前的等待时间：指数增长，加随机抖动避免多台设备同时重试"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def retry_delay(response, attempt):
+    """响应需要重试时返回等待秒数，不需要重试时返回None
+
+    GitHub限流返回429，或403且X-RateLimit-Remaining为0；有Retry-After或X-RateLimit-Reset时
+    按服务器给出的时间等待，但不超过BACKOFF_MAX，超过时不再重试，直接返回错误
+    """
+    status = response.status_code
+    headers = response.headers
+    rate_limited = status == 429 or (status == 403 and headers.get("X-RateLimit-Remaining") == "0")
+    if status not in RETRY_STATUS and not rate_limited:
+        return None
+
+    wait = None
+    try:
+        if headers.get("Retry-After"):
+            wait = float(headers["Retry-After"])
+        elif rate_limited and headers.get("X-RateLimit-Reset"):
+            wait = max(0.0, float(headers["X-RateLimit-Reset"]) - time.time())
+    except ValueError:
+        wait = None
+    if wait is None:
+        return backoff_delay(attempt)
+    if wait > BACKOFF_MAX:
+        print(f"⚠️ GitHub接口限流，需要等待 {wait:.0f} 秒，本次不再重试")
+        return None
+    return wait
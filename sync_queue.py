@@ -0,0 +1,118 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+from order_store import atomic_write
+
+
+class SyncQueue:
+    """待上传到云端的修改队列，持久化在数据文件旁的 sync_queue.json
+
+    每次保存时记录修改过的订单名（同一订单只保留最后一次操作）和厂家数据是否修改，
+    上传成功后移除上传前已记录的项。网络中断时修改留在队列中，程序重启后仍然知道
+    还有哪些修改没有同步，联网后由后台保存线程重新上传。上传时增量同步只重新生成
+    队列中订单所在的分片；未配置云同步期间的修改没有逐个记录，配置后第一次上传比较全部分片。
+    """
+
+    def __init__(self, data_file, cloud_sync):
+        self.queue_file = os.path.join(os.path.dirname(data_file), "sync_queue.json")
+        self.cloud_sync = cloud_sync
+        self.lock = threading.Lock()  # 后台保存线程和主线程都会读写队列
+        self.state = self._load()
+
+    def add(self, changed=(), deleted=(), meta=False):
+        """记录一批修改，返回记录后的序号；未配置云同步时不记录"""
+        with self.lock:
+            if not (changed or deleted or meta):
+                return self.state["seq"]
+            if not (self.cloud_sync and self.cloud_sync.github_sync):
+                # 只记下有过未记录的修改
+                if not self.state["untracked"]:
+                    self.state["untracked"] = True
+                    self._save()
+                return self.state["seq"]
+            self.state["seq"] += 1
+            seq = self.state["seq"]
+            for order_name in changed:
+                self.state["orders"][order_name] = {"op": "changed", "seq": seq}
+            for order_name in deleted:
+                self.state["orders"][order_name] = {"op": "deleted", "seq": seq}
+            if meta:
+                self.state["meta"] = seq
+            self._save()
+            return seq
+
+    def mark(self):
+        """当前序号：此后上传成功时，调用clear(mark)移除在此之前记录的修改"""
+        with self.lock:
+            return self.state["seq"]
+
+    def clear(self, upto):
+        """上传成功后移除序号不大于upto的修改"""
+        with self.lock:
+            orders = {name: entry for name, entry in self.state["orders"].items() if entry["seq"] > upto}
+            meta = self.state["meta"] if self.state["meta"] is not None and self.state["meta"] > upto else None
+            if (orders == self.state["orders"] and meta == self.state["meta"]
+                    and not self.state["failures"] and not self.state["untracked"]):
+                return
+            self.state["orders"] = orders
+            self.state["meta"] = meta
+            self.state["untracked"] = False
+            self.state["failures"] = 0
+            self.state["last_error"] = ""
+            self._save()
+
+    def record_failure(self, error):
+        """记录一次上传失败，队列内容保留到下次上传成功"""
+        with self.lock:
+            self.state["failures"] += 1
+            self.state["last_error"] = str(error)
+            self.state["last_attempt"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._save()
+
+    def pending_count(self):
+        """待上传的修改数（订单数，厂家数据算一项）"""
+        with self.lock:
+            return len(self.state["orders"]) + (1 if self.state["meta"] is not None else 0)
+
+    def pending_orders(self):
+        """有未上传修改的订单名"""
+        with self.lock:
+            return set(self.state["orders"])
+
+    def pending_changes(self):
+        """自上次上传成功以来修改过的订单名和厂家数据是否修改；有未记录的修改时返回None"""
+        with self.lock:
+            if self.state["untracked"]:
+                return None
+            return set(self.state["orders"]), self.state["meta"] is not None
+
+    def has_pending(self):
+        return self.pending_count() > 0
+
+    def failures(self):
+        with self.lock:
+            return self.state["failures"]
+
+    def _load(self):
+        try:
+            if os.path.exists(self.queue_file):
+                with open(self.queue_file, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                state.setdefault("seq", 0)
+                state.setdefault("orders", {})
+                state.setdefault("meta", None)
+                state.setdefault("failures", 0)
+                state.setdefault("untracked", False)
+                return state
+        except Exception as e:
+            print(f"读取待同步队列失败: {e}")
+        return {"seq": 0, "orders": {}, "meta": None, "failures": 0, "last_error": "", "last_attempt": "",
+                "untracked": False}
+
+    def _save(self):
+        try:
+            atomic_write(self.queue_file, json.dumps(self.state, ensure_ascii=False, indent=2).encode("utf-8"))
+        except Exception as e:
+            print(f"保存待同步队列失败: {e}")
@@ -0,0 +1,32 @@
+class FakeRoot:
+    """代替Tk根窗口的after()定时器，测试中调用advance()推进时间，不需要显示器"""
+
+    def __init__(self):
+        self.now = 0
+        self.timers = {}  # 定时器编号 -> (到期时间, 回调)
+        self.next_id = 0
+
+    def after(self, delay_ms, func):
+        self.next_id += 1
+        self.timers[self.next_id] = (self.now + delay_ms, func)
+        return self.next_id
+
+    def after_cancel(self, timer_id):
+        self.timers.pop(timer_id, None)
+
+    def advance(self, delay_ms):
+        """推进时间，按到期顺序执行期间到期的回调（包括回调中新加的）"""
+        target = self.now + delay_ms
+        while True:
+            due = [(when, timer_id) for timer_id, (when, _) in self.timers.items() if when <= target]
+            if not due:
+                break
+            when, timer_id = min(due)
+            self.now = when
+            _, func = self.timers.pop(timer_id)
+            func()
+        self.now = target
+
+    def delays(self):
+        """尚未到期的定时器还要等待的时间"""
+        return sorted(when - self.now for when, _ in self.timers.values())
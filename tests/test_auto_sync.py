@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from auto_sync import AutoSyncScheduler
+from order_store import OrderStore
+from tests.fake_tk import FakeRoot
+
+MINUTE = 60 * 1000
+
+
+class AutoSyncSchedulerTest(unittest.TestCase):
+    """定时自动同步：合并修改、忙碌时推迟、失败时延长间隔"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.root = FakeRoot()
+        self.store = OrderStore(os.path.join(self.dir, "data.json"))
+        self.enabled = True
+        self.busy = False
+        self.succeed = True
+        self.syncs = []
+        self.scheduler = AutoSyncScheduler(self.root, self.store, self.upload, lambda: self.enabled,
+                                           lambda: self.busy, interval_minutes=5)
+        self.scheduler.start()
+
+    def tearDown(self):
+        self.scheduler.stop()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def upload(self):
+        self.syncs.append(self.store.generation)
+        if self.succeed:
+            self.store.mark_synced()
+
+    def change(self, name="a"):
+        self.store.mark_order_changed(name)
+
+    def test_changes_within_interval_are_synced_once(self):
+        self.root.advance(5 * MINUTE)
+        self.assertEqual(self.syncs, [])
+
+        for name in ("a", "b", "c"):
+            self.change(name)
+            self.root.advance(MINUTE)
+        self.assertEqual(self.syncs, [])
+        self.root.advance(2 * MINUTE)
+        self.assertEqual(self.syncs, [3])
+
+        # 没有新修改时不再上传
+        self.root.advance(15 * MINUTE)
+        self.assertEqual(self.syncs, [3])
+
+    def test_disabled_does_not_sync(self):
+        self.enabled = False
+        self.change()
+        self.root.advance(20 * MINUTE)
+        self.assertEqual(self.syncs, [])
+
+        self.enabled = True
+        self.root.advance(5 * MINUTE)
+        self.assertEqual(self.syncs, [1])
+
+    def test_busy_postpones_check(self):
+        self.busy = True
+        self.change()
+        self.root.advance(5 * MINUTE)
+        self.assertEqual(self.syncs, [])
+        self.assertEqual(self.root.delays(), [AutoSyncScheduler.BUSY_RETRY_MS])
+
+        self.busy = False
+        self.root.advance(AutoSyncScheduler.BUSY_RETRY_MS)
+        self.assertEqual(self.syncs, [1])
+        self.assertEqual(self.root.delays(), [5 * MINUTE])
+
+    def test_failures_back_off_and_success_resets(self):
+        self.succeed = False
+        self.change()
+        self.root.advance(5 * MINUTE)
+        self.assertEqual(self.root.delays(), [5 * MINUTE])
+
+        self.root.advance(5 * MINUTE)
+        self.assertEqual(self.scheduler.failures, 1)
+        self.assertEqual(self.root.delays(), [10 * MINUTE])
+
+        self.root.advance(10 * MINUTE)
+        self.assertEqual(self.root.delays(), [20 * MINUTE])
+        self.assertEqual(len(self.syncs), 3)
+
+        self.succeed = True
+        self.root.advance(20 * MINUTE)
+        self.root.advance(40 * MINUTE)
+        self.assertEqual(self.scheduler.failures, 0)
+        self.assertEqual(self.root.delays(), [5 * MINUTE])
+
+    def test_interval_is_capped(self):
+        self.scheduler.failures = 10
+        self.assertEqual(self.scheduler._interval_ms(), AutoSyncScheduler.MAX_INTERVAL_MINUTES * MINUTE)
+
+    def test_stop_cancels_timer(self):
+        self.scheduler.stop()
+        self.change()
+        self.root.advance(20 * MINUTE)
+        self.assertEqual(self.syncs, [])
+        self.assertEqual(self.root.delays(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
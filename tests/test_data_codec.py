@@ -0,0 +1,106 @@
+import unittest
+
+import data_codec
+
+
+class SealTest(unittest.TestCase):
+    """文件校验和"""
+
+    def test_round_trip(self):
+        payload = data_codec.dumps({"orders": {"鲁能星城1-2-301": {"paid": True}}})
+        sealed = data_codec.seal(payload)
+        self.assertTrue(sealed.startswith(data_codec.CHECKSUM_PREFIX))
+        self.assertEqual(data_codec.unseal(sealed), payload)
+        # 加了校验和的内容仍是合法的JSON
+        self.assertIn("checksum", data_codec.loads(sealed))
+
+    def test_empty_object_stays_valid_json(self):
+        payload = data_codec.dumps({})
+        sealed = data_codec.seal(payload)
+        self.assertEqual(list(data_codec.loads(sealed)), ["checksum"])
+        self.assertEqual(data_codec.unseal(sealed), payload)
+
+    def test_tampered_content_is_rejected(self):
+        sealed = bytearray(data_codec.seal(data_codec.dumps({"orders": {"a": {"paid": False}}})))
+        sealed[-5] = ord("X")
+        with self.assertRaises(ValueError):
+            data_codec.unseal(bytes(sealed))
+
+    def test_legacy_file_without_checksum_passes_through(self):
+        raw = b'{"orders":{}}'
+        self.assertEqual(data_codec.unseal(raw), raw)
+
+
+class MigrationTest(unittest.TestCase):
+    """旧版本数据文件逐级升级到当前版本"""
+
+    def expanded(self):
+        return {"version": "1.0", "manufacturers": {"M1": {"unit_price": 200}}, "bound_order_dir": "D:/订单",
+                "orders": {"a": {"name": "a", "paid": True, "date": "2025-01-02 10:00:00", "rooms": {
+                    "厨房": {"name": "厨房", "cabinets": {
+                        "吊柜": {"name": "吊柜", "width": 600, "height": 700, "area": 0.42, "note": "加厚"}}}}}}}
+
+    def assert_current(self, migrated):
+        self.assertEqual(migrated["version"], "3.0")
+        self.assertEqual(migrated["manufacturers"], {"M1": {"unit_price": 200}})
+        self.assertEqual(migrated["bound_order_dir"], "D:/订单")
+        self.assertEqual(migrated["orders"], {"a": {"paid": True, "date": "2025-01-02 10:00:00", "rooms": [
+            ["厨房", [["吊柜", 600, 700, 0.42, {"note": "加厚"}]]]]}})
+
+    def test_version_1_0_is_upgraded(self):
+        data = self.expanded()
+        migrated, changed = data_codec.migrate_data(data)
+        self.assertTrue(changed)
+        self.assert_current(migrated)
+        self.assertEqual(data, self.expanded())
+
+    def test_version_2_0_is_upgraded(self):
+        data = data_codec.MIGRATIONS["1.0"](self.expanded())
+        self.assertEqual(data["version"], "2.0")
+        migrated, changed = data_codec.migrate_data(data)
+        self.assertTrue(changed)
+        self.assert_current(migrated)
+
+    def test_missing_version_is_treated_as_1_0(self):
+        data = self.expanded()
+        del data["version"]
+        self.assert_current(data_codec.migrate_data(data)[0])
+
+    def test_current_version_is_unchanged(self):
+        data = data_codec.pack_data(self.expanded())
+        self.assertEqual(data_codec.migrate_data(data), (data, False))
+        unpacked, changed = data_codec.unpack_data(data)
+        self.assertFalse(changed)
+        self.assertEqual(unpacked["orders"], self.expanded()["orders"])
+
+    def test_unknown_version_is_refused(self):
+        with self.assertRaises(ValueError):
+            data_codec.migrate_data({"version": "9.0", "orders": {}})
+
+
+class PackTest(unittest.TestCase):
+    """订单明细的紧凑格式"""
+
+    def test_order_round_trip(self):
+        order = {
+            "name": "a", "paid": False, "date": "2025-01-02 10:00:00",
+            "rooms": {
+                "厨房": {"name": "厨房", "cabinets": {
+                    "吊柜": {"name": "吊柜", "width": 600, "height": 700, "area": 0.42},
+                    "地柜": {"name": "地柜", "width": 800, "height": 900, "area": 0.72, "note": "加厚"},
+                }},
+                "主卧": {"name": "主卧", "cabinets": {}, "floor": 2},
+            },
+        }
+        packed = data_codec.pack_order(order)
+        self.assertNotIn("name", packed)
+        self.assertEqual(data_codec.unpack_order("a", data_codec.loads(data_codec.dumps(packed))), order)
+
+    def test_header_only_order(self):
+        order = {"name": "a", "paid": True}
+        self.assertEqual(data_codec.unpack_order("a", data_codec.pack_order(order)), order)
+        self.assertEqual(data_codec.order_header(dict(order, rooms={})), order)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import delta_sync
+from delta_sync import DeltaCloudSync, META_SHARD, merge_dict, merge_shard, merge_value
+from sync_backends import FileSystemBackend, git_blob_sha
+
+
+def make_order(manufacturer="M1", date="2025-01-02 10:00:00", rev=1, **fields):
+    order = {"manufacturer": manufacturer, "date": date, "paid": False, "rev": rev}
+    order.update(fields)
+    return order
+
+
+class MergeRulesTest(unittest.TestCase):
+    """三方合并规则"""
+
+    def test_merge_value(self):
+        base = {"paid": False, "rev": 1}
+        self.assertEqual(merge_value(base, {"paid": True, "rev": 2}, base), ({"paid": True, "rev": 2}, False))
+        self.assertEqual(merge_value(base, base, {"paid": True, "rev": 3}), ({"paid": True, "rev": 3}, False))
+        # 双方改成相同内容（修订号不同）不算冲突
+        self.assertEqual(merge_value(base, {"paid": True, "rev": 2}, {"paid": True, "rev": 5}),
+                         ({"paid": True, "rev": 2}, False))
+        # 双方改成不同内容时冲突，保留本地版本
+        self.assertEqual(merge_value(base, {"paid": True, "rev": 2}, {"paid": False, "note": "x", "rev": 2}),
+                         ({"paid": True, "rev": 2}, True))
+
+    def test_merge_value_deletions(self):
+        base = {"paid": False}
+        self.assertEqual(merge_value(base, None, base), (None, False))
+        self.assertEqual(merge_value(base, base, None), (None, False))
+        self.assertEqual(merge_value(None, None, {"paid": True}), ({"paid": True}, False))
+        # 一方删除、另一方修改时冲突，保留本地版本
+        self.assertEqual(merge_value(base, None, {"paid": True}), (None, True))
+        self.assertEqual(merge_value(base, {"paid": True}, None), ({"paid": True}, True))
+
+    def test_bookkeeping_keys_are_ignored(self):
+        base = {"paid": False, "rev": 1, "room_names": ["厨房"]}
+        local = {"paid": False, "rev": 4, "room_names": ["厨房", "主卧"]}
+        self.assertEqual(merge_value(base, local, {"paid": True, "rev": 2}), ({"paid": True, "rev": 2}, False))
+
+    def test_merge_dict_reports_conflicting_keys(self):
+        base = {"a": 1, "b": 1, "c": 1}
+        merged, conflicts = merge_dict(base, {"a": 2, "b": 1, "c": 3}, {"a": 1, "b": 2, "c": 4, "d": 1})
+        self.assertEqual(merged, {"a": 2, "b": 2, "c": 3, "d": 1})
+        self.assertEqual(conflicts, ["c"])
+
+    def test_merge_meta_shard(self):
+        base = {"manufacturers": {"M1": {"unit_price": 100}}, "bound_order_dir": "D:/a"}
+        local = {"manufacturers": {"M1": {"unit_price": 120}}, "bound_order_dir": "D:/b"}
+        remote = {"manufacturers": {"M1": {"unit_price": 100}, "M2": {"unit_price": 90}}, "bound_order_dir": "D:/c"}
+        merged, conflicts = merge_shard(META_SHARD, base, local, remote)
+        self.assertEqual(merged["manufacturers"], {"M1": {"unit_price": 120}, "M2": {"unit_price": 90}})
+        self.assertEqual(merged["bound_order_dir"], "D:/b")
+        self.assertEqual([(conflict["kind"], conflict["name"]) for conflict in conflicts], [("bound_order_dir", "")])
+
+    def test_merge_order_shard(self):
+        base = {"orders": {"a": make_order(), "b": make_order()}}
+        local = {"orders": {"a": make_order(paid=True, rev=2), "b": make_order(note="本地", rev=2)}}
+        remote = {"orders": {"b": make_order(note="云端", rev=2), "c": make_order()}}
+        merged, conflicts = merge_shard("p/2025-01", base, local, remote)
+        self.assertEqual(sorted(merged["orders"]), ["a", "b", "c"])
+        self.assertEqual(merged["orders"]["b"]["note"], "本地")
+        # 云端删除了本地修改过的a，也是冲突
+        self.assertEqual([(conflict["name"], conflict["remote"]) for conflict in conflicts],
+                         [("a", None), ("b", remote["orders"]["b"])])
+
+
+class DeltaSyncTest(unittest.TestCase):
+    """两台设备通过本地目录后端同步"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.backend = FileSystemBackend(os.path.join(self.dir, "remote"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def client(self, name, manufacturer=None):
+        os.makedirs(os.path.join(self.dir, name))
+        sync = DeltaCloudSync(None, os.path.join(self.dir, name, "data.json"), backend=self.backend)
+        sync.manufacturer = manufacturer
+        return sync
+
+    def sync(self, client, data, **kwargs):
+        result = client.sync(copy.deepcopy(data), **kwargs)
+        client.commit(result)
+        return result
+
+    def initial_data(self):
+        return {"orders": {"a": make_order(), "b": make_order(date="2025-02-03 10:00:00"),
+                           "z": make_order("M2")},
+                "manufacturers": {"M1": {"unit_price": 100}, "M2": {"unit_price": 90}}, "bound_order_dir": ""}
+
+    def test_edits_on_two_devices_are_merged(self):
+        first, second = self.client("first"), self.client("second")
+        data = self.initial_data()
+        self.sync(first, data)
+        other = second.download_data()
+        self.assertEqual(other["orders"], data["orders"])
+
+        other["orders"]["b"] = make_order(date="2025-02-03 10:00:00", paid=True, rev=2)
+        self.sync(second, other)
+
+        data["orders"]["a"] = make_order(note="加急", rev=2)
+        result = self.sync(first, data)
+        self.assertEqual(list(result["orders"]), ["b"])
+        self.assertTrue(result["orders"]["b"][0]["paid"])
+        self.assertEqual(result["conflicts"], [])
+
+        merged = second.download_data()
+        self.assertEqual(merged["orders"]["a"]["note"], "加急")
+        self.assertTrue(merged["orders"]["b"]["paid"])
+
+    def test_conflicting_edits_keep_local_and_report_remote(self):
+        first, second = self.client("first"), self.client("second")
+        data = self.initial_data()
+        self.sync(first, data)
+        other = second.download_data()
+        other["orders"]["a"] = make_order(note="云端", rev=2)
+        self.sync(second, other)
+
+        data["orders"]["a"] = make_order(note="本地", rev=2)
+        result = self.sync(first, data)
+        self.assertEqual([(conflict["name"], conflict["remote"]["note"]) for conflict in result["conflicts"]],
+                         [("a", "云端")])
+        self.assertEqual(second.download_data()["orders"]["a"]["note"], "本地")
+
+    def test_touched_sync_matches_full_sync(self):
+        first, second = self.client("first"), self.client("second")
+        data = self.initial_data()
+        self.sync(first, data)
+        second.download_data()
+
+        # 日期变化使订单换了分片，同时删除和新增订单
+        data["orders"]["a"] = make_order(date="2025-03-01 09:00:00", rev=2)
+        del data["orders"]["b"]
+        data["orders"]["c"] = make_order()
+        data["manufacturers"]["M3"] = {"unit_price": 80}
+        result = self.sync(first, {key: value for key, value in data.items() if key != "orders"},
+                           touched=({"a", "b", "c"}, True),
+                           load_orders=lambda names: {name: copy.deepcopy(data["orders"][name])
+                                                      for name in names or data["orders"] if name in data["orders"]})
+        self.assertEqual(result["conflicts"], [])
+
+        downloaded = second.download_data()
+        self.assertEqual(downloaded["orders"], data["orders"])
+        self.assertEqual(downloaded["manufacturers"], data["manufacturers"])
+
+    def test_touched_sync_without_cache_compares_all_shards(self):
+        first, second = self.client("first"), self.client("second")
+        data = self.initial_data()
+        self.sync(first, data)
+        shutil.rmtree(first.cache_dir)
+
+        data["orders"]["a"] = make_order(paid=True, rev=2)
+        self.sync(first, data, touched=({"a"}, False))
+        self.assertEqual(second.download_data()["orders"], data["orders"])
+
+    def test_scoped_client_hands_off_orders_to_other_manufacturer(self):
+        admin, client = self.client("admin"), self.client("client", manufacturer="M1")
+        data = self.initial_data()
+        self.sync(admin, data)
+        local = client.download_data()
+        self.assertEqual(sorted(local["orders"]), ["a", "b"])
+
+        local["orders"]["a"] = make_order("M2", rev=2)
+        local["orders"]["w"] = make_order("M2", date="2025-04-01 10:00:00")
+        self.sync(client, local, touched=({"a", "w"}, False))
+
+        result = self.sync(admin, data)
+        self.assertEqual(sorted(result["orders"]), ["a", "w"])
+        self.assertEqual(result["orders"]["a"][0]["manufacturer"], "M2")
+        self.assertEqual(sorted(self.client("check").download_data()["orders"]), ["a", "b", "w", "z"])
+
+    def test_legacy_data_file_is_replaced_with_marker(self):
+        legacy = b'{"orders": {}}'
+        self.backend.put_file(delta_sync.LEGACY_DATA_PATH, legacy, None, "旧版本上传")
+        first = self.client("first")
+        data = self.initial_data()
+        self.sync(first, data)
+        raw, _ = self.backend.get_file(delta_sync.LEGACY_DATA_PATH)
+        self.assertEqual(raw, delta_sync.LEGACY_MARKER)
+        with self.assertRaises(ValueError):
+            json.loads(raw)
+
+        # 旧版本程序又写回了整体数据，下次写入清单时重新替换
+        self.backend.put_file(delta_sync.LEGACY_DATA_PATH, legacy, git_blob_sha(raw), "旧版本上传")
+        data["orders"]["a"] = make_order(paid=True, rev=2)
+        self.sync(first, data)
+        self.assertEqual(self.backend.get_file(delta_sync.LEGACY_DATA_PATH)[0], delta_sync.LEGACY_MARKER)
+
+    def test_shard_content_hash_is_stable(self):
+        data = self.initial_data()
+        shards = delta_sync.build_shards(data)
+        reordered = dict(data, orders=dict(reversed(list(data["orders"].items()))))
+        self.assertEqual(shards, delta_sync.build_shards(reordered))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+
+from live_search import LiveSearch
+from tests.fake_tk import FakeRoot
+
+
+class LiveSearchTest(unittest.TestCase):
+    """实时搜索：合并连续输入，快照在主线程取出，已取消的查询结果不显示"""
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.queried = []
+        self.prepared = []
+        self.shown = []
+        self.errors = []
+        self.main_thread = threading.current_thread()
+        self.search = LiveSearch(self.root, self.query, self.show, on_error=self.on_error,
+                                 prepare=self.prepare, delay_ms=250)
+
+    def prepare(self, params):
+        self.prepared.append((params, threading.current_thread() is self.main_thread))
+        return dict(params, snapshot=["订单A", "订单B", "测试订单"])
+
+    def query(self, params, is_cancelled):
+        self.queried.append(params["text"])
+        if params.get("fail"):
+            raise ValueError("查询出错")
+        return [name for name in params["snapshot"] if params["text"] in name]
+
+    def show(self, result, params, query_ms):
+        self.shown.append((params["text"], result))
+
+    def on_error(self, params, error):
+        self.errors.append(str(error))
+
+    def finish(self):
+        """推进时间直到查询结果都已显示"""
+        deadline = time.monotonic() + 5
+        while self.search.is_busy():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+            self.root.advance(LiveSearch.POLL_MS)
+
+    def test_typing_burst_queries_last_text_only(self):
+        for text in ("订", "订单", "订单A"):
+            self.search.request({"text": text})
+            self.root.advance(100)
+        self.assertEqual(self.prepared, [])
+        self.root.advance(250)
+        self.finish()
+        self.assertEqual(self.queried, ["订单A"])
+        self.assertEqual(self.shown, [("订单A", ["订单A"])])
+
+    def test_prepare_runs_on_main_thread(self):
+        self.search.request({"text": "测试"})
+        self.root.advance(250)
+        self.finish()
+        self.assertEqual(self.prepared, [({"text": "测试"}, True)])
+        self.assertEqual(self.shown, [("测试", ["测试订单"])])
+
+    def test_cancelled_query_is_not_shown(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_query(params, is_cancelled):
+            started.set()
+            release.wait(5)
+            return None if is_cancelled() else ["订单A"]
+
+        self.search.query = slow_query
+        self.search.request({"text": "订单"})
+        self.root.advance(250)
+        self.assertTrue(started.wait(5))
+        self.search.cancel()
+        release.set()
+        self.finish()
+        self.assertEqual(self.shown, [])
+
+    def test_result_of_superseded_query_is_dropped(self):
+        self.search.request({"text": "订单"})
+        self.root.advance(250)
+        # 第一次查询还没显示时又有新的输入
+        self.search.request({"text": "测试"})
+        self.root.advance(250)
+        self.finish()
+        self.assertEqual(self.shown, [("测试", ["测试订单"])])
+
+    def test_errors_are_reported_on_main_thread(self):
+        self.search.request({"text": "订单", "fail": True})
+        self.root.advance(250)
+        self.finish()
+        self.assertEqual(self.errors, ["查询出错"])
+        self.assertEqual(self.shown, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
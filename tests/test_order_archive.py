@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from order_archive import OrderArchive
+
+
+def make_order(name, date, manufacturer="M1", total_price=300.5):
+    return {"name": name, "manufacturer": manufacturer, "paid": True, "date": date, "total_price": total_price,
+            "rooms": {"厨房": {"name": "厨房", "cabinets": {"吊柜": {"name": "吊柜", "width": 600, "height": 700, "area": 0.42}}}}}
+
+
+class OrderArchiveTest(unittest.TestCase):
+    """按年份的冷存档：写入、索引统计、按条件查找和移除"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.dir, "data.json")
+        self.orders = {
+            "a": make_order("a", "2022-03-01 10:00:00"),
+            "b": make_order("b", "2022-11-20 10:00:00", manufacturer="M2", total_price=100),
+            "c": make_order("c", "2023-01-05 10:00:00"),
+        }
+        self.archive = OrderArchive(self.data_file)
+        self.assertEqual(sorted(self.archive.archive_orders(self.orders)), ["a", "b", "c"])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_index_answers_without_reading_archives(self):
+        archive = OrderArchive(self.data_file)
+        self.assertEqual(archive.years(), ["2022", "2023"])
+        self.assertEqual(archive.months(), {"2022-03", "2022-11", "2023-01"})
+        self.assertEqual(archive.count(), 3)
+        self.assertEqual(archive.paid_totals(), (3, 70100))
+        self.assertEqual(archive.paid_totals("M2"), (1, 10000))
+        self.assertEqual(archive.cache, {})
+
+    def test_find_reads_only_overlapping_years(self):
+        archive = OrderArchive(self.data_file)
+        found = archive.find_orders(date_from="2023-01-01 00:00:00", date_to="2023-02-01 00:00:00")
+        self.assertEqual(found, {"c": self.orders["c"]})
+        self.assertEqual(list(archive.cache), ["2023"])
+
+        self.assertEqual(sorted(archive.find_orders(manufacturer="M1")), ["a", "c"])
+        self.assertEqual(archive.find_orders(paid=False), {})
+        self.assertEqual(archive.find_order("b"), ("2022", self.orders["b"]))
+        self.assertEqual(archive.find_order("x"), (None, None))
+
+    def test_unchanged_orders_are_not_rewritten(self):
+        path = os.path.join(self.dir, "archive", "2022.json.gz")
+        os.utime(path, (0, 0))
+        self.archive.archive_orders({"a": self.orders["a"]})
+        self.assertEqual(os.stat(path).st_mtime, 0)
+
+        changed = dict(self.orders["a"], total_price=1)
+        self.archive.archive_orders({"a": changed})
+        self.assertEqual(OrderArchive(self.data_file).find_order("a"), ("2022", changed))
+
+    def test_remove_orders_updates_index_and_files(self):
+        self.archive.remove_orders(["c", "a"])
+        archive = OrderArchive(self.data_file)
+        self.assertEqual(archive.years(), ["2022"])
+        self.assertEqual(archive.paid_totals(), (1, 10000))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "archive", "2023.json.gz")))
+        self.assertEqual(archive.find_orders(), {"b": self.orders["b"]})
+
+    def test_corrupt_index_is_rebuilt_from_archives(self):
+        with open(os.path.join(self.dir, "archive", "index.json"), "wb") as f:
+            f.write(b"{broken")
+        archive = OrderArchive(self.data_file)
+        self.assertEqual(archive.years(), ["2022", "2023"])
+        self.assertEqual(archive.paid_totals("M1"), (2, 60100))
+
+
+if __name__ == "__main__":
+    unittest.main()
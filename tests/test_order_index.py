@@ -0,0 +1,126 @@
+import random
+import unittest
+
+import order_index
+from order_index import OrderIndex, TextIndex, SEARCH_SCOPES, parse_date, to_cents
+
+
+def random_orders(rng, count):
+    customers = ["张三", "李四", "王五", "鲁能星城", "万科城", ""]
+    rooms = ["主卧", "次卧", "厨房", "书房"]
+    orders = {}
+    for i in range(count):
+        orders[f"鲁能星城{i}-{rng.randint(1, 30)}"] = {
+            "manufacturer": rng.choice(["M1", "M2", "吴姐"]),
+            "paid": rng.random() < 0.5,
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00",
+            "customer_name": rng.choice(customers) + str(rng.randint(0, 9)),
+            "room_names": rng.sample(rooms, rng.randint(0, 3)),
+        }
+    return orders
+
+
+class OrderIndexTest(unittest.TestCase):
+    """索引筛选结果与逐个比较的结果一致"""
+
+    def brute_select(self, orders, manufacturer, paid, date_from, date_to):
+        matched = [(order["date"], name) for name, order in orders.items()
+                   if (manufacturer is None or order["manufacturer"] == manufacturer)
+                   and (paid is None or order["paid"] == paid)
+                   and (date_from is None or order["date"] >= date_from)
+                   and (date_to is None or order["date"] < date_to)]
+        return [name for _, name in sorted(matched)]
+
+    def test_select_matches_brute_force_after_updates(self):
+        rng = random.Random(7)
+        orders = random_orders(rng, 300)
+        index = OrderIndex()
+        index.rebuild(orders)
+        for name in rng.sample(sorted(orders), 60):
+            orders[name] = dict(orders[name], paid=not orders[name]["paid"], manufacturer="M2")
+            index.update(name, orders[name])
+        for name in rng.sample(sorted(orders), 30):
+            del orders[name]
+            index.remove(name)
+
+        for manufacturer in (None, "M1", "M2", "吴姐", "无"):
+            for paid in (None, True, False):
+                for date_from, date_to in ((None, None), ("2024-03-01 00:00:00", "2024-04-01 00:00:00"),
+                                           ("2024-06-15 00:00:00", None)):
+                    self.assertEqual(index.select(manufacturer, paid, date_from, date_to),
+                                     self.brute_select(orders, manufacturer, paid, date_from, date_to))
+        self.assertEqual(sorted(index.months()), sorted({int(o["date"][:4] + o["date"][5:7]) for o in orders.values()}))
+
+
+class TextIndexTest(unittest.TestCase):
+    """全文索引的查询结果与子串比较的结果一致"""
+
+    def brute_search(self, orders, query, fields):
+        query = query.strip().lower()
+        found = set()
+        for name, order in orders.items():
+            values = {"name": [name], "customer": [order.get("customer_name", "")],
+                      "manufacturer": [order.get("manufacturer", "")], "room": order.get("room_names", [])}
+            if any(query in str(value).lower() for field in fields for value in values[field]):
+                found.add(name)
+        return found
+
+    def test_search_matches_brute_force(self):
+        rng = random.Random(3)
+        orders = random_orders(rng, 400)
+        index = TextIndex()
+        index.rebuild(orders)
+        index.search("x")
+        for name in rng.sample(sorted(orders), 50):
+            orders[name] = dict(orders[name], customer_name="李四丰", room_names=["阳台"])
+            index.update(name, orders[name])
+        for name in rng.sample(sorted(orders), 20):
+            del orders[name]
+            index.remove(name)
+
+        for query in ("鲁", "鲁能", "星城1", "-1", "张三", "四丰", "m", "吴", "卧", "阳台", "不存在", " 万科 "):
+            for fields in SEARCH_SCOPES.values():
+                self.assertEqual(index.search(query, fields), self.brute_search(orders, query, fields),
+                                 (query, fields))
+
+    def test_edits_before_first_search_are_seen(self):
+        orders = {"a": {"customer_name": "张三"}}
+        index = TextIndex()
+        index.rebuild(orders)
+        orders["b"] = {"customer_name": "张三丰"}
+        index.update("b", orders["b"])
+        self.assertEqual(index.search("张三"), {"a", "b"})
+
+    def test_edits_during_build_are_applied(self):
+        orders = {f"o{i}": {"customer_name": "张三"} for i in range(50)}
+        index = TextIndex()
+        index.rebuild(orders)
+
+        class BuildingIndex(TextIndex):
+            """build()在新建的索引上逐个加入订单，加到o10时模拟主线程修改订单"""
+
+            def _add(self, order_name, doc):
+                if order_name == "o10":
+                    index.remove("o1")
+                    index.update("o2", {"customer_name": "李四"})
+                return super()._add(order_name, doc)
+
+        order_index.TextIndex = BuildingIndex
+        try:
+            self.assertEqual(index.search("张三"), {f"o{i}" for i in range(50)} - {"o1", "o2"})
+        finally:
+            order_index.TextIndex = TextIndex
+        self.assertEqual(index.search("李四"), {"o2"})
+        self.assertIsNone(index.building)
+
+
+class MoneyTest(unittest.TestCase):
+    def test_to_cents_and_dates(self):
+        self.assertEqual(to_cents(0.1) + to_cents(0.2), to_cents(0.3))
+        self.assertEqual(to_cents("12.34"), 1234)
+        self.assertIsNone(parse_date("2024-13-01"))
+        self.assertEqual(parse_date("2024-02-29")[1], 202402)
+
+
+if __name__ == "__main__":
+    unittest.main()
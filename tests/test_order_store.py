@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import data_codec
+from order_store import BaseOrderStore, OrderStore
+
+
+def make_order(name, paid=False, rooms=None, date="2025-01-02 10:00:00"):
+    order = {"name": name, "path": "", "total_area": 1.5, "total_price": 300, "manufacturer": "M1",
+             "unit_price": 200, "paid": paid, "date": date}
+    if rooms is not None:
+        order["rooms"] = rooms
+    return order
+
+
+def room(name, *cabinets):
+    return {"name": name, "cabinets": {cabinet: {"name": cabinet, "width": 600, "height": 800, "area": 0.48}
+                                       for cabinet in cabinets}}
+
+
+class OrderStoreRecoveryTest(unittest.TestCase):
+    """快照 + 变更日志的保存、重放和损坏恢复"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.dir, "data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def data(self, orders):
+        return {"orders": orders, "manufacturers": {"M1": {"unit_price": 200}}, "bound_order_dir": ""}
+
+    def test_journal_is_replayed_on_load(self):
+        store = OrderStore(self.data_file)
+        orders = {"a": make_order("a", rooms={"厨房": room("厨房", "吊柜")}), "b": make_order("b", rooms={})}
+        store.save(self.data(orders), full=True)
+
+        orders["a"]["paid"] = True
+        store.mark_order_changed("a")
+        del orders["b"]
+        store.mark_order_deleted("b")
+        orders["c"] = make_order("c", rooms={"主卧": room("主卧", "衣柜")})
+        store.mark_order_changed("c")
+        store.save(self.data(orders))
+
+        loaded = OrderStore(self.data_file).load()
+        self.assertEqual(sorted(loaded["orders"]), ["a", "c"])
+        self.assertTrue(loaded["orders"]["a"]["paid"])
+        self.assertNotIn("rooms", loaded["orders"]["c"])
+        self.assertEqual(OrderStore(self.data_file).load_body("c"), orders["c"]["rooms"])
+
+    def test_read_orders_leaves_store_state_alone(self):
+        store = OrderStore(self.data_file)
+        orders = {"a": make_order("a", rooms={})}
+        store.save(self.data(orders), full=True)
+        orders["b"] = make_order("b", rooms={})
+        store.mark_order_changed("b")
+        store.save(self.data(orders))
+
+        reader = OrderStore(self.data_file)
+        reader.compact_requested = False
+        self.assertEqual(sorted(reader.read_orders()), ["a", "b"])
+        self.assertEqual((reader.journal_records, reader.journal_bytes, reader.compact_requested), (0, 0, False))
+        self.assertEqual(store.journal_records, 1)
+
+    def test_torn_journal_tail_is_ignored(self):
+        store = OrderStore(self.data_file)
+        orders = {"a": make_order("a", rooms={})}
+        store.save(self.data(orders), full=True)
+        orders["a"]["paid"] = True
+        store.mark_order_changed("a")
+        store.save(self.data(orders))
+        with open(store.journal_file, "ab") as f:
+            f.write(b'{"op":"put","name":"x","ord')
+
+        loaded = OrderStore(self.data_file).load()
+        self.assertEqual(sorted(loaded["orders"]), ["a"])
+        self.assertTrue(loaded["orders"]["a"]["paid"])
+
+    def test_corrupt_snapshot_falls_back_to_backup_and_journal(self):
+        store = OrderStore(self.data_file)
+        orders = {"a": make_order("a", rooms={})}
+        store.save(self.data(orders), full=True)
+        store.save(self.data(orders), full=True)
+        self.assertTrue(os.path.exists(self.data_file + ".bak1"))
+        orders["a"]["paid"] = True
+        store.mark_order_changed("a")
+        store.save(self.data(orders))
+
+        with open(self.data_file, "r+b") as f:
+            f.seek(100)
+            f.write(b"#")
+
+        recovered = OrderStore(self.data_file)
+        loaded = recovered.load()
+        self.assertTrue(loaded["orders"]["a"]["paid"])
+        self.assertTrue(recovered.compact_requested)
+
+    def test_all_snapshots_corrupt_raises(self):
+        store = OrderStore(self.data_file)
+        store.save(self.data({"a": make_order("a", rooms={})}), full=True)
+        with open(self.data_file, "wb") as f:
+            f.write(b"not json")
+        with self.assertRaises(ValueError):
+            OrderStore(self.data_file).load()
+
+    def test_header_only_record_drops_stale_inline_rooms(self):
+        store = OrderStore(self.data_file)
+        old_rooms = {"厨房": room("厨房", "吊柜")}
+        new_rooms = {"书房": room("书房", "书柜")}
+        store.save(self.data({"a": make_order("a", rooms=new_rooms)}), full=True)
+
+        # 回退到的旧快照中内嵌着过时的明细，日志记录只有概要
+        data = self.data({"a": make_order("a", rooms=old_rooms)})
+        record = {"op": "put", "name": "a", "order": data_codec.pack_order(make_order("a", paid=True))}
+        store._apply_record(data, record)
+        self.assertNotIn("rooms", data["orders"]["a"])
+        self.assertTrue(data["orders"]["a"]["paid"])
+        self.assertEqual(store.load_body("a"), new_rooms)
+
+        # 没有明细文件时内嵌的明细是唯一的副本，保留
+        data = self.data({"b": make_order("b", rooms=old_rooms)})
+        store._apply_record(data, {"op": "put", "name": "b", "order": data_codec.pack_order(make_order("b"))})
+        self.assertEqual(data["orders"]["b"]["rooms"], old_rooms)
+
+
+class FailingStore(BaseOrderStore):
+    def __init__(self):
+        super().__init__("unused.json")
+        self.fail = True
+
+    def write_changes(self, batch):
+        if self.fail:
+            raise OSError("disk full")
+
+
+class ChangeTrackingTest(unittest.TestCase):
+    """变更记录、批次失败后的回退和存档移动"""
+
+    def test_failed_batch_returns_changes(self):
+        store = FailingStore()
+        store.mark_order_changed("a", make_order("a"))
+        store.mark_order_deleted("b")
+        with self.assertRaises(OSError):
+            store.save({"orders": {"a": make_order("a")}})
+        self.assertEqual(store.peek_changes(), (["a"], ["b"], False))
+        self.assertEqual(store.unwritten_batches, 0)
+
+        store.fail = False
+        store.save({"orders": {"a": make_order("a")}})
+        self.assertFalse(store.has_pending_changes())
+        self.assertEqual(store.saved_generation, store.generation)
+
+    def test_archive_moves_are_not_edits(self):
+        store = FailingStore()
+        store.fail = False
+        store.mark_order_changed("a", make_order("a"))
+        store.save({"orders": {"a": make_order("a")}})
+        store.mark_synced()
+        generation = store.generation
+
+        store.mark_order_archived("a")
+        store.mark_order_restored("b", make_order("b"))
+        self.assertEqual(store.generation, generation)
+        self.assertFalse(store.has_unsynced_changes())
+        self.assertEqual(store.peek_changes(), ([], [], False))
+        self.assertFalse(store.has_pending_edits())
+        self.assertTrue(store.has_pending_changes())
+
+        batch = store.take_changes({"orders": {"b": make_order("b")}})
+        self.assertEqual(batch["deleted"], ["a"])
+        self.assertEqual(list(batch["orders"]), ["b"])
+        store.finish_batch(batch, False)
+        self.assertEqual(store.local_moves, {"a", "b"})
+
+        # 移动后用户又修改了订单，按普通修改处理
+        store.mark_order_changed("b", make_order("b", paid=True))
+        self.assertEqual(store.peek_changes(), (["b"], [], False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import threading
+import unittest
+
+from order_store import BaseOrderStore
+from save_scheduler import SaveScheduler
+from tests.fake_tk import FakeRoot
+
+
+class RecordingStore(BaseOrderStore):
+    """记录写入的批次和写入线程"""
+
+    def __init__(self):
+        super().__init__("unused.json")
+        self.batches = []
+        self.threads = set()
+        self.fail = False
+
+    def write_changes(self, batch):
+        self.threads.add(threading.current_thread())
+        if self.fail:
+            raise OSError("disk full")
+        self.batches.append(batch)
+
+
+class SaveSchedulerTest(unittest.TestCase):
+    """保存请求的合并、后台写入和退出前的立即写入"""
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.store = RecordingStore()
+        self.orders = {}
+        self.errors = []
+        self.scheduler = SaveScheduler(self.root, self.store, lambda: {"orders": self.orders},
+                                       on_error=self.errors.append, delay_ms=500)
+
+    def edit(self, order_name, **fields):
+        self.orders[order_name] = dict(fields, name=order_name)
+        self.store.mark_order_changed(order_name, self.orders[order_name])
+        self.scheduler.request_save()
+
+    def wait(self):
+        """等后台线程写完，再让主线程处理结果"""
+        self.scheduler.tasks.join()
+        self.root.advance(100)
+
+    def test_burst_is_coalesced_into_one_write(self):
+        self.edit("a", paid=False)
+        self.root.advance(200)
+        self.edit("b", paid=False)
+        self.root.advance(200)
+        self.edit("a", paid=True)
+        self.root.advance(499)
+        self.assertEqual(self.store.batches, [])
+
+        self.root.advance(1)
+        self.wait()
+        self.assertEqual(len(self.store.batches), 1)
+        self.assertEqual(self.store.batches[0]["orders"], {"a": {"name": "a", "paid": True},
+                                                          "b": {"name": "b", "paid": False}})
+        self.assertNotIn(threading.current_thread(), self.store.threads)
+        self.assertFalse(self.store.has_pending_changes())
+        self.assertEqual(self.store.saved_generation, self.store.generation)
+
+    def test_batch_does_not_share_objects_with_memory(self):
+        self.edit("a", paid=False)
+        self.root.advance(500)
+        self.orders["a"]["paid"] = True
+        self.wait()
+        self.assertFalse(self.store.batches[0]["orders"]["a"]["paid"])
+
+    def test_flush_writes_pending_changes_immediately(self):
+        self.edit("a", paid=False)
+        self.scheduler.flush()
+        self.assertEqual(list(self.store.batches[0]["orders"]), ["a"])
+        self.assertIsNone(self.scheduler.after_id)
+        self.assertFalse(self.store.has_pending_changes())
+
+    def test_wait_finishes_dispatched_writes_only(self):
+        self.edit("a", paid=False)
+        self.root.advance(500)
+        self.edit("b", paid=False)
+        self.scheduler.wait()
+        self.assertEqual(list(self.store.batches[0]["orders"]), ["a"])
+        self.assertEqual(len(self.store.batches), 1)
+        self.assertIsNone(self.scheduler.after_id)
+
+    def test_failed_write_is_reported_and_retried(self):
+        self.store.fail = True
+        self.edit("a", paid=False)
+        self.root.advance(500)
+        self.wait()
+        self.assertEqual(len(self.errors), 1)
+        self.assertTrue(self.store.has_pending_changes())
+
+        self.store.fail = False
+        self.scheduler.flush()
+        self.assertEqual(list(self.store.batches[0]["orders"]), ["a"])
+        self.assertFalse(self.store.has_pending_changes())
+
+
+if __name__ == "__main__":
+    unittest.main()
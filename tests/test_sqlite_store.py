@@ -0,0 +1,118 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from contextlib import closing
+
+from order_store import OrderStore
+from sqlite_store import SqliteOrderStore
+
+
+def make_order(name, manufacturer="M1", paid=False, date="2025-01-02 10:00:00", rooms=None, **fields):
+    order = {"name": name, "path": "", "total_area": 1.5, "total_price": 300, "manufacturer": manufacturer,
+             "unit_price": 200, "paid": paid, "date": date}
+    order.update(fields)
+    if rooms is not None:
+        order["rooms"] = rooms
+    return order
+
+
+def room(name, *cabinets):
+    return {"name": name, "cabinets": {cabinet: {"name": cabinet, "width": 600, "height": 800, "area": 0.48}
+                                       for cabinet in cabinets}}
+
+
+class SqliteOrderStoreTest(unittest.TestCase):
+    """SQLite存储的迁移、读写和索引查询"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.dir, "data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def data(self, orders):
+        return {"orders": orders, "manufacturers": {"M1": {"unit_price": 200}}, "bound_order_dir": "D:/订单"}
+
+    def test_migrates_existing_json_store(self):
+        json_store = OrderStore(self.data_file)
+        orders = {"a": make_order("a", rooms={"厨房": room("厨房", "吊柜", "地柜")}),
+                  "b": make_order("b", paid=True, rooms={})}
+        json_store.save(self.data(orders), full=True)
+        orders["c"] = make_order("c", rooms={"主卧": room("主卧", "衣柜")})
+        json_store.mark_order_changed("c")
+        json_store.save(self.data(orders))
+
+        migrated = SqliteOrderStore(self.data_file).load()
+        self.assertEqual(migrated["orders"], orders)
+        self.assertEqual(migrated["bound_order_dir"], "D:/订单")
+
+        # 再次打开时直接读取数据库，只有概要
+        store = SqliteOrderStore(self.data_file)
+        loaded = store.load()
+        self.assertEqual(list(loaded["orders"]), ["a", "b", "c"])
+        self.assertNotIn("rooms", loaded["orders"]["a"])
+        self.assertEqual(loaded["manufacturers"], {"M1": {"unit_price": 200}})
+        self.assertEqual(store.load_body("a"), orders["a"]["rooms"])
+        self.assertEqual(list(store.load_body("a")["厨房"]["cabinets"]), ["吊柜", "地柜"])
+
+    def test_empty_database_without_json_returns_none(self):
+        self.assertIsNone(SqliteOrderStore(self.data_file).load())
+
+    def test_read_orders_does_not_migrate(self):
+        OrderStore(self.data_file).save(self.data({"a": make_order("a", rooms={})}), full=True)
+        store = SqliteOrderStore(self.data_file)
+        self.assertEqual(store.read_orders(), {})
+        self.assertEqual(list(store.load()["orders"]), ["a"])
+        self.assertEqual(list(store.read_orders()), ["a"])
+
+    def test_incremental_changes_round_trip(self):
+        store = SqliteOrderStore(self.data_file)
+        orders = {"a": make_order("a", rooms={"厨房": room("厨房", "吊柜")}), "b": make_order("b", rooms={})}
+        store.save(self.data(orders), full=True)
+
+        # 只改概要时保留已保存的明细；额外字段原样保存
+        store.mark_order_changed("a")
+        store.save(self.data({"a": make_order("a", paid=True, customer_name="张三"), "b": orders["b"]}))
+        orders["c"] = make_order("c", rooms={"书房": dict(room("书房", "书柜"), floor=2)})
+        store.mark_order_changed("c")
+        del orders["b"]
+        store.mark_order_deleted("b")
+        store.save(self.data(orders))
+
+        reopened = SqliteOrderStore(self.data_file)
+        loaded = reopened.load()
+        self.assertEqual(sorted(loaded["orders"]), ["a", "c"])
+        self.assertTrue(loaded["orders"]["a"]["paid"])
+        self.assertEqual(loaded["orders"]["a"]["customer_name"], "张三")
+        self.assertEqual(reopened.load_body("a"), orders["a"]["rooms"])
+        self.assertEqual(reopened.load_body("c"), orders["c"]["rooms"])
+        self.assertEqual(reopened.load_body("b"), {})
+
+    def test_query_matches_order_index(self):
+        rng = random.Random(5)
+        orders = {}
+        for i in range(200):
+            orders[f"鲁能星城{i}"] = make_order(
+                f"鲁能星城{i}", manufacturer=rng.choice(["M1", "M2", "吴姐"]), paid=rng.random() < 0.5,
+                date=f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 3):02d} 10:00:00")
+        store = SqliteOrderStore(self.data_file)
+        store.save(self.data(orders), full=True)
+        store.index.rebuild(orders)
+
+        for manufacturer in (None, "M1", "吴姐", "无"):
+            for paid in (None, True, False):
+                for date_from, date_to in ((None, None), ("2024-03-01 00:00:00", "2024-05-01 00:00:00")):
+                    self.assertEqual(store.query_order_names(manufacturer, paid, date_from, date_to),
+                                     store.index.select(manufacturer, paid, date_from, date_to))
+
+        with closing(store._connect()) as conn:
+            plan = str(conn.execute("EXPLAIN QUERY PLAN SELECT name FROM orders WHERE manufacturer = ?",
+                                    ("M1",)).fetchall())
+        self.assertIn("idx_orders_manufacturer", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import copy
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+import sync_benchmark
+import sync_http
+from delta_sync import DeltaCloudSync
+from sync_backends import (FileSystemBackend, GitHubBackend, MockGitHubServer, NOT_MODIFIED, StaleRemoteError,
+                           git_blob_sha)
+
+
+class BackendContractTest:
+    """两种存储后端共同的行为：读取、创建/更新（sha检查）、删除、条件读取"""
+
+    def new_backend(self):
+        raise NotImplementedError
+
+    def test_put_get_update_delete(self):
+        backend = self.new_backend()
+        self.assertEqual(backend.get_file("sync/a.json"), (None, None))
+
+        sha = backend.put_file("sync/a.json", b"first", None, "创建")
+        self.assertEqual(sha, git_blob_sha(b"first"))
+        raw, etag = backend.get_file("sync/a.json")
+        self.assertEqual(raw, b"first")
+        self.assertEqual(backend.get_file("sync/a.json", etag), (NOT_MODIFIED, etag))
+
+        sha = backend.put_file("sync/a.json", b"second", sha, "更新")
+        self.assertEqual(backend.get_file("sync/a.json")[0], b"second")
+
+        backend.delete_file("sync/a.json", sha, "删除")
+        self.assertEqual(backend.get_file("sync/a.json"), (None, None))
+        # 已不存在的文件再次删除不报错
+        backend.delete_file("sync/a.json", sha, "删除")
+
+    def test_stale_sha_is_rejected(self):
+        backend = self.new_backend()
+        old_sha = backend.put_file("sync/a.json", b"first", None, "创建")
+        backend.put_file("sync/a.json", b"other device", old_sha, "其他设备更新")
+
+        with self.assertRaises(StaleRemoteError):
+            backend.put_file("sync/a.json", b"stale", old_sha, "用过期的sha更新")
+        with self.assertRaises(StaleRemoteError):
+            backend.put_file("sync/a.json", b"stale", None, "当作新文件创建")
+        with self.assertRaises(StaleRemoteError):
+            backend.delete_file("sync/a.json", old_sha, "用过期的sha删除")
+        self.assertEqual(backend.get_file("sync/a.json")[0], b"other device")
+
+    def test_two_clients_sync_through_backend(self):
+        first_dir, second_dir = os.path.join(self.dir, "first"), os.path.join(self.dir, "second")
+        os.makedirs(first_dir)
+        os.makedirs(second_dir)
+        first = DeltaCloudSync(None, os.path.join(first_dir, "data.json"), backend=self.new_backend())
+        second = DeltaCloudSync(None, os.path.join(second_dir, "data.json"), backend=self.new_backend())
+        data = sync_benchmark.generate_data(30, manufacturers=2, months=3)
+
+        with redirect_stdout(io.StringIO()):
+            first.commit(first.sync(copy.deepcopy(data)))
+            downloaded = second.download_data()
+            self.assertEqual(downloaded["orders"], data["orders"])
+            self.assertEqual(second.download_data(), NOT_MODIFIED)
+
+            order_name = sorted(data["orders"])[0]
+            downloaded["orders"][order_name]["paid"] = not downloaded["orders"][order_name]["paid"]
+            downloaded["orders"][order_name]["rev"] += 1
+            second.commit(second.sync(copy.deepcopy(downloaded)))
+            result = first.sync(copy.deepcopy(data))
+        self.assertEqual(list(result["orders"]), [order_name])
+        self.assertEqual(result["orders"][order_name][0], downloaded["orders"][order_name])
+
+
+class FileSystemBackendTest(BackendContractTest, unittest.TestCase):
+    """本地目录后端"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def new_backend(self):
+        return FileSystemBackend(os.path.join(self.dir, "remote"))
+
+
+class MockGitHubBackendTest(BackendContractTest, unittest.TestCase):
+    """GitHub后端通过进程内模拟的GitHub接口读写"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.server = MockGitHubServer()
+        self.server.start()
+
+    def tearDown(self):
+        sync_http.close_session()
+        self.server.stop()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def new_backend(self):
+        github_sync = SimpleNamespace(repo="owner/orders", headers=sync_http.github_headers("token"))
+        return GitHubBackend(github_sync, api_url=self.server.url)
+
+    def test_requests_are_recorded(self):
+        backend = self.new_backend()
+        backend.put_file("sync/manifest.json", b"{}", None, "创建清单")
+        backend.get_file("sync/missing.json")
+        self.assertEqual(self.server.requests, [("PUT", "/repos/owner/orders/contents/sync/manifest.json", 200),
+                                                ("GET", "/repos/owner/orders/contents/sync/missing.json", 404)])
+        self.assertEqual(backend.stats["requests"], 2)
+
+
+class BenchmarkTest(unittest.TestCase):
+    """基准测试在两种后端上都能跑完"""
+
+    def test_small_run(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(sync_benchmark.main(["--sizes", "20", "--patterns", "single,delete"]), 0)
+        lines = output.getvalue().splitlines()
+        # 表头 + 每种后端：首次上传、完整下载、两种修改各上传下载一次、没有变化的下载
+        self.assertEqual(len(lines), 1 + 2 * 7)
+        self.assertIn("没有变化", lines[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import delta_sync
+from delta_sync import (DeltaCloudSync, ENCODING_GZIP, ENCODING_NONE, ENCODING_ZSTD, compress_shard,
+                        decompress_shard, encode_shard)
+from sync_backends import FileSystemBackend, git_blob_sha
+
+
+def sample_shard():
+    orders = {f"订单{i}": {"manufacturer": "M1", "date": "2025-01-02 10:00:00", "customer": "张三",
+                           "rooms": [{"name": "主卧", "area": 3.5}], "rev": 1} for i in range(50)}
+    return encode_shard({"orders": orders})
+
+
+class ShardCompressionTest(unittest.TestCase):
+    """分片压缩：按文件头识别压缩方式，没有zstandard时改用gzip"""
+
+    def test_gzip_round_trip(self):
+        raw = sample_shard()
+        stored = compress_shard(raw, ENCODING_GZIP)
+        self.assertTrue(stored.startswith(delta_sync.GZIP_MAGIC))
+        self.assertLess(len(stored), len(raw))
+        self.assertEqual(decompress_shard(stored), raw)
+        # 相同内容压缩结果相同（不写入时间戳）
+        self.assertEqual(compress_shard(raw, ENCODING_GZIP), stored)
+
+    def test_uncompressed_is_unchanged(self):
+        raw = sample_shard()
+        self.assertEqual(compress_shard(raw, ENCODING_NONE), raw)
+        self.assertEqual(decompress_shard(raw), raw)
+
+    def test_zstd_round_trip_or_gzip_fallback(self):
+        raw = sample_shard()
+        stored = compress_shard(raw, ENCODING_ZSTD)
+        try:
+            import zstandard  # noqa: F401
+            self.assertTrue(stored.startswith(delta_sync.ZSTD_MAGIC))
+        except ImportError:
+            self.assertTrue(stored.startswith(delta_sync.GZIP_MAGIC))
+        self.assertEqual(decompress_shard(stored), raw)
+
+    def test_zstd_without_library_is_refused(self):
+        with mock.patch.dict("sys.modules", {"zstandard": None}):
+            with self.assertRaises(ValueError):
+                decompress_shard(delta_sync.ZSTD_MAGIC + b"\x00" * 16)
+            self.assertTrue(compress_shard(sample_shard(), ENCODING_ZSTD).startswith(delta_sync.GZIP_MAGIC))
+
+
+class CompressedSyncTest(unittest.TestCase):
+    """压缩上传的分片可被其他设备下载，不认识的清单格式和压缩方式拒绝读取"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.backend = FileSystemBackend(os.path.join(self.dir, "remote"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def client(self, name, encoding=ENCODING_NONE):
+        os.makedirs(os.path.join(self.dir, name))
+        return DeltaCloudSync(None, os.path.join(self.dir, name, "data.json"), encoding=encoding,
+                              backend=self.backend)
+
+    def data(self):
+        return {"orders": {"a": {"manufacturer": "M1", "date": "2025-01-02 10:00:00", "rev": 1}},
+                "manufacturers": {"M1": {"unit_price": 100}}, "bound_order_dir": ""}
+
+    def upload(self, client, data):
+        client.commit(client.sync(copy.deepcopy(data)))
+
+    def test_compressed_shards_download(self):
+        data = self.data()
+        self.upload(self.client("first", ENCODING_GZIP), data)
+        stored, _ = self.backend.get_file("sync/shards/meta.json")
+        self.assertTrue(stored.startswith(delta_sync.GZIP_MAGIC))
+        self.assertEqual(self.client("second").download_data()["orders"], data["orders"])
+
+    def rewrite_manifest(self, **fields):
+        raw, _ = self.backend.get_file("sync/manifest.json")
+        manifest = dict(json.loads(raw), **fields)
+        self.backend.put_file("sync/manifest.json", encode_shard(manifest), git_blob_sha(raw), "修改清单")
+
+    def test_unknown_encoding_is_refused(self):
+        self.upload(self.client("first", ENCODING_GZIP), self.data())
+        self.rewrite_manifest(encoding="brotli")
+        with self.assertRaises(ValueError):
+            self.client("second").download_data()
+
+    def test_unknown_format_is_refused(self):
+        self.upload(self.client("first"), self.data())
+        self.rewrite_manifest(format="delta-2")
+        with self.assertRaises(ValueError):
+            self.client("second").download_data()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from types import SimpleNamespace
+
+import requests
+
+import sync_http
+from sync_backends import GitHubBackend, MockGitHubServer, NOT_MODIFIED
+
+
+class FlakySession(requests.Session):
+    """前几次请求抛出连接错误，之后正常发送"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.attempts = 0
+
+    def request(self, method, url, **kwargs):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise requests.ConnectionError("连接被重置")
+        return super().request(method, url, **kwargs)
+
+
+class RetryTest(unittest.TestCase):
+    """共用会话的重试：服务器错误和网络中断时退避重试，重试用完后放弃"""
+
+    def setUp(self):
+        self.backoff_base = sync_http.BACKOFF_BASE
+        sync_http.BACKOFF_BASE = 0.001
+        self.server = MockGitHubServer()
+        self.server.start()
+        self.url = f"{self.server.url}/repos/owner/repo"
+
+    def tearDown(self):
+        sync_http.BACKOFF_BASE = self.backoff_base
+        sync_http.close_session()
+        self.server.stop()
+
+    def statuses(self):
+        return [status for _, _, status in self.server.requests]
+
+    def test_server_errors_are_retried(self):
+        self.server.fail_next(2)
+        response = sync_http.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(), [503, 503, 200])
+
+    def test_connection_errors_are_retried(self):
+        sync_http._session = session = FlakySession(2)
+        response = sync_http.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.attempts, 3)
+        self.assertEqual(self.statuses(), [200])
+
+    def test_gives_up_after_retry_budget(self):
+        self.server.fail_next(sync_http.MAX_RETRIES + 1)
+        response = sync_http.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.statuses(), [503] * (sync_http.MAX_RETRIES + 1))
+
+        # 下一次请求不受影响
+        self.assertEqual(sync_http.get(self.url).status_code, 200)
+
+    def test_connection_error_raised_after_retry_budget(self):
+        sync_http._session = session = FlakySession(sync_http.MAX_RETRIES + 1)
+        with self.assertRaises(requests.ConnectionError):
+            sync_http.get(self.url)
+        self.assertEqual(session.attempts, sync_http.MAX_RETRIES + 1)
+        self.assertEqual(self.server.requests, [])
+
+    def test_client_errors_are_not_retried(self):
+        response = sync_http.get(f"{self.url}/contents/missing.json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.statuses(), [404])
+
+    def test_not_modified_with_etag(self):
+        github_sync = SimpleNamespace(repo="owner/repo", headers=sync_http.github_headers("token"))
+        backend = GitHubBackend(github_sync, api_url=self.server.url)
+        backend.put_file("sync/manifest.json", b'{"shards": {}}', None, "创建清单")
+        raw, etag = backend.get_file("sync/manifest.json")
+        self.assertEqual(raw, b'{"shards": {}}')
+
+        self.assertEqual(backend.get_file("sync/manifest.json", etag), (NOT_MODIFIED, etag))
+        self.assertEqual(self.statuses(), [200, 200, 304])
+
+    def test_session_is_reused(self):
+        self.assertIs(sync_http.get_session(), sync_http.get_session())
+        session = sync_http.get_session()
+        sync_http.close_session()
+        self.assertIsNot(sync_http.get_session(), session)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from sync_queue import SyncQueue
+
+
+class SyncQueueTest(unittest.TestCase):
+    """待同步队列：同一订单只保留最后一次操作，上传成功后按序号移除，重启后保留"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.dir, "data.json")
+        self.cloud_sync = SimpleNamespace(github_sync=object())
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def queue(self):
+        return SyncQueue(self.data_file, self.cloud_sync)
+
+    def test_last_operation_per_order_wins(self):
+        queue = self.queue()
+        queue.add(changed=["a", "b"])
+        queue.add(deleted=["a"], meta=True)
+        self.assertEqual(queue.state["orders"]["a"], {"op": "deleted", "seq": 2})
+        self.assertEqual(queue.state["orders"]["b"], {"op": "changed", "seq": 1})
+        self.assertEqual(queue.pending_count(), 3)
+        self.assertEqual(queue.pending_changes(), ({"a", "b"}, True))
+
+    def test_clear_keeps_changes_recorded_after_mark(self):
+        queue = self.queue()
+        queue.add(changed=["a", "b"])
+        mark = queue.mark()
+        # 上传期间又修改了b和c
+        queue.add(changed=["b", "c"])
+        queue.clear(mark)
+        self.assertEqual(queue.pending_orders(), {"b", "c"})
+        self.assertEqual(queue.pending_changes(), ({"b", "c"}, False))
+
+        queue.clear(queue.mark())
+        self.assertFalse(queue.has_pending())
+
+    def test_empty_add_does_not_advance(self):
+        queue = self.queue()
+        self.assertEqual(queue.add(), 0)
+        self.assertFalse(os.path.exists(queue.queue_file))
+
+    def test_queue_survives_restart(self):
+        queue = self.queue()
+        queue.add(changed=["a"])
+        queue.add(deleted=["b"], meta=True)
+        queue.record_failure("网络连接失败")
+
+        reopened = self.queue()
+        self.assertEqual(reopened.pending_changes(), ({"a", "b"}, True))
+        self.assertEqual(reopened.failures(), 1)
+        self.assertEqual(reopened.state["last_error"], "网络连接失败")
+        self.assertEqual(reopened.add(changed=["c"]), 3)
+
+        reopened.clear(reopened.mark())
+        self.assertEqual(self.queue().pending_count(), 0)
+        self.assertEqual(self.queue().failures(), 0)
+
+    def test_failures_are_counted_until_upload_succeeds(self):
+        queue = self.queue()
+        queue.add(changed=["a"])
+        queue.record_failure("超时")
+        queue.record_failure("超时")
+        self.assertEqual(queue.failures(), 2)
+        self.assertTrue(queue.has_pending())
+
+        queue.clear(queue.mark())
+        self.assertEqual(queue.failures(), 0)
+        self.assertEqual(queue.state["last_error"], "")
+
+    def test_changes_without_cloud_are_untracked(self):
+        self.cloud_sync.github_sync = None
+        queue = self.queue()
+        queue.add(changed=["a"])
+        self.assertIsNone(queue.pending_changes())
+        self.assertFalse(queue.has_pending())
+        self.assertIsNone(self.queue().pending_changes())
+
+        # 配置云同步后第一次上传成功，之后按队列记录修改
+        self.cloud_sync.github_sync = object()
+        queue.clear(queue.mark())
+        self.assertEqual(queue.pending_changes(), (set(), False))
+        queue.add(changed=["b"])
+        self.assertEqual(queue.pending_changes(), ({"b"}, False))
+
+    def test_corrupt_queue_file_starts_empty(self):
+        with open(os.path.join(self.dir, "sync_queue.json"), "w", encoding="utf-8") as f:
+            f.write("{损坏")
+        queue = self.queue()
+        self.assertEqual(queue.pending_count(), 0)
+        self.assertEqual(queue.add(changed=["a"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
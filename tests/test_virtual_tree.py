@@ -0,0 +1,102 @@
+import random
+import unittest
+
+from virtual_tree import TreeReconciler, stable_keys
+
+
+class FakeTree:
+    """记录调用的Treeview替身，不需要显示器"""
+
+    def __init__(self):
+        self.items = []
+        self.values = {}
+        self.calls = []
+
+    def insert(self, parent, index, iid, values):
+        assert iid not in self.values
+        self.items.insert(index, iid)
+        self.values[iid] = values
+        self.calls.append("insert")
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.items.remove(iid)
+            del self.values[iid]
+        self.calls.append("delete")
+
+    def move(self, iid, parent, index):
+        self.items.remove(iid)
+        self.items.insert(index, iid)
+        self.calls.append("move")
+
+    def item(self, iid, values):
+        self.values[iid] = values
+        self.calls.append("item")
+
+
+class StableKeysTest(unittest.TestCase):
+    def test_longest_increasing_subsequence(self):
+        self.assertEqual(stable_keys([]), set())
+        self.assertEqual(stable_keys([0, 1, 2]), {0, 1, 2})
+        self.assertEqual(len(stable_keys([2, 0, 1, 3])), 3)
+        keep = stable_keys([4, 1, 2, 0, 3])
+        self.assertEqual(keep, {1, 2, 4})
+
+
+class TreeReconcilerTest(unittest.TestCase):
+    """比较更新后Treeview中的行与目标完全一致，且不做多余的操作"""
+
+    def rows(self, keys, version=0):
+        return [(key, (key, version)) for key in keys]
+
+    def test_random_updates_reach_target(self):
+        rng = random.Random(11)
+        tree = FakeTree()
+        reconciler = TreeReconciler(tree)
+        keys = [f"o{i}" for i in range(30)]
+        for step in range(200):
+            current = rng.sample(keys, rng.randint(0, len(keys)))
+            rows = [(key, (key, rng.randint(0, 2))) for key in current]
+            reconciler.apply(rows)
+            self.assertEqual(tree.items, current)
+            self.assertEqual(reconciler.order, current)
+            self.assertEqual([tree.values[key] for key in tree.items], [values for _, values in rows])
+
+    def test_unchanged_rows_make_no_calls(self):
+        tree = FakeTree()
+        reconciler = TreeReconciler(tree)
+        rows = self.rows(["a", "b", "c", "d"])
+        reconciler.apply(rows)
+        tree.calls = []
+        self.assertEqual(reconciler.apply(rows), {"insert": 0, "delete": 0, "move": 0, "update": 0})
+        self.assertEqual(tree.calls, [])
+
+    def test_minimal_operations(self):
+        tree = FakeTree()
+        reconciler = TreeReconciler(tree)
+        reconciler.apply(self.rows(["a", "b", "c", "d", "e"]))
+
+        # 把e移到最前：只移动一行
+        changes = reconciler.apply(self.rows(["e", "a", "b", "c", "d"]))
+        self.assertEqual(changes, {"insert": 0, "delete": 0, "move": 1, "update": 0})
+
+        # 删除一行、插入一行、修改一行
+        rows = self.rows(["e", "a", "x", "c", "d"])
+        rows[3] = ("c", ("c", 1))
+        changes = reconciler.apply(rows)
+        self.assertEqual(changes, {"insert": 1, "delete": 1, "move": 0, "update": 1})
+        self.assertEqual(tree.items, ["e", "a", "x", "c", "d"])
+        self.assertEqual(tree.values["c"], ("c", 1))
+
+    def test_clear(self):
+        tree = FakeTree()
+        reconciler = TreeReconciler(tree)
+        reconciler.apply(self.rows(["a", "b"]))
+        reconciler.clear()
+        self.assertEqual(tree.items, [])
+        reconciler.apply(self.rows(["b"]))
+        self.assertEqual(tree.items, ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,300 @@
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import ttk
+
+
+def stable_keys(positions):
+    """最长递增子序列：positions为现有各行在新顺序中的位置（按现有顺序），
+    返回不需要移动的行（在positions中的下标），其余的行移动即可得到新顺序，移动次数最少"""
+    tails = []  # tails[k]：长度为k+1的递增子序列中结尾位置最小的一个的下标
+    tail_positions = []  # 对应的结尾位置，用于二分查找
+    previous = [None] * len(positions)
+    for index, position in enumerate(positions):
+        k = bisect_left(tail_positions, position)
+        if k > 0:
+            previous[index] = tails[k - 1]
+        if k == len(tails):
+            tails.append(index)
+            tail_positions.append(position)
+        else:
+            tails[k] = index
+            tail_positions[k] = position
+    keep = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        keep.add(index)
+        index = previous[index]
+    return keep
+
+
+class TreeReconciler:
+    """按行标识（iid）比较Treeview的现有行和新的行，只做必要的插入、删除、移动和修改
+
+    不清空重建，未变化的行不产生任何Tk调用，滚动位置和选中状态因此保持不变。
+    现有各行的显示内容记录在values中，不需要从Tk读回比较。
+    """
+
+    def __init__(self, tree, parent=""):
+        self.tree = tree
+        self.parent = parent
+        self.order = []  # 现有行的标识，按显示顺序
+        self.values = {}  # 行标识 -> 显示的内容
+        self.changes = {"insert": 0, "delete": 0, "move": 0, "update": 0}  # 上一次apply()的操作数
+
+    def apply(self, rows):
+        """把Treeview的行更新为rows：[(行标识, 各列内容)]"""
+        changes = {"insert": 0, "delete": 0, "move": 0, "update": 0}
+        new_positions = {key: position for position, (key, _) in enumerate(rows)}
+
+        removed = [key for key in self.order if key not in new_positions]
+        if removed:
+            self.tree.delete(*removed)
+            for key in removed:
+                del self.values[key]
+            changes["delete"] = len(removed)
+
+        current = [key for key in self.order if key in new_positions]
+        keep = stable_keys([new_positions[key] for key in current])
+        stable = {current[index] for index in keep}
+
+        # 不在最长递增子序列中的行依次放到新顺序中前一行的后面，其余的行相对顺序已经正确
+        order = current
+        previous = None
+        for key, values in rows:
+            values = tuple(values)
+            if key not in stable:
+                if key in self.values:
+                    order.remove(key)
+                index = order.index(previous) + 1 if previous is not None else 0
+                order.insert(index, key)
+                if key in self.values:
+                    self.tree.move(key, self.parent, index)
+                    changes["move"] += 1
+                else:
+                    self.tree.insert(self.parent, index, iid=key, values=values)
+                    self.values[key] = values
+                    changes["insert"] += 1
+            if self.values[key] != values:
+                self.tree.item(key, values=values)
+                self.values[key] = values
+                changes["update"] += 1
+            previous = key
+
+        self.order = order
+        self.changes = changes
+        return changes
+
+    def clear(self):
+        if self.order:
+            self.tree.delete(*self.order)
+        self.order = []
+        self.values = {}
+
+
+class VirtualTreeview(ttk.Frame):
+    """只创建可见行的表格（带垂直滚动条）
+
+    全部结果保存在Python列表中，Treeview里只有当前可见的行和下方少量缓冲行，
+    滚动时按滚动位置重新显示这一段，刷新和滚动的耗时与结果数量无关。
+    显示时由TreeReconciler与现有的行比较，只修改有变化的行。
+    行的标识（iid）为key(row)，如订单号；选中状态按标识记录，滚出可见范围后仍保留。
+    用法与Treeview相近：heading()、column()、bind()、selection()、item(key, "values")。
+    """
+
+    ROW_HEIGHT = 20  # 还没有显示任何行时估计可见行数用
+    HEADER_HEIGHT = 25
+
+    def __init__(self, master, columns, show="headings", selectmode="extended", buffer=5):
+        super().__init__(master)
+        self.tree = ttk.Treeview(self, columns=columns, show=show, selectmode=selectmode)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.buffer = buffer
+
+        self.rows = []
+        self.key = lambda row: row[0]  # 行 -> 标识
+        self.values = lambda row: row  # 行 -> 显示的各列内容，只对显示的行调用
+        self.positions = None  # 标识 -> 行号，需要时才建立
+        self.top = 0  # 第一个可见行的行号
+        self.page = 20  # 可见行数，窗口大小变化时重新计算
+        self.reconciler = TreeReconciler(self.tree)
+        self.selected = {}  # 选中的行标识（按选中顺序）
+        self.focus_key = None  # 键盘操作的当前行
+        self.replace_selection = False  # 单击（不按Ctrl/Shift）时替换全部选中，包括不在可见范围内的
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Button-1>", self._on_click)
+        # 按住Ctrl/Shift单击时在已选中的基础上增减，不替换
+        self.tree.bind("<Control-Button-1>", lambda e: None)
+        self.tree.bind("<Shift-Button-1>", lambda e: None)
+        self.tree.bind("<MouseWheel>", lambda e: self._scroll_units(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self._scroll_units(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_units(3))
+        for sequence, move in (("Up", -1), ("Down", 1), ("Prior", "-page"), ("Next", "page"),
+                               ("Home", "home"), ("End", "end")):
+            self.tree.bind(f"<{sequence}>", lambda e, move=move: self._on_key(move, extend=False))
+            self.tree.bind(f"<Shift-{sequence}>", lambda e, move=move: self._on_key(move, extend=True))
+
+    # Treeview的常用方法
+    def heading(self, column, **kwargs):
+        return self.tree.heading(column, **kwargs)
+
+    def column(self, column, **kwargs):
+        return self.tree.column(column, **kwargs)
+
+    def bind(self, sequence=None, func=None, add=None):
+        return self.tree.bind(sequence, func, add)
+
+    def set_rows(self, rows, key=None, values=None):
+        """显示新的结果，保留滚动位置和仍在结果中的选中行"""
+        self.rows = rows if isinstance(rows, list) else list(rows)
+        if key is not None:
+            self.key = key
+        if values is not None:
+            self.values = values
+        self.positions = None
+        if self.selected:
+            positions = self._positions()
+            self.selected = {k: None for k in self.selected if k in positions}
+        self._render()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def selection(self):
+        """选中行的标识"""
+        return list(self.selected)
+
+    def select_all(self):
+        self.selected = {self.key(row): None for row in self.rows}
+        self._render()
+
+    def clear_selection(self):
+        self.selected = {}
+        self._render()
+
+    def item(self, key, option=None):
+        """行的显示内容，与Treeview.item()相同只支持读取"""
+        position = self._positions().get(key)
+        values = tuple(self.values(self.rows[position])) if position is not None else ()
+        if option is None:
+            return {"values": values}
+        if option != "values":
+            raise ValueError(f"不支持的选项: {option}")
+        return values
+
+    def see(self, key):
+        """滚动到指定行"""
+        position = self._positions().get(key)
+        if position is None:
+            return
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + self.page:
+            self.top = position - self.page + 1
+        self._render()
+
+    def yview(self, *args):
+        """滚动条的回调：moveto比例，或按行、按页滚动"""
+        if not args:
+            return self._fractions()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            count = int(args[1])
+            self.top += count * self.page if args[2] == "pages" else count
+        self._render()
+
+    def _scroll_units(self, count):
+        self.yview("scroll", count, "units")
+        return "break"
+
+    def _fractions(self):
+        if not self.rows:
+            return 0.0, 1.0
+        return self.top / len(self.rows), min(1.0, (self.top + self.page) / len(self.rows))
+
+    def _positions(self):
+        if self.positions is None:
+            self.positions = {self.key(row): position for position, row in enumerate(self.rows)}
+        return self.positions
+
+    @property
+    def rendered(self):
+        """Treeview中当前的行标识，按显示顺序"""
+        return self.reconciler.order
+
+    @property
+    def changes(self):
+        """上一次显示时插入、删除、移动和修改的行数"""
+        return self.reconciler.changes
+
+    def _render(self):
+        """按当前滚动位置显示可见行和缓冲行，只修改与现有行不同的部分"""
+        self.top = max(0, min(self.top, len(self.rows) - self.page))
+        window = self.rows[self.top:self.top + self.page + self.buffer]
+        self.reconciler.apply([(self.key(row), self.values(row)) for row in window])
+        selected = [key for key in self.rendered if key in self.selected]
+        if set(self.tree.selection()) != set(selected):
+            self.tree.selection_set(selected)
+        if self.focus_key in self.selected and self.focus_key in self.rendered:
+            self.tree.focus(self.focus_key)
+        self.tree.yview_moveto(0)
+        self.scrollbar.set(*self._fractions())
+
+    def _on_configure(self, event):
+        """窗口大小变化时重新计算可见行数"""
+        row_height, header_height = self.ROW_HEIGHT, self.HEADER_HEIGHT
+        if self.rendered:
+            bbox = self.tree.bbox(self.rendered[0])
+            if bbox:
+                header_height, row_height = bbox[1], bbox[3]
+        page = max(1, (event.height - header_height) // max(1, row_height))
+        if page != self.page:
+            self.page = page
+            self._render()
+
+    def _on_click(self, event):
+        if self.tree.identify_row(event.y):
+            self.replace_selection = True
+
+    def _on_select(self, event):
+        """把Treeview中可见行的选中状态同步到全部结果的选中记录"""
+        tree_selection = self.tree.selection()
+        if self.replace_selection:
+            self.replace_selection = False
+            self.selected = {}
+        else:
+            rendered = set(self.rendered)
+            self.selected = {key: None for key in self.selected if key not in rendered}
+        for key in tree_selection:
+            self.selected[key] = None
+        focus = self.tree.focus()
+        if focus:
+            self.focus_key = focus
+
+    def _on_key(self, move, extend):
+        """方向键、翻页键在全部结果中移动当前行，需要时滚动"""
+        if not self.rows:
+            return "break"
+        position = self._positions().get(self.focus_key)
+        if position is None:
+            position = self.top
+        elif move == "home":
+            position = 0
+        elif move == "end":
+            position = len(self.rows) - 1
+        elif move in ("page", "-page"):
+            position += self.page if move == "page" else -self.page
+        else:
+            position += move
+        position = max(0, min(position, len(self.rows) - 1))
+        self.focus_key = self.key(self.rows[position])
+        if not extend:
+            self.selected = {}
+        self.selected[self.focus_key] = None
+        self.see(self.focus_key)
+        self.tree.event_generate("<<TreeviewSelect>>")
+        return "break"